@@ -0,0 +1,317 @@
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# optional accelerators: NumPy for the vectorized helpers, pyarrow for Arrow tables / Parquet files
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# rows x columns compared at once by the vectorized concurrency check (bounds its temporary memory)
+_BLOCK_CELLS = 1 << 22
+
+
+def _is_origin(name: str) -> bool:
+    # "<interface>_execute" is where a customer event took effect first (see `CausalityIndex.origin`)
+    return name.endswith("_execute") and not name.endswith("_propagate_execute")
+
+
+def _is_propagated(name: str) -> bool:
+    return name.endswith("_propagate_execute")
+
+
+class EventColumns:
+    """
+    Every sub-event logged by a set of branches as one columnar table.
+    Note:
+        Columns are NumPy arrays when NumPy is installed and typed `array.array`s otherwise; either way building
+        them is a memcpy of each branch's EventLog arrays, not a walk over per-sub-event dicts. Rows keep the
+        branches' order and, within a branch, log (clock) order. `name` holds codes into `names`. Vector clocks
+        (`vectors`, one sorted tuple per row in vector-clock mode) are kept in memory only, not written to files.
+    """
+
+    COLUMNS = ("branch", "event_id", "name", "clock", "in_branch")
+
+    def __init__(
+        self,
+        branch: array,
+        event_id: array,
+        name: array,
+        clock: array,
+        in_branch: array,
+        names: List[str],
+        vectors: Optional[list] = None,
+    ):
+        self.branch = branch
+        self.event_id = event_id
+        self.name = name
+        self.clock = clock
+        self.in_branch = in_branch
+        self.names = names
+        self.vectors = vectors
+
+        # zero-copy NumPy views over the typed arrays
+        if np is not None:
+            for column in self.COLUMNS:
+                values = getattr(self, column)
+                if isinstance(values, array):
+                    setattr(self, column, np.frombuffer(values, dtype=values.typecode))
+
+    @classmethod
+    def from_branches(cls, branches: list) -> "EventColumns":
+        """Copies the event logs of the branches (call once they are idle)"""
+        branch, event_id, name, clock, in_branch = array("i"), array("q"), array("H"), array("q"), array("B")
+        codes: Dict[str, int] = {}
+        vectors = [] if all(b.events.vectors is not None for b in branches) else None
+
+        for b in branches:
+            log = b.events
+            rows = len(log.clocks)
+            mapping = [codes.setdefault(n, len(codes)) for n in log.names]
+
+            branch.extend(array("i", [b.id]) * rows)
+            event_id.extend(log.event_ids[:rows])
+            clock.extend(log.clocks[:rows])
+            in_branch.frombytes(bytes(log.in_branch[:rows]))
+            if mapping == list(range(len(mapping))):
+                name.extend(log.name_codes[:rows])
+            else:
+                name.extend(array("H", map(mapping.__getitem__, log.name_codes[:rows])))
+            if vectors is not None:
+                vectors.extend(log.vectors[:rows])
+
+        return cls(branch, event_id, name, clock, in_branch, list(codes), vectors)
+
+    @property
+    def backend(self) -> str:
+        """Whether the helpers run vectorized ("numpy") or as plain Python loops ("array")"""
+        return "array" if isinstance(self.clock, array) else "numpy"
+
+    def __len__(self) -> int:
+        return len(self.clock)
+
+    def to_numpy(self) -> dict:
+        """The columns as NumPy arrays (requires NumPy)"""
+        if np is None:
+            raise ImportError("to_numpy requires numpy")
+        return {column: np.asarray(getattr(self, column)) for column in self.COLUMNS}
+
+    def to_arrow(self) -> "pa.Table":
+        """The columns as an Arrow table, with `name` dictionary-encoded (requires pyarrow)"""
+        if pa is None:
+            raise ImportError("to_arrow requires pyarrow")
+        values = {c: getattr(self, c) if np is not None else getattr(self, c).tolist() for c in self.COLUMNS}
+        return pa.table({
+            "branch": pa.array(values["branch"], pa.int32()),
+            "event_id": pa.array(values["event_id"], pa.int64()),
+            "name": pa.DictionaryArray.from_arrays(pa.array(values["name"], pa.int32()), pa.array(self.names)),
+            "clock": pa.array(values["clock"], pa.int64()),
+            "in_branch": pa.array(values["in_branch"], pa.uint8()),
+        })
+
+    @classmethod
+    def from_arrow(cls, table: "pa.Table") -> "EventColumns":
+        """Counterpart of `to_arrow`"""
+        names = table.column("name").combine_chunks()
+        if not pa.types.is_dictionary(names.type):
+            names = names.dictionary_encode()
+        return cls(
+            array("i", table.column("branch").to_pylist()),
+            array("q", table.column("event_id").to_pylist()),
+            array("H", names.indices.to_pylist()),
+            array("q", table.column("clock").to_pylist()),
+            array("B", table.column("in_branch").to_pylist()),
+            names.dictionary.to_pylist(),
+        )
+
+    def write(self, path: str) -> None:
+        """Writes the columns to a ".parquet" (requires pyarrow) or ".npz" (requires NumPy) file"""
+        if path.endswith(".parquet"):
+            table = self.to_arrow()
+            pq.write_table(table, path)
+        elif path.endswith(".npz"):
+            columns = self.to_numpy()
+            np.savez(path, names=np.array(self.names, dtype=str), **columns)
+        else:
+            raise ValueError("Invalid columns file extension")
+
+    @classmethod
+    def load(cls, path: str) -> "EventColumns":
+        """Reads a file written by `write`"""
+        if path.endswith(".parquet"):
+            if pa is None:
+                raise ImportError("Parquet files require pyarrow")
+            return cls.from_arrow(pq.read_table(path))
+        if path.endswith(".npz"):
+            if np is None:
+                raise ImportError("npz files require numpy")
+            with np.load(path) as data:
+                return cls(*(data[column] for column in cls.COLUMNS), data["names"].tolist())
+        raise ValueError("Invalid columns file extension")
+
+    def name_mask(self, predicate) -> list:
+        """Per name code, whether the sub-event name matches `predicate`"""
+        return [bool(predicate(name)) for name in self.names]
+
+
+def propagation_lag(columns: EventColumns) -> Dict[int, int]:
+    """
+    Event id -> Lamport ticks between the event taking effect at its origin and at the last peer to apply it.
+    Note:
+        The lag is the largest "<interface>_propagate_execute" clock minus the "<interface>_execute" clock. Events
+        that never reached a peer (or whose origin isn't in the table) are left out.
+    """
+    origin, propagated = columns.name_mask(_is_origin), columns.name_mask(_is_propagated)
+    if columns.backend == "numpy":
+        return _propagation_lag_numpy(columns, np.array(origin, bool), np.array(propagated, bool))
+
+    origin_clock: Dict[int, int] = {}
+    last_clock: Dict[int, int] = {}
+    for event_id, code, clock in zip(columns.event_id, columns.name, columns.clock):
+        if origin[code]:
+            origin_clock.setdefault(event_id, clock)
+        elif propagated[code] and clock > last_clock.get(event_id, -1):
+            last_clock[event_id] = clock
+    return {e: last_clock[e] - origin_clock[e] for e in sorted(origin_clock) if e in last_clock}
+
+
+def _propagation_lag_numpy(columns: EventColumns, origin: "np.ndarray", propagated: "np.ndarray") -> Dict[int, int]:
+    codes = np.asarray(columns.name, dtype=np.intp)
+    rows = np.flatnonzero(origin[codes])
+    origin_ids, first = np.unique(columns.event_id[rows], return_index=True)
+    origin_clock = columns.clock[rows][first]
+
+    rows = np.flatnonzero(propagated[codes])
+    order = np.argsort(columns.event_id[rows], kind="stable")
+    ids, clocks = columns.event_id[rows][order], columns.clock[rows][order]
+    propagated_ids, starts = np.unique(ids, return_index=True)
+    last_clock = np.maximum.reduceat(clocks, starts) if len(starts) else clocks[:0]
+
+    common, a, b = np.intersect1d(origin_ids, propagated_ids, assume_unique=True, return_indices=True)
+    return dict(zip(common.tolist(), (last_clock[b] - origin_clock[a]).tolist()))
+
+
+def clock_gaps(columns: EventColumns) -> Dict[int, dict]:
+    """
+    Branch id -> statistics of the steps between consecutive clocks of the branch's own event log.
+    Note:
+        A step is 1 for a local sub-event; larger steps ("jumps") are where a message from a branch that was ahead
+        pulled the local clock forward.
+    """
+    if columns.backend == "numpy":
+        return _clock_gaps_numpy(columns)
+
+    stats: Dict[int, dict] = {}
+    previous = {}
+    for branch, clock, flag in zip(columns.branch, columns.clock, columns.in_branch):
+        if not flag:
+            continue
+        s = stats.get(branch)
+        if s is None:
+            s = stats[branch] = {"sub_events": 0, "max_gap": 0, "mean_gap": 0.0, "jumps": 0, "first": clock}
+        else:
+            gap = clock - previous[branch]
+            s["max_gap"] = max(s["max_gap"], gap)
+            s["jumps"] += gap > 1
+        s["sub_events"] += 1
+        previous[branch] = clock
+    for branch, s in stats.items():
+        first = s.pop("first")
+        s["mean_gap"] = (previous[branch] - first) / (s["sub_events"] - 1) if s["sub_events"] > 1 else 0.0
+    return stats
+
+
+def _clock_gaps_numpy(columns: EventColumns) -> Dict[int, dict]:
+    rows = np.asarray(columns.in_branch, dtype=bool)
+    branches, clocks = columns.branch[rows], columns.clock[rows]
+    if not len(clocks):
+        return {}
+
+    # rows of a branch are contiguous, so a branch's steps are the diffs that don't cross a branch boundary
+    starts = np.flatnonzero(np.r_[True, branches[1:] != branches[:-1]])
+    ends = np.r_[starts[1:], len(clocks)]
+    steps = np.diff(clocks)
+    inner = branches[1:] == branches[:-1]
+    padded = np.where(inner, steps, 0)
+    max_gap = np.maximum.reduceat(np.r_[padded, 0], starts)
+    jumps = np.add.reduceat(np.r_[(padded > 1).astype(np.int64), 0], starts)
+
+    counts = ends - starts
+    spans = clocks[ends - 1] - clocks[starts]
+    mean_gap = np.where(counts > 1, spans / np.maximum(counts - 1, 1), 0.0)
+    return {
+        int(b): {"sub_events": int(n), "max_gap": int(g), "mean_gap": float(m), "jumps": int(j)}
+        for b, n, g, m, j in zip(branches[starts], counts, max_gap, mean_gap, jumps)
+    }
+
+
+def _origins(columns: EventColumns) -> Tuple[List[int], List[int]]:
+    """(event ids in first-seen order, row of each one's origin sub-event) for events with an origin"""
+    origin = columns.name_mask(_is_origin)
+    seen: Dict[int, Optional[int]] = {}
+    for row, (event_id, code) in enumerate(zip(columns.event_id.tolist(), columns.name.tolist())):
+        if seen.setdefault(event_id, None) is None and origin[code]:
+            seen[event_id] = row
+    ids = [e for e, row in seen.items() if row is not None]
+    return ids, [seen[e] for e in ids]
+
+
+def concurrent_events(columns: EventColumns) -> List[Tuple[int, int]]:
+    """
+    Pairs of customer events whose executions are causally unrelated, like `CausalityIndex.concurrent_events`.
+    Note:
+        Every sub-event ticks its own branch's entry, so a happened before b exactly when b's clock has seen a's
+        own entry. With NumPy the origin clocks become a dense (events x branches) matrix and that check runs for
+        a whole block of event pairs at once. Requires vector clocks (branches in vector-clock mode).
+    """
+    if columns.vectors is None:
+        raise ValueError("Branches did not record vector clocks")
+    ids, rows = _origins(columns)
+    branch = columns.branch.tolist()
+    owners = [branch[row] for row in rows]
+
+    if columns.backend == "numpy":
+        return _concurrent_events_numpy(columns, ids, rows, owners)
+
+    clocks = [dict(columns.vectors[row]) for row in rows]
+    own = [clocks[n][owner] for n, owner in enumerate(owners)]
+    return [
+        (ids[a], ids[b])
+        for a in range(len(ids))
+        for b in range(a + 1, len(ids))
+        if clocks[b].get(owners[a], 0) < own[a] and clocks[a].get(owners[b], 0) < own[b]
+    ]
+
+
+def _concurrent_events_numpy(
+    columns: EventColumns, ids: List[int], rows: List[int], owners: List[int]
+) -> List[Tuple[int, int]]:
+    if not ids:
+        return []
+    position = {b: n for n, b in enumerate(dict.fromkeys(columns.branch.tolist()))}
+    matrix = np.zeros((len(ids), len(position)), dtype=np.int64)
+    for n, row in enumerate(rows):
+        for branch, counter in columns.vectors[row]:
+            if branch in position:
+                matrix[n, position[branch]] = counter
+    cols = np.array([position[owner] for owner in owners])
+    own = matrix[np.arange(len(ids)), cols]
+
+    ids = np.array(ids)
+    pairs = []
+    block = max(1, _BLOCK_CELLS // len(ids))
+    for start in range(0, len(ids), block):
+        stop = min(start + block, len(ids))
+        # [a, b] for a in this block: b hasn't seen a's own entry, a hasn't seen b's, and b comes after a
+        unrelated = matrix[:, cols[start:stop]].T < own[start:stop, None]
+        unrelated &= matrix[start:stop][:, cols] < own[None, :]
+        unrelated &= np.arange(len(ids))[None, :] > np.arange(start, stop)[:, None]
+        a, b = np.nonzero(unrelated)
+        pairs.extend(zip(ids[a + start].tolist(), ids[b].tolist()))
+    return pairs
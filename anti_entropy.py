@@ -0,0 +1,238 @@
+import functools
+import itertools
+import operator
+import threading
+from array import array
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Literal, Optional, Tuple, Union
+
+_MASK = (1 << 64) - 1
+
+
+def _mix(event_id: int) -> int:
+    """64-bit finalizer (splitmix64), so xor-ing consecutive event ids doesn't cancel out"""
+    z = (event_id + 0x9E3779B97F4A7C15) & _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+class OpLog:
+    """
+    Deposits / withdrawals a branch has applied, grouped by origin branch and bucketed by event id.
+    Note:
+        The buckets of an origin form a tree: level 0 has `buckets` buckets (event id % buckets) and every level
+        below splits each bucket in two (event id % (buckets << level)), down to `depth`. Each bucket keeps a digest
+        of (count, xor of hashed event ids) that is updated in O(depth) per operation. A branch compares a peer's
+        top-level digests with its own and asks only for the children of the buckets that differ (`differing`), so
+        a repair exchanges about `depth` digests and at most `leaf_size` operations per missing operation, however
+        long the history is.
+    """
+
+    def __init__(self, buckets: int = 64, depth: int = 8, leaf_size: int = 8):
+        if buckets < 1:
+            raise ValueError("buckets must be at least 1")
+        if depth < 0:
+            raise ValueError("Invalid bucket tree depth")
+        self.buckets = buckets
+        self.depth = depth
+        self.leaf_size = leaf_size
+        self._leaves = buckets << depth
+
+        # origin -> per level, the counts and hashes of its `buckets << level` buckets
+        self._counts: Dict[int, List[array]] = {}
+        self._hashes: Dict[int, List[array]] = {}
+
+        # (origin, leaf bucket) -> {event id: (interface, money, account)}
+        self._ops: Dict[Tuple[int, int], Dict[int, Tuple[str, float, int]]] = {}
+
+        # every retained event id (dedup for live and anti-entropy deliveries)
+        self._seen = set()
+
+        # (mark, origin, event id) in the order the retained operations were recorded, see `prune`
+        self._marks: Deque[Tuple[int, int, int]] = deque()
+
+        # (origin, leaf bucket) -> [count, hash] of the pruned operations, which stay in the digests
+        self._pruned: Dict[Tuple[int, int], List[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def __contains__(self, event_id: int) -> bool:
+        return event_id in self._seen
+
+    def bucket_of(self, event_id: int, level: int) -> int:
+        return event_id % (self.buckets << level)
+
+    def _fold(self, origin: int, key: int, count: int, h: int) -> None:
+        """Adds (count, h) to the digests of every bucket holding `key` (an event id or a leaf bucket)"""
+        if origin not in self._counts:
+            sizes = [self.buckets << level for level in range(self.depth + 1)]
+            self._counts[origin] = [array("q", bytes(8 * size)) for size in sizes]
+            self._hashes[origin] = [array("Q", bytes(8 * size)) for size in sizes]
+        for counts, hashes in zip(self._counts[origin], self._hashes[origin]):
+            bucket = key % len(counts)
+            counts[bucket] += count
+            hashes[bucket] ^= h
+
+    def _digest(self, origin: int, level: int, bucket: int) -> Tuple[int, int]:
+        if origin not in self._counts:
+            return 0, 0
+        return self._counts[origin][level][bucket], self._hashes[origin][level][bucket]
+
+    def digest(self, origin: int, level: int, bucket: int) -> Tuple[int, int]:
+        """(count, hash) of one bucket"""
+        with self._lock:
+            return self._digest(origin, level, bucket)
+
+    def add(
+        self,
+        origin: int,
+        event_id: int,
+        interface: Literal["deposit", "withdraw"],
+        money: Union[int, float],
+        account: int = 0,
+        mark: int = 0,
+    ) -> bool:
+        """
+        Records an operation; returns False (and changes nothing) if the event id was already applied.
+        Note:
+            `mark` is the branch's clock when the operation was applied, which `prune` compares to its watermark.
+        """
+        with self._lock:
+            if event_id in self._seen:
+                return False
+            self._seen.add(event_id)
+            self._ops.setdefault((origin, event_id % self._leaves), {})[event_id] = (interface, money, account)
+            self._marks.append((mark, origin, event_id))
+            self._fold(origin, event_id, 1, _mix(event_id))
+        return True
+
+    def digests(
+        self, level: int = 0, buckets: Optional[Iterable[Tuple[int, int]]] = None
+    ) -> List[Tuple[int, int, int, int]]:
+        """Non-empty digests at `level` as (origin, bucket, count, hash), of the given (origin, bucket)s or all"""
+        with self._lock:
+            if buckets is None:
+                return [
+                    (origin, bucket, count, self._hashes[origin][level][bucket])
+                    for origin, counts in self._counts.items()
+                    for bucket, count in enumerate(counts[level])
+                    if count
+                ]
+            found = ((origin, bucket, *self._digest(origin, level, bucket)) for origin, bucket in buckets)
+            return [digest for digest in found if digest[2]]
+
+    def differing(
+        self, level: int, theirs: Iterable[Tuple[int, int, int, int]]
+    ) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int, int, int]]]:
+        """
+        Compares a peer's digests at `level` with this log's and returns (split, fetch): the (origin, bucket)s one
+        level down to ask about next, and the digests of the buckets whose operations should be fetched.
+        Note:
+            A differing bucket is fetched once it is small (at most `leaf_size` operations at the peer), empty
+            here, or at the bottom of the tree. Buckets only this log has are skipped, repair only pulls.
+        """
+        split, fetch = [], []
+        with self._lock:
+            for origin, bucket, count, h in theirs:
+                mine = self._digest(origin, level, bucket)
+                if mine == (count, h):
+                    continue
+                if count <= self.leaf_size or not mine[0] or level == self.depth:
+                    fetch.append((origin, bucket, count, h))
+                else:
+                    width = self.buckets << level
+                    split += [(origin, bucket), (origin, bucket + width)]
+        return split, fetch
+
+    def missing_from(self, wanted: Iterable[Tuple[int, int, int, int, int]]) -> Iterator[tuple]:
+        """
+        Operations of the wanted buckets, given as (origin, level, bucket, count, hash) with the peer's own digest,
+        as (origin, event id, interface, money, account).
+        Note:
+            Buckets whose digest matches the peer's by now are skipped; pruned operations can't be sent.
+        """
+        with self._lock:
+            found = []
+            for origin, level, bucket, count, h in wanted:
+                if self._digest(origin, level, bucket) == (count, h):
+                    continue
+                for leaf in range(bucket, self._leaves, self.buckets << level):
+                    found += [(origin, event_id, *op) for event_id, op in self._ops.get((origin, leaf), {}).items()]
+        yield from found
+
+    def to_apply(
+        self, origin: int, level: int, bucket: int, theirs: Tuple[int, int], event_ids: List[int]
+    ) -> List[int]:
+        """
+        The event ids, out of those a peer sent for one bucket, that this log is missing.
+        Note:
+            Pruned event ids can't be told apart from missing ones, so if the bucket holds pruned operations only
+            the ids that make its digest equal to the peer's `theirs` (count, hash) are returned, and none when
+            no such set is found (e.g. this branch also has operations the peer is missing).
+        """
+        with self._lock:
+            unknown = [event_id for event_id in event_ids if event_id not in self._seen]
+            width = self.buckets << level
+            pruned = any((origin, leaf) in self._pruned for leaf in range(bucket, self._leaves, width))
+            if not unknown or not pruned:
+                return unknown
+            count, h = self._digest(origin, level, bucket)
+        missing, target = theirs[0] - count, theirs[1] ^ h
+        if not 0 < missing <= len(unknown) <= 2 * self.leaf_size:
+            return []
+        for subset in itertools.combinations(unknown, missing):
+            if functools.reduce(operator.xor, map(_mix, subset)) == target:
+                return list(subset)
+        return []
+
+    def prune(self, watermark: int) -> int:
+        """
+        Forgets the operations recorded with a mark below `watermark`; returns how many.
+        Note:
+            Their event ids are no longer deduplicated (a delivery older than the retained history is applied
+            again) and their operations can't be sent to peers. They stay in the digests, so a peer that holds them
+            too still compares equal, and `to_apply` doesn't take them back from a peer that still has them.
+        """
+        pruned = 0
+        with self._lock:
+            while self._marks and self._marks[0][0] < watermark:
+                _, origin, event_id = self._marks.popleft()
+                key = (origin, event_id % self._leaves)
+                ops = self._ops[key]
+                del ops[event_id]
+                if not ops:
+                    del self._ops[key]
+                self._seen.discard(event_id)
+                digest = self._pruned.setdefault(key, [0, 0])
+                digest[0] += 1
+                digest[1] ^= _mix(event_id)
+                pruned += 1
+        return pruned
+
+    def raw(self) -> dict:
+        """
+        The retained operations as (origin, event id, interface, money, account, mark) and the pruned ones'
+        (origin, leaf bucket, count, hash) digests, the counterpart of `restore`
+        """
+        with self._lock:
+            return {
+                "ops": [
+                    (origin, event_id, *self._ops[(origin, event_id % self._leaves)][event_id], mark)
+                    for mark, origin, event_id in self._marks
+                ],
+                "pruned": [(origin, leaf, count, h) for (origin, leaf), (count, h) in self._pruned.items()],
+            }
+
+    def restore(self, state: Union[dict, Iterable[tuple]]) -> None:
+        # snapshots written before pruning existed hold a list of (origin, event id, interface, money[, account])
+        if not isinstance(state, dict):
+            state = {"ops": state}
+        for op in state.get("ops", ()):
+            self.add(*op)
+        with self._lock:
+            for origin, leaf, count, h in state.get("pruned", ()):
+                self._pruned[(origin, leaf)] = [count, h]
+                self._fold(origin, leaf, count, h)
@@ -13,17 +13,31 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rbanking.proto\x12\x07\x62\x61nking\"}\n\rBranchRequest\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0f\n\x07\x62\x61lance\x18\x02 \x01(\x02\x12\x11\n\tinterface\x18\x03 \x01(\t\x12\r\n\x05money\x18\x04 \x01(\x02\x12\n\n\x02id\x18\x05 \x01(\x05\x12\r\n\x05\x63lock\x18\x06 \x01(\x05\x12\x10\n\x08\x65vent_id\x18\x07 \x01(\x05\"\x93\x01\n\x0b\x42ranchReply\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0f\n\x07\x62\x61lance\x18\x02 \x01(\x02\x12\x11\n\tinterface\x18\x03 \x01(\t\x12\r\n\x05money\x18\x04 \x01(\x02\x12\n\n\x02id\x18\x05 \x01(\x05\x12\r\n\x05\x63lock\x18\x06 \x01(\x05\x12\x10\n\x08\x65vent_id\x18\x07 \x01(\x05\x12\x16\n\x0erequest_status\x18\x08 \x01(\t2G\n\x06\x42ranch\x12=\n\x0bMsgDelivery\x12\x16.banking.BranchRequest\x1a\x14.banking.BranchReply\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rbanking.proto\x12\x07\x62\x61nking\"\xce\x01\n\rBranchRequest\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0f\n\x07\x62\x61lance\x18\x02 \x01(\x02\x12\x11\n\tinterface\x18\x03 \x01(\t\x12\r\n\x05money\x18\x04 \x01(\x02\x12\n\n\x02id\x18\x05 \x01(\x05\x12\r\n\x05\x63lock\x18\x06 \x01(\x05\x12\x10\n\x08\x65vent_id\x18\x07 \x01(\x05\x12\x12\n\nvclock_ids\x18\t \x03(\x05\x12\x17\n\x0fvclock_counters\x18\n \x03(\x03\x12\x11\n\tmin_clock\x18\x0b \x01(\x05\x12\x0f\n\x07\x61\x63\x63ount\x18\x0c \x01(\x03\"\xd1\x01\n\x0b\x42ranchReply\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0f\n\x07\x62\x61lance\x18\x02 \x01(\x02\x12\x11\n\tinterface\x18\x03 \x01(\t\x12\r\n\x05money\x18\x04 \x01(\x02\x12\n\n\x02id\x18\x05 \x01(\x05\x12\r\n\x05\x63lock\x18\x06 \x01(\x05\x12\x10\n\x08\x65vent_id\x18\x07 \x01(\x05\x12\x16\n\x0erequest_status\x18\x08 \x01(\t\x12\x12\n\nvclock_ids\x18\t \x03(\x05\x12\x17\n\x0fvclock_counters\x18\n \x03(\x03\x12\x0f\n\x07\x61\x63\x63ount\x18\x0b \x01(\x03\"Y\n\x12\x42ranchRequestBatch\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05\x63lock\x18\x02 \x01(\x05\x12(\n\x08requests\x18\x03 \x03(\x0b\x32\x16.banking.BranchRequest\"T\n\x10\x42ranchReplyBatch\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05\x63lock\x18\x02 \x01(\x05\x12%\n\x07replies\x18\x03 \x03(\x0b\x32\x14.banking.BranchReply\"c\n\nOrderBatch\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05\x63lock\x18\x02 \x01(\x05\x12\x10\n\x08sequence\x18\x03 \x01(\x03\x12(\n\x08requests\x18\x04 \x03(\x0b\x32\x16.banking.BranchRequest\"X\n\nSyncDigest\x12\x0e\n\x06origin\x18\x01 \x01(\x05\x12\x0e\n\x06\x62ucket\x18\x02 \x01(\x05\x12\r\n\x05\x63ount\x18\x03 \x01(\x03\x12\x0c\n\x04hash\x18\x04 \x01(\x06\x12\r\n\x05level\x18\x05 \x01(\x05\"N\n\x0bSyncRequest\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05\x63lock\x18\x02 \x01(\x05\x12$\n\x07\x64igests\x18\x03 \x03(\x0b\x32\x13.banking.SyncDigest\"?\n\x0b\x44igestReply\x12\n\n\x02id\x18\x01 \x01(\x05\x12$\n\x07\x64igests\x18\x02 \x03(\x0b\x32\x13.banking.SyncDigest2\x96\x03\n\x06\x42ranch\x12=\n\x0bMsgDelivery\x12\x16.banking.BranchRequest\x1a\x14.banking.BranchReply\"\x00\x12L\n\x10MsgDeliveryBatch\x12\x1b.banking.BranchRequestBatch\x1a\x19.banking.BranchReplyBatch\"\x00\x12G\n\x11MsgDeliveryStream\x12\x16.banking.BranchRequest\x1a\x14.banking.BranchReply\"\x00(\x01\x30\x01\x12;\n\x0bSyncDigests\x12\x14.banking.SyncRequest\x1a\x14.banking.DigestReply\"\x00\x12;\n\x07SyncOps\x12\x14.banking.SyncRequest\x1a\x16.banking.BranchRequest\"\x00\x30\x01\x12<\n\rOrderDelivery\x12\x13.banking.OrderBatch\x1a\x14.banking.BranchReply\"\x00\x32G\n\x0c\x42ranchReader\x12\x37\n\x05Query\x12\x16.banking.BranchRequest\x1a\x14.banking.BranchReply\"\x00\x62\x06proto3')
 
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'banking_pb2', globals())
 if _descriptor._USE_C_DESCRIPTORS == False:
 
   DESCRIPTOR._options = None
-  _BRANCHREQUEST._serialized_start=26
-  _BRANCHREQUEST._serialized_end=151
-  _BRANCHREPLY._serialized_start=154
-  _BRANCHREPLY._serialized_end=301
-  _BRANCH._serialized_start=303
-  _BRANCH._serialized_end=374
+  _BRANCHREQUEST._serialized_start=27
+  _BRANCHREQUEST._serialized_end=233
+  _BRANCHREPLY._serialized_start=236
+  _BRANCHREPLY._serialized_end=445
+  _BRANCHREQUESTBATCH._serialized_start=447
+  _BRANCHREQUESTBATCH._serialized_end=536
+  _BRANCHREPLYBATCH._serialized_start=538
+  _BRANCHREPLYBATCH._serialized_end=622
+  _ORDERBATCH._serialized_start=624
+  _ORDERBATCH._serialized_end=723
+  _SYNCDIGEST._serialized_start=725
+  _SYNCDIGEST._serialized_end=813
+  _SYNCREQUEST._serialized_start=815
+  _SYNCREQUEST._serialized_end=893
+  _DIGESTREPLY._serialized_start=895
+  _DIGESTREPLY._serialized_end=958
+  _BRANCH._serialized_start=961
+  _BRANCH._serialized_end=1367
+  _BRANCHREADER._serialized_start=1369
+  _BRANCHREADER._serialized_end=1440
 # @@protoc_insertion_point(module_scope)
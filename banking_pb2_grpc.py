@@ -20,6 +20,31 @@ class BranchStub(object):
                 request_serializer=banking__pb2.BranchRequest.SerializeToString,
                 response_deserializer=banking__pb2.BranchReply.FromString,
                 )
+        self.MsgDeliveryBatch = channel.unary_unary(
+                '/banking.Branch/MsgDeliveryBatch',
+                request_serializer=banking__pb2.BranchRequestBatch.SerializeToString,
+                response_deserializer=banking__pb2.BranchReplyBatch.FromString,
+                )
+        self.MsgDeliveryStream = channel.stream_stream(
+                '/banking.Branch/MsgDeliveryStream',
+                request_serializer=banking__pb2.BranchRequest.SerializeToString,
+                response_deserializer=banking__pb2.BranchReply.FromString,
+                )
+        self.SyncDigests = channel.unary_unary(
+                '/banking.Branch/SyncDigests',
+                request_serializer=banking__pb2.SyncRequest.SerializeToString,
+                response_deserializer=banking__pb2.DigestReply.FromString,
+                )
+        self.SyncOps = channel.unary_stream(
+                '/banking.Branch/SyncOps',
+                request_serializer=banking__pb2.SyncRequest.SerializeToString,
+                response_deserializer=banking__pb2.BranchRequest.FromString,
+                )
+        self.OrderDelivery = channel.unary_unary(
+                '/banking.Branch/OrderDelivery',
+                request_serializer=banking__pb2.OrderBatch.SerializeToString,
+                response_deserializer=banking__pb2.BranchReply.FromString,
+                )
 
 
 class BranchServicer(object):
@@ -33,6 +58,41 @@ class BranchServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def MsgDeliveryBatch(self, request, context):
+        """delivers several propagations from one branch to a peer in a single call
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def MsgDeliveryStream(self, request_iterator, context):
+        """pipelined customer session: requests are applied in order, replies are streamed back as each one completes
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SyncDigests(self, request, context):
+        """anti-entropy: this branch's digests for the buckets the caller asks about, one level of the bucket tree per call
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SyncOps(self, request, context):
+        """anti-entropy: streams back the deposits / withdrawals of the buckets the caller found to differ
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def OrderDelivery(self, request, context):
+        """total-order mode: timestamped operations and acknowledgements from one branch, in the order it sent them
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_BranchServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -41,6 +101,31 @@ def add_BranchServicer_to_server(servicer, server):
                     request_deserializer=banking__pb2.BranchRequest.FromString,
                     response_serializer=banking__pb2.BranchReply.SerializeToString,
             ),
+            'MsgDeliveryBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.MsgDeliveryBatch,
+                    request_deserializer=banking__pb2.BranchRequestBatch.FromString,
+                    response_serializer=banking__pb2.BranchReplyBatch.SerializeToString,
+            ),
+            'MsgDeliveryStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.MsgDeliveryStream,
+                    request_deserializer=banking__pb2.BranchRequest.FromString,
+                    response_serializer=banking__pb2.BranchReply.SerializeToString,
+            ),
+            'SyncDigests': grpc.unary_unary_rpc_method_handler(
+                    servicer.SyncDigests,
+                    request_deserializer=banking__pb2.SyncRequest.FromString,
+                    response_serializer=banking__pb2.DigestReply.SerializeToString,
+            ),
+            'SyncOps': grpc.unary_stream_rpc_method_handler(
+                    servicer.SyncOps,
+                    request_deserializer=banking__pb2.SyncRequest.FromString,
+                    response_serializer=banking__pb2.BranchRequest.SerializeToString,
+            ),
+            'OrderDelivery': grpc.unary_unary_rpc_method_handler(
+                    servicer.OrderDelivery,
+                    request_deserializer=banking__pb2.OrderBatch.FromString,
+                    response_serializer=banking__pb2.BranchReply.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'banking.Branch', rpc_method_handlers)
@@ -68,3 +153,152 @@ class Branch(object):
             banking__pb2.BranchReply.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def MsgDeliveryBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/banking.Branch/MsgDeliveryBatch',
+            banking__pb2.BranchRequestBatch.SerializeToString,
+            banking__pb2.BranchReplyBatch.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def MsgDeliveryStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/banking.Branch/MsgDeliveryStream',
+            banking__pb2.BranchRequest.SerializeToString,
+            banking__pb2.BranchReply.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def SyncDigests(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/banking.Branch/SyncDigests',
+            banking__pb2.SyncRequest.SerializeToString,
+            banking__pb2.DigestReply.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def SyncOps(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/banking.Branch/SyncOps',
+            banking__pb2.SyncRequest.SerializeToString,
+            banking__pb2.BranchRequest.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def OrderDelivery(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/banking.Branch/OrderDelivery',
+            banking__pb2.OrderBatch.SerializeToString,
+            banking__pb2.BranchReply.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+class BranchReaderStub(object):
+    """Read-only queries answered from a consistent (balance, clock) snapshot, optionally on a separate server
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Query = channel.unary_unary(
+                '/banking.BranchReader/Query',
+                request_serializer=banking__pb2.BranchRequest.SerializeToString,
+                response_deserializer=banking__pb2.BranchReply.FromString,
+                )
+
+
+class BranchReaderServicer(object):
+    """Read-only queries answered from a consistent (balance, clock) snapshot, optionally on a separate server
+    """
+
+    def Query(self, request, context):
+        """Missing associated documentation comment in .proto file.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_BranchReaderServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'Query': grpc.unary_unary_rpc_method_handler(
+                    servicer.Query,
+                    request_deserializer=banking__pb2.BranchRequest.FromString,
+                    response_serializer=banking__pb2.BranchReply.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'banking.BranchReader', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class BranchReader(object):
+    """Read-only queries answered from a consistent (balance, clock) snapshot, optionally on a separate server
+    """
+
+    @staticmethod
+    def Query(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/banking.BranchReader/Query',
+            banking__pb2.BranchRequest.SerializeToString,
+            banking__pb2.BranchReply.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
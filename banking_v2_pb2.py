@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: banking_v2.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10\x62\x61nking_v2.proto\x12\nbanking.v2\"\xe2\x01\n\x07Request\x12\x1f\n\x04type\x18\x01 \x01(\x0e\x32\x11.banking.v2.Party\x12(\n\tinterface\x18\x02 \x01(\x0e\x32\x15.banking.v2.Interface\x12\x0e\n\x06\x61mount\x18\x03 \x01(\x03\x12\n\n\x02id\x18\x04 \x01(\x05\x12\r\n\x05\x63lock\x18\x05 \x01(\x03\x12\x10\n\x08\x65vent_id\x18\x06 \x01(\x03\x12\x12\n\nvclock_ids\x18\x07 \x03(\x05\x12\x17\n\x0fvclock_counters\x18\x08 \x03(\x03\x12\x11\n\tmin_clock\x18\t \x01(\x03\x12\x0f\n\x07\x61\x63\x63ount\x18\n \x01(\x03\"\xd1\x01\n\x05Reply\x12(\n\tinterface\x18\x01 \x01(\x0e\x32\x15.banking.v2.Interface\x12\x0f\n\x07\x62\x61lance\x18\x02 \x01(\x03\x12\n\n\x02id\x18\x03 \x01(\x05\x12\r\n\x05\x63lock\x18\x04 \x01(\x03\x12\x10\n\x08\x65vent_id\x18\x05 \x01(\x03\x12\"\n\x06status\x18\x06 \x01(\x0e\x32\x12.banking.v2.Status\x12\x12\n\nvclock_ids\x18\x07 \x03(\x05\x12\x17\n\x0fvclock_counters\x18\x08 \x03(\x03\x12\x0f\n\x07\x61\x63\x63ount\x18\t \x01(\x03*L\n\tInterface\x12\x19\n\x15INTERFACE_UNSPECIFIED\x10\x00\x12\t\n\x05QUERY\x10\x01\x12\x0b\n\x07\x44\x45POSIT\x10\x02\x12\x0c\n\x08WITHDRAW\x10\x03*8\n\x05Party\x12\x15\n\x11PARTY_UNSPECIFIED\x10\x00\x12\x0c\n\x08\x43USTOMER\x10\x01\x12\n\n\x06\x42RANCH\x10\x02*S\n\x06Status\x12\x16\n\x12STATUS_UNSPECIFIED\x10\x00\x12\x0b\n\x07SUCCESS\x10\x01\x12\x0b\n\x07PARTIAL\x10\x02\x12\x0c\n\x08REJECTED\x10\x03\x12\t\n\x05STALE\x10\x04\x32\x41\n\x06\x42ranch\x12\x37\n\x0bMsgDelivery\x12\x13.banking.v2.Request\x1a\x11.banking.v2.Reply\"\x00\x62\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'banking_v2_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _INTERFACE._serialized_start=473
+  _INTERFACE._serialized_end=549
+  _PARTY._serialized_start=551
+  _PARTY._serialized_end=607
+  _STATUS._serialized_start=609
+  _STATUS._serialized_end=692
+  _REQUEST._serialized_start=33
+  _REQUEST._serialized_end=259
+  _REPLY._serialized_start=262
+  _REPLY._serialized_end=471
+  _BRANCH._serialized_start=694
+  _BRANCH._serialized_end=759
+# @@protoc_insertion_point(module_scope)
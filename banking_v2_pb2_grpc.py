@@ -0,0 +1,73 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+
+import banking_v2_pb2 as banking__v2__pb2
+
+
+class BranchStub(object):
+    """Version 2 of the branch service: the same operations as banking.Branch with enums and 64-bit integer fields.
+    Clients that get UNIMPLEMENTED for it fall back to banking.Branch (v1).
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.MsgDelivery = channel.unary_unary(
+                '/banking.v2.Branch/MsgDelivery',
+                request_serializer=banking__v2__pb2.Request.SerializeToString,
+                response_deserializer=banking__v2__pb2.Reply.FromString,
+                )
+
+
+class BranchServicer(object):
+    """Version 2 of the branch service: the same operations as banking.Branch with enums and 64-bit integer fields.
+    Clients that get UNIMPLEMENTED for it fall back to banking.Branch (v1).
+    """
+
+    def MsgDelivery(self, request, context):
+        """delivers instructions to the branch
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_BranchServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'MsgDelivery': grpc.unary_unary_rpc_method_handler(
+                    servicer.MsgDelivery,
+                    request_deserializer=banking__v2__pb2.Request.FromString,
+                    response_serializer=banking__v2__pb2.Reply.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'banking.v2.Branch', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class Branch(object):
+    """Version 2 of the branch service: the same operations as banking.Branch with enums and 64-bit integer fields.
+    Clients that get UNIMPLEMENTED for it fall back to banking.Branch (v1).
+    """
+
+    @staticmethod
+    def MsgDelivery(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/banking.v2.Branch/MsgDelivery',
+            banking__v2__pb2.Request.SerializeToString,
+            banking__v2__pb2.Reply.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -0,0 +1,118 @@
+import threading
+from concurrent import futures
+from typing import Any, Callable, List, Optional, Tuple
+
+import grpc
+import banking_pb2
+
+
+class BatchFailed(Exception):
+    """Set on the futures of a batch that got no usable reply (the call failed or the reply didn't match it)"""
+
+
+class PropagationBatcher:
+    """
+    Coalesces the propagations headed to one peer branch into MsgDeliveryBatch calls.
+    Note:
+        A batch is sent as soon as `batch_size` requests are pending or `linger` seconds have passed since the
+        first one was queued, whichever comes first. Each queued request gets a future that resolves to its own
+        BranchReply, in the same order the requests were submitted.
+    """
+
+    def __init__(
+        self,
+        sender_id: int,
+        get_stub: Callable[[], Any],
+        get_clock: Callable[[], int],
+        batch_size: int = 16,
+        linger: float = 0.002,
+        timeout: Optional[float] = None,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        # id of the branch sending the batches
+        self.sender_id = sender_id
+
+        # returns the stub of the receiving branch
+        self.get_stub = get_stub
+
+        # returns the sender's current Lamport clock (piggybacked on every batch)
+        self.get_clock = get_clock
+
+        self.batch_size = batch_size
+        self.linger = linger
+
+        # deadline (seconds) of each MsgDeliveryBatch call
+        self.timeout = timeout
+
+        self._pending: List[Tuple[Any, futures.Future]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Number of queued requests that haven't been sent yet"""
+        return len(self._pending)
+
+    def submit(self, request: Any) -> futures.Future:
+        """Queues a propagation request; the returned future resolves to the peer's BranchReply"""
+        future = futures.Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Batcher is closed")
+            self._pending.append((request, future))
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return future
+
+    def _next_batch(self) -> List[Tuple[Any, futures.Future]]:
+        """Waits for a full batch or for the linger time to expire (returns an empty list once closed)"""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if self._pending and len(self._pending) < self.batch_size and not self._closed:
+                self._cond.wait_for(lambda: len(self._pending) >= self.batch_size or self._closed, self.linger)
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self._send(batch)
+
+    def _send(self, batch: List[Tuple[Any, futures.Future]]) -> None:
+        request = banking_pb2.BranchRequestBatch(
+            id=self.sender_id,
+            clock=self.get_clock(),
+            requests=[r for r, _ in batch],
+        )
+        try:
+            response = self.get_stub().MsgDeliveryBatch(request, timeout=self.timeout)
+        except Exception as e:
+            # callers only have to handle RpcError (a status they can retry on) and BatchFailed
+            error = e if isinstance(e, grpc.RpcError) else BatchFailed(f"MsgDeliveryBatch failed: {e!r}")
+            for _, future in batch:
+                future.set_exception(error)
+            return
+
+        # replies are matched to requests by position, so a reply list of another length can't be trusted
+        if len(response.replies) != len(batch):
+            error = BatchFailed(f"Peer replied to {len(response.replies)} of {len(batch)} batched requests")
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        for (_, future), reply in zip(batch, response.replies):
+            future.set_result(reply)
+
+    def close(self) -> None:
+        """Flushes whatever is pending and stops the sender thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
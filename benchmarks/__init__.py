@@ -0,0 +1 @@
+"""Localhost benchmarks for the Lamport banking simulator (run with `python -m benchmarks.<name>`)"""
@@ -0,0 +1,109 @@
+"""
+Runs the benchmark suite on localhost and writes the results as machine-readable JSON.
+
+    python -m benchmarks --output bench.json
+    python -m benchmarks --quick --only micro event_log --output bench.json --compare previous.json
+
+Exits with a non-zero status if a benchmark that checks its results (a `passed(results)` function, e.g. the stress
+check) reports a failure; the results are still written.
+"""
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+
+# module name -> (full-size kwargs, quick kwargs)
+SUITE = {
+    "micro": ({}, {"number": 20_000, "log_events": 5_000}),
+    "event_log": ({}, {"num_events": 50_000}),
+    "wal": ({}, {"num_events": 100_000}),
+    "macro": ({}, {"branch_counts": (3, 10), "num_events": 60}),
+    "channel_pool": ({}, {"num_events": 100}),
+    "fanout": ({}, {"branch_counts": (3,), "num_events": 60}),
+    "transport": ({}, {"num_events": 100}),
+    "multiprocess": ({}, {"process_counts": (1, 2), "num_events": 20}),
+    "batching": ({}, {"events_per_client": 30}),
+    "stress": ({}, {"num_events": 5_000, "cluster_events": 30}),
+    "anti_entropy": ({}, {"histories": (1_000, 10_000)}),
+    "reads": ({}, {"duration": 0.5}),
+    "pipelining": ({}, {"num_events": 100, "windows": (1, 16)}),
+    "simulation": ({}, {"branch_counts": (10, 100), "num_events": 200}),
+    "ledger": ({}, {"events_per_client": 30}),
+    "analytics": ({}, {"num_events": 2_000}),
+    "ordering": ({}, {"events_per_client": 30}),
+    "wire": ({}, {"number": 20_000}),
+    "retention": ({}, {"num_events": 50_000, "retain_events": 2_000}),
+}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _numbers(tree, prefix: str = ""):
+    """Flattens nested results into {"a.b.c": number}"""
+    if isinstance(tree, dict):
+        for key, value in tree.items():
+            yield from _numbers(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(tree, (int, float)) and not isinstance(tree, bool):
+        yield prefix, tree
+
+
+def compare(previous: dict, current: dict) -> None:
+    """Prints the relative change of every metric present in both result files"""
+    before = dict(_numbers(previous["results"]))
+    for key, value in _numbers(current["results"]):
+        if before.get(key):
+            print(f"{key:<80} {before[key]:>14.3f} -> {value:>14.3f} ({100 * (value / before[key] - 1):+.1f}%)")
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(SUITE), help="run only these benchmarks")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes (smoke run)")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", metavar="JSON", help="print the change against a previous results file")
+    args = parser.parse_args(argv)
+
+    results, failed = {}, []
+    for name in args.only or SUITE:
+        full, quick = SUITE[name]
+        print(f"running {name}...", file=sys.stderr)
+        module = importlib.import_module(f"benchmarks.{name}")
+        results[name] = module.run(**(quick if args.quick else full))["results"]
+        passed = getattr(module, "passed", None)
+        if passed is not None and not passed(results[name]):
+            print(f"{name} FAILED its checks", file=sys.stderr)
+            failed.append(name)
+
+    output = {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "quick": args.quick,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=4)
+    print(f"results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), output)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,90 @@
+"""
+Propagation lag and clock gaps computed by walking the per-dict views (branch_events / event_tracker) vs. on the
+columnar event log of `analytics.py` (vectorized when NumPy is installed).
+
+    python -m benchmarks.analytics --branches 10 --events 20000
+"""
+import argparse
+import json
+import time
+
+import analytics
+import export
+from simulation import Simulation
+from workload import generate_workload, parse_mix
+
+
+def _dict_lag(branches: list) -> dict:
+    """Propagation lag per event id from the 'event_tracker' dicts (the pre-columnar way)"""
+    lags = {}
+    for event_id in export.event_ids(branches):
+        origin, last = None, None
+        for b in branches:
+            for sub_event in b.event_tracker.get(event_id, ()):
+                name = sub_event["name"]
+                if name.endswith("_propagate_execute"):
+                    last = sub_event["clock"] if last is None else max(last, sub_event["clock"])
+                elif name.endswith("_execute") and origin is None:
+                    origin = sub_event["clock"]
+        if origin is not None and last is not None:
+            lags[event_id] = last - origin
+    return lags
+
+
+def _dict_gaps(branches: list) -> dict:
+    """Largest clock step per branch from the 'branch_events' dicts"""
+    gaps = {}
+    for b in branches:
+        previous, largest = None, 0
+        for sub_event in b.branch_events:
+            if previous is not None:
+                largest = max(largest, sub_event["clock"] - previous)
+            previous = sub_event["clock"]
+        gaps[b.id] = largest
+    return gaps
+
+
+def run(num_branches: int = 10, num_events: int = 20_000) -> dict:
+    data = generate_workload(
+        num_branches=num_branches,
+        num_customers=num_branches,
+        events_per_customer=max(1, num_events // num_branches),
+        mix=parse_mix("deposit=0.6,withdraw=0.4"),
+        seed=0,
+    )
+    simulation = Simulation(data, jitter=0.001)
+    stats = simulation.run()
+    branches = simulation.branches
+
+    start = time.perf_counter()
+    lags, gaps = _dict_lag(branches), _dict_gaps(branches)
+    dicts_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = analytics.EventColumns.from_branches(branches)
+    build_sec = time.perf_counter() - start
+    start = time.perf_counter()
+    column_lags, column_gaps = analytics.propagation_lag(columns), analytics.clock_gaps(columns)
+    columns_sec = time.perf_counter() - start
+
+    assert column_lags == dict(sorted(lags.items()))
+    assert {b: g["max_gap"] for b, g in column_gaps.items()} == gaps
+    return {
+        "benchmark": "analytics",
+        "backend": columns.backend,
+        "results": {
+            "sub_events": stats["sub_events"],
+            "dicts_sec": dicts_sec,
+            "columns_build_sec": build_sec,
+            "columns_analysis_sec": columns_sec,
+            "speedup": dicts_sec / (build_sec + columns_sec),
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--branches", type=int, default=10)
+    parser.add_argument("--events", type=int, default=20_000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.branches, args.events), indent=4))
@@ -0,0 +1,81 @@
+"""
+Cost of one anti-entropy round as the history grows: round trips, digest bytes on the wire, time spent comparing,
+and how many operations are shipped for a replica that missed only a few propagations.
+
+    python -m benchmarks.anti_entropy --histories 1000 10000 100000 --missing 10
+"""
+import argparse
+import json
+import random
+import time
+
+import banking_pb2
+from anti_entropy import OpLog
+
+
+def _digests(digests: list, level: int) -> list:
+    return [
+        banking_pb2.SyncDigest(origin=origin, bucket=bucket, count=count, hash=h, level=level)
+        for origin, bucket, count, h in digests
+    ]
+
+
+def repair(source: OpLog, replica: OpLog) -> dict:
+    """The exchange of `Branch.sync_with`, with `replica` pulling from `source` in-process"""
+    stats = {"round_trips": 1, "digest_bytes": 0, "ops_streamed": 0, "ops_applied": 0}
+    fetch, level, asked = {}, 0, []
+    while True:
+        request = banking_pb2.SyncRequest(id=1, digests=_digests([(o, b, 0, 0) for o, b in asked], level))
+        reply = banking_pb2.DigestReply(id=2, digests=_digests(source.digests(level, asked or None), level))
+        stats["round_trips"] += 1
+        stats["digest_bytes"] += request.ByteSize() + reply.ByteSize()
+        asked, found = replica.differing(level, [(d.origin, d.bucket, d.count, d.hash) for d in reply.digests])
+        fetch.update({(origin, level, bucket): (count, h) for origin, bucket, count, h in found})
+        if not asked:
+            break
+        level += 1
+
+    wanted = [(origin, level, bucket, *replica.digest(origin, level, bucket)) for origin, level, bucket in fetch]
+    streamed = {}
+    for op in source.missing_from(wanted):
+        stats["ops_streamed"] += 1
+        for origin, level, bucket in fetch:
+            if origin == op[0] and replica.bucket_of(op[1], level) == bucket:
+                streamed.setdefault((origin, level, bucket), []).append(op)
+                break
+    for (origin, level, bucket), ops in streamed.items():
+        missing = set(replica.to_apply(origin, level, bucket, fetch[(origin, level, bucket)], [op[1] for op in ops]))
+        for op in ops:
+            if op[1] in missing:
+                stats["ops_applied"] += replica.add(*op)
+    return stats
+
+
+def run(histories: tuple = (1_000, 10_000, 100_000), missing: int = 10, origins: int = 5, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    results = {}
+    for history in histories:
+        ops = [(1 + n % origins, n, "deposit", 1.0) for n in range(history)]
+        dropped = set(rng.sample(range(history), missing))
+
+        source, replica = OpLog(), OpLog()
+        for op in ops:
+            source.add(*op)
+            if op[1] not in dropped:
+                replica.add(*op)
+
+        start = time.perf_counter()
+        stats = repair(source, replica)
+        stats["repair_ms"] = 1000 * (time.perf_counter() - start)
+        stats["in_sync"] = source.digests() == replica.digests()
+        stats["full_history_ops"] = history
+        results[str(history)] = stats
+    return {"benchmark": "anti_entropy", "missing": missing, "origins": origins, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--histories", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--missing", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(run(tuple(args.histories), args.missing), indent=4))
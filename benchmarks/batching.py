@@ -0,0 +1,31 @@
+"""
+Deposit throughput and latency with unary propagation vs. MsgDeliveryBatch at a few batch sizes / linger times.
+
+    python -m benchmarks.batching --clients 8 --events 100
+"""
+import argparse
+import json
+
+from benchmarks.common import cluster, deposit_throughput
+
+
+def run(
+    num_clients: int = 8,
+    events_per_client: int = 100,
+    configs: tuple = ((1, 0.0), (8, 0.001), (32, 0.005)),
+) -> dict:
+    results = {}
+    for batch_size, linger in configs:
+        with cluster(3, max_workers=num_clients + 2, batch_size=batch_size, batch_linger=linger):
+            results[f"batch_{batch_size}_linger_{linger * 1000:g}ms"] = deposit_throughput(
+                1, num_clients, events_per_client
+            )
+    return {"benchmark": "batching", "clients": num_clients, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--events", type=int, default=100)
+    args = parser.parse_args()
+    print(json.dumps(run(args.clients, args.events), indent=4))
@@ -0,0 +1,26 @@
+"""
+Per-event propagation latency with a new channel per propagation vs. pooled long-lived channels.
+
+    python -m benchmarks.channel_pool --branches 3 --events 500
+"""
+import argparse
+import json
+
+from benchmarks.common import cluster, summarize, time_deposits
+
+
+def run(num_branches: int = 3, num_events: int = 500) -> dict:
+    results = {}
+    for label, pooled in (("per_call_channel", False), ("pooled_channel", True)):
+        with cluster(num_branches, pooled_channels=pooled):
+            time_deposits(1, 20)  # warm-up
+            results[label] = summarize(time_deposits(1, num_events, first_event_id=100))
+    return {"benchmark": "channel_pool", "branches": num_branches, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--branches", type=int, default=3)
+    parser.add_argument("--events", type=int, default=500)
+    args = parser.parse_args()
+    print(json.dumps(run(args.branches, args.events), indent=4))
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from concurrent import futures
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+import grpc
+import banking_pb2
+import banking_pb2_grpc
+
+from branch import Branch, serve_reader
+from membership import DEFAULT_REGISTRY, Registry
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: List[float]) -> dict:
+    """Latency summary (in milliseconds) of a list of samples measured in seconds"""
+    return {
+        "count": len(samples),
+        "mean_ms": 1000 * sum(samples) / len(samples) if samples else 0.0,
+        "p50_ms": 1000 * percentile(samples, 50),
+        "p99_ms": 1000 * percentile(samples, 99),
+    }
+
+
+@contextmanager
+def cluster(
+    num_branches: int,
+    balance: int = 10_000,
+    max_workers: int = 3,
+    registry: Registry = DEFAULT_REGISTRY,
+    read_workers: Optional[int] = None,
+    **branch_kwargs,
+) -> Iterator[list]:
+    """Starts `num_branches` branch servers (plus query servers with `read_workers`) and tears them down on exit"""
+    logging.disable(logging.CRITICAL)
+    ids = list(range(1, num_branches + 1))
+    branches, servers = [], []
+    try:
+        for _id in ids:
+            peers = [i for i in ids if i != _id]
+            branch = Branch(_id=_id, balance=balance, branches=peers, registry=registry, **branch_kwargs)
+            server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+            banking_pb2_grpc.add_BranchServicer_to_server(branch, server)
+            banking_pb2_grpc.add_BranchReaderServicer_to_server(branch, server)
+            registry.register(_id, server.add_insecure_port(registry.bind_address(_id)))
+            server.start()
+            branches.append(branch)
+            servers.append(server)
+            if read_workers:
+                servers.append(serve_reader(branch, registry, read_workers))
+        yield branches
+    finally:
+        for branch in branches:
+            branch.close()
+        for server in servers:
+            server.stop(grace=None)
+        logging.disable(logging.NOTSET)
+
+
+def time_deposits(
+    branch_id: int,
+    num_events: int,
+    first_event_id: int = 1,
+    registry: Registry = DEFAULT_REGISTRY,
+    num_accounts: int = 0,
+) -> List[float]:
+    """
+    Sends `num_events` customer deposits to a branch and returns the latency of each one (seconds).
+    With `num_accounts`, the deposits go round-robin to accounts 1..num_accounts instead of the branch balance.
+    """
+    samples = []
+    with grpc.insecure_channel(registry.address_of(branch_id)) as channel:
+        stub = banking_pb2_grpc.BranchStub(channel)
+        for event_id in range(first_event_id, first_event_id + num_events):
+            request = banking_pb2.BranchRequest(
+                interface="deposit",
+                money=1,
+                type="customer",
+                id=branch_id,
+                event_id=event_id,
+                clock=0,
+                account=1 + event_id % num_accounts if num_accounts else 0,
+            )
+            start = time.perf_counter()
+            stub.MsgDelivery(request)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def deposit_throughput(
+    branch_id: int,
+    num_clients: int,
+    events_per_client: int,
+    registry: Registry = DEFAULT_REGISTRY,
+    num_accounts: int = 0,
+) -> dict:
+    """Runs concurrent customer clients against one branch and reports deposits/second and latency"""
+    samples: List[List[float]] = [[] for _ in range(num_clients)]
+
+    def client(index: int) -> None:
+        first_event_id = 1 + index * events_per_client
+        samples[index] = time_deposits(branch_id, events_per_client, first_event_id, registry, num_accounts)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(num_clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    flat = [s for client_samples in samples for s in client_samples]
+    return {"events_per_sec": len(flat) / elapsed, **summarize(flat)}
+
+
+def ops_per_sec(fn: Callable[[], None], number: int, repeat: int = 3) -> float:
+    """Best-of-`repeat` rate of calling `fn` `number` times"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return number / best
@@ -0,0 +1,27 @@
+"""
+Customer-visible deposit latency with sequential vs. parallel propagation fan-out.
+
+    python -m benchmarks.fanout --branches 3 10 50 --events 200
+"""
+import argparse
+import json
+
+from benchmarks.common import cluster, summarize, time_deposits
+
+
+def run(branch_counts: tuple = (3, 10, 50), num_events: int = 200) -> dict:
+    results = {}
+    for num_branches in branch_counts:
+        for fanout in ("sequential", "parallel"):
+            with cluster(num_branches, fanout=fanout):
+                time_deposits(1, 20)  # warm-up
+                results[f"{fanout}_{num_branches}"] = summarize(time_deposits(1, num_events, first_event_id=100))
+    return {"benchmark": "fanout", "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--branches", type=int, nargs="+", default=[3, 10, 50])
+    parser.add_argument("--events", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(tuple(args.branches), args.events), indent=4))
@@ -0,0 +1,36 @@
+"""
+Deposit throughput against the single branch balance vs. spread over many accounts of the sharded ledger, with one
+or several propagation batchers per peer.
+
+    python -m benchmarks.ledger --clients 8 --events 100 --accounts 64
+"""
+import argparse
+import json
+
+from benchmarks.common import cluster, deposit_throughput
+
+
+def run(
+    num_clients: int = 8,
+    events_per_client: int = 100,
+    num_accounts: int = 64,
+    configs: tuple = ((0, 1), (1, 1), (None, 1), (None, 4)),
+) -> dict:
+    """`configs` are (accounts, propagation shards) pairs; None stands for `num_accounts`"""
+    results = {}
+    for accounts, shards in configs:
+        accounts = num_accounts if accounts is None else accounts
+        with cluster(3, max_workers=num_clients + 2, batch_size=8, batch_linger=0.001, propagation_shards=shards):
+            results[f"accounts_{accounts}_shards_{shards}"] = deposit_throughput(
+                1, num_clients, events_per_client, num_accounts=accounts
+            )
+    return {"benchmark": "ledger", "clients": num_clients, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--accounts", type=int, default=64)
+    args = parser.parse_args()
+    print(json.dumps(run(args.clients, args.events, args.accounts), indent=4))
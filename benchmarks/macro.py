@@ -0,0 +1,31 @@
+"""
+End-to-end deposits per second and customer-visible propagation latency at several branch counts (localhost).
+
+    python -m benchmarks.macro --branches 3 10 25
+"""
+import argparse
+import json
+
+from benchmarks.common import cluster, deposit_throughput, summarize, time_deposits
+
+
+def run(branch_counts: tuple = (3, 10, 25), num_events: int = 200, num_clients: int = 4) -> dict:
+    results = {}
+    for num_branches in branch_counts:
+        with cluster(num_branches, max_workers=num_clients + 2):
+            time_deposits(1, 20)  # warm-up
+            latency = summarize(time_deposits(1, num_events, first_event_id=100))
+            throughput = deposit_throughput(1, num_clients, num_events // num_clients)
+        results[f"branches_{num_branches}"] = {
+            "propagation_latency": latency,
+            "deposits_per_sec": throughput["events_per_sec"],
+        }
+    return {"benchmark": "macro", "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--branches", type=int, nargs="+", default=[3, 10, 25])
+    parser.add_argument("--events", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(tuple(args.branches), args.events), indent=4))
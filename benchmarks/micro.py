@@ -0,0 +1,75 @@
+"""
+Micro benchmarks of the hot-path building blocks (no network).
+
+    python -m benchmarks.micro
+"""
+import io
+import json
+import logging
+import os
+import tempfile
+
+import banking_pb2
+import export
+from branch import Event
+from benchmarks.common import ops_per_sec
+from tracing import enable_tracing
+
+
+class _LoggedBranch(Event):
+    def __init__(self, _id: int):
+        super().__init__()
+        self.id = _id
+
+
+def _filled_branches(num_branches: int, events_per_branch: int) -> list:
+    branches = [_LoggedBranch(_id) for _id in range(1, num_branches + 1)]
+    for b in branches:
+        for n in range(events_per_branch):
+            b.record_sub_event(n // 8, "deposit_propagate_execute", method_order_number=4, remote_clock=n)
+    return branches
+
+
+def run(number: int = 100_000, log_events: int = 20_000) -> dict:
+    logging.disable(logging.CRITICAL)
+    event = Event()
+    results = {
+        "update_local_clock_per_sec": ops_per_sec(lambda: event.update_local_clock(7), number),
+        "record_sub_event_per_sec": ops_per_sec(lambda: event.record_sub_event(1, "deposit_request", 1), number),
+        "log_event_per_sec": ops_per_sec(
+            lambda: event.log_event({"id": 1, "name": "deposit_request", "clock": 1}, method_order_number=1), number
+        ),
+    }
+
+    # sub-events with the trace pipeline on (records are formatted and written by the listener thread)
+    fd, trace_path = tempfile.mkstemp(suffix=".ndjson")
+    os.close(fd)
+    logging.disable(logging.NOTSET)
+    tracing = enable_tracing(trace_path)
+    results["record_sub_event_traced_per_sec"] = ops_per_sec(
+        lambda: event.record_sub_event(1, "deposit_request", 1), number
+    )
+    tracing.close()
+    logging.disable(logging.CRITICAL)
+    os.remove(trace_path)
+
+    request = banking_pb2.BranchRequest(interface="deposit", money=170, type="branch", id=2, clock=5, event_id=42)
+    encoded = request.SerializeToString()
+    results["branch_request_encode_per_sec"] = ops_per_sec(request.SerializeToString, number)
+    results["branch_request_decode_per_sec"] = ops_per_sec(lambda: banking_pb2.BranchRequest.FromString(encoded), number)
+    results["branch_request_bytes"] = len(encoded)
+
+    branches = _filled_branches(3, log_events)
+    sub_events = 3 * log_events
+    results["output_json_sub_events_per_sec"] = sub_events * ops_per_sec(
+        lambda: export.write_json(branches, io.StringIO()), 1
+    )
+    results["output_ndjson_sub_events_per_sec"] = sub_events * ops_per_sec(
+        lambda: export.write_ndjson(branches, io.StringIO()), 1
+    )
+    logging.disable(logging.NOTSET)
+    return {"benchmark": "micro", "results": results}
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=4))
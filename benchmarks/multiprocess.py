@@ -0,0 +1,55 @@
+"""
+Closed-loop throughput of the same workload with the branches in 1, 2, ... OS processes (one core each at best).
+
+    python -m benchmarks.multiprocess --branches 4 --processes 1 2 4 --customers 8 --events 50
+"""
+import argparse
+import json
+import logging
+import os
+
+from launcher import ProcessLauncher
+from load_driver import LoadDriver
+from workload import generate_workload
+
+
+def run(
+    num_branches: int = 4,
+    process_counts: tuple = (1, 2, 4),
+    num_customers: int = 8,
+    num_events: int = 50,
+) -> dict:
+    logging.disable(logging.CRITICAL)
+    data = generate_workload(num_branches, num_customers, num_events, mix={"deposit": 0.5, "withdraw": 0.5}, seed=1)
+    branch_processes = [p for p in data if p["type"] == "branch"]
+    customer_processes = [p for p in data if p["type"] == "customer"]
+
+    results = {}
+    for processes in process_counts:
+        launcher = ProcessLauncher(
+            branch_processes,
+            branches_per_process=-(-num_branches // processes),
+            max_workers=num_customers + 2,
+        )
+        launcher.start()
+        try:
+            report = LoadDriver(customer_processes, mode="closed").run()
+        finally:
+            launcher.stop()
+        results[f"processes_{processes}"] = {
+            "events_per_sec": report["throughput_per_sec"],
+            "p50_ms": report["latency"]["p50_ms"],
+            "p99_ms": report["latency"]["p99_ms"],
+        }
+    logging.disable(logging.NOTSET)
+    return {"benchmark": "multiprocess", "branches": num_branches, "cpu_count": os.cpu_count(), "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--branches", type=int, default=4)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--customers", type=int, default=8)
+    parser.add_argument("--events", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.branches, tuple(args.processes), args.customers, args.events), indent=4))
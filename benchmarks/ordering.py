@@ -0,0 +1,63 @@
+"""
+Deposit throughput and latency with immediate execution vs. total-order (Lamport timestamp + branch id) execution,
+plus how each mode handles concurrent withdrawals at different branches that together would overdraw the balance.
+
+    python -m benchmarks.ordering --clients 8 --events 100
+"""
+import argparse
+import json
+import threading
+
+import grpc
+import banking_pb2
+import banking_pb2_grpc
+
+from benchmarks.common import cluster, deposit_throughput
+from membership import DEFAULT_REGISTRY
+
+
+def overdraft(ordering: str, num_branches: int = 4, withdrawals: int = 5, balance: int = 100) -> dict:
+    """Every branch's customer withdraws 10 `withdrawals` times at once; reports final balances and statuses"""
+    statuses = []
+
+    def client(branch_id: int) -> None:
+        with grpc.insecure_channel(DEFAULT_REGISTRY.address_of(branch_id)) as channel:
+            stub = banking_pb2_grpc.BranchStub(channel)
+            for n in range(withdrawals):
+                request = banking_pb2.BranchRequest(
+                    interface="withdraw", money=10, type="customer", id=branch_id, event_id=branch_id * 1000 + n
+                )
+                statuses.append(stub.MsgDelivery(request).request_status or "none")
+
+    with cluster(num_branches, balance=balance, max_workers=num_branches + 2, ordering=ordering) as branches:
+        threads = [threading.Thread(target=client, args=(b.id,)) for b in branches]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for b in branches:
+            b.wait_idle()
+        balances = sorted({b.balance for b in branches})
+    return {
+        "min_balance": balances[0],
+        "max_balance": balances[-1],
+        **{f"status_{s}": statuses.count(s) for s in sorted(set(statuses))},
+    }
+
+
+def run(num_clients: int = 8, events_per_client: int = 100, num_branches: int = 3) -> dict:
+    results = {}
+    for ordering in ("immediate", "total"):
+        with cluster(num_branches, max_workers=num_clients + 2, ordering=ordering):
+            results[ordering] = deposit_throughput(1, num_clients, events_per_client)
+        results[ordering]["overdraft"] = overdraft(ordering)
+    return {"benchmark": "ordering", "clients": num_clients, "branches": num_branches, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--branches", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.clients, args.events, args.branches), indent=4))
@@ -0,0 +1,39 @@
+"""
+Events/sec of a single customer session with one request at a time vs. pipelined MsgDeliveryStream windows.
+
+    python -m benchmarks.pipelining --branches 3 --events 500 --windows 1 4 16 64
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import cluster
+from customer import Customer
+
+
+def run(num_branches: int = 3, num_events: int = 500, windows: tuple = (1, 4, 16, 64)) -> dict:
+    results = {}
+    first_event_id = 1
+    with cluster(num_branches, max_workers=4):
+        for window in windows:
+            events = [
+                {"interface": "deposit", "money": 1, "id": event_id}
+                for event_id in range(first_event_id, first_event_id + num_events)
+            ]
+            first_event_id += num_events
+
+            customer = Customer(1, events, window=window)
+            start = time.perf_counter()
+            customer.create_stub()
+            elapsed = time.perf_counter() - start
+            results[f"window_{window}"] = {"events_per_sec": num_events / elapsed, "elapsed_sec": elapsed}
+    return {"benchmark": "pipelining", "branches": num_branches, "events": num_events, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--branches", type=int, default=3)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+    print(json.dumps(run(args.branches, args.events, tuple(args.windows)), indent=4))
@@ -0,0 +1,85 @@
+"""
+Query throughput and latency while the same branch is busy with deposits: queries sent through MsgDelivery
+(sharing the branch server's worker pool with writes and propagations) vs. the dedicated query server.
+
+    python -m benchmarks.reads --branches 3 --writers 4 --readers 8 --duration 3
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+
+import grpc
+import banking_pb2
+import banking_pb2_grpc
+
+from benchmarks.common import cluster, summarize
+from membership import DEFAULT_REGISTRY
+
+
+def _writer(stop: threading.Event, event_ids: "itertools.count") -> None:
+    with grpc.insecure_channel(DEFAULT_REGISTRY.address_of(1)) as channel:
+        stub = banking_pb2_grpc.BranchStub(channel)
+        while not stop.is_set():
+            stub.MsgDelivery(
+                banking_pb2.BranchRequest(interface="deposit", money=1, type="customer", id=1, event_id=next(event_ids))
+            )
+
+
+def _reader(stop: threading.Event, fast_path: bool, samples: list) -> None:
+    address = DEFAULT_REGISTRY.read_address_of(1) if fast_path else DEFAULT_REGISTRY.address_of(1)
+    with grpc.insecure_channel(address) as channel:
+        if fast_path:
+            call = banking_pb2_grpc.BranchReaderStub(channel).Query
+        else:
+            call = banking_pb2_grpc.BranchStub(channel).MsgDelivery
+        request = banking_pb2.BranchRequest(interface="query", type="customer", id=1)
+        while not stop.is_set():
+            start = time.perf_counter()
+            call(request)
+            samples.append(time.perf_counter() - start)
+
+
+def run(
+    num_branches: int = 3,
+    num_writers: int = 4,
+    num_readers: int = 8,
+    duration: float = 3.0,
+    read_workers: int = 8,
+) -> dict:
+    results = {}
+    event_ids = itertools.count(1)
+    for label, fast_path in (("msg_delivery", False), ("query_server", True)):
+        with cluster(num_branches, read_workers=read_workers if fast_path else None):
+            stop = threading.Event()
+            per_reader = [[] for _ in range(num_readers)]
+            threads = [threading.Thread(target=_writer, args=(stop, event_ids)) for _ in range(num_writers)]
+            threads += [threading.Thread(target=_reader, args=(stop, fast_path, s)) for s in per_reader]
+            for t in threads:
+                t.start()
+            time.sleep(duration)
+            stop.set()
+            for t in threads:
+                t.join()
+
+            samples = [s for reader_samples in per_reader for s in reader_samples]
+            results[label] = {"queries_per_sec": len(samples) / duration, **summarize(samples)}
+    return {
+        "benchmark": "reads",
+        "branches": num_branches,
+        "writers": num_writers,
+        "readers": num_readers,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--branches", type=int, default=3)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--read-workers", type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(run(args.branches, args.writers, args.readers, args.duration, args.read_workers), indent=4))
@@ -0,0 +1,90 @@
+"""
+Live event log memory and sub-event throughput with and without retention, and the cost of reading archived
+sub-events back (full history rebuild, lookups by event id and by clock range).
+
+    python -m benchmarks.retention --events 500000 --retain 10000
+"""
+import argparse
+import json
+import logging
+import shutil
+import tempfile
+import time
+
+from branch import Event
+from retention import Retention
+
+
+class _LoggedBranch(Event):
+    def __init__(self, _id: int):
+        super().__init__()
+        self.id = _id
+
+
+def _fill(branch: Event, num_events: int) -> float:
+    """Records `num_events` sub-events (6 per event id, like a customer event) and returns sub-events per second"""
+    start = time.perf_counter()
+    for n in range(num_events):
+        branch.record_sub_event(n // 6, "deposit_propagate_execute", method_order_number=4)
+    elapsed = time.perf_counter() - start
+    if branch.retention is not None:
+        # let the last background compaction finish
+        while branch._compacting.locked():
+            time.sleep(0.001)
+    return num_events / elapsed
+
+
+def run(num_events: int = 500_000, retain_events: int = 10_000) -> dict:
+    logging.disable(logging.CRITICAL)
+    directory = tempfile.mkdtemp()
+    try:
+        results = {}
+        plain = _LoggedBranch(1)
+        results["plain_sub_events_per_sec"] = _fill(plain, num_events)
+        results["plain_live_bytes"] = plain.events.nbytes()
+
+        for mode in ("archive", "summary"):
+            branch = _LoggedBranch(1)
+            branch.enable_retention(Retention(mode, f"{directory}/branch-1"), retain_events)
+            results[f"{mode}_sub_events_per_sec"] = _fill(branch, num_events)
+            results[f"{mode}_live_sub_events"] = len(branch.events)
+            results[f"{mode}_live_bytes"] = branch.events.nbytes() + branch.retention.nbytes()
+
+        # read the whole history back, then look up single events / clock ranges in the archive
+        branch = _LoggedBranch(1)
+        branch.enable_retention(Retention("archive", f"{directory}/branch-2"), retain_events)
+        _fill(branch, num_events)
+        archive = branch.retention.archive
+        results["archive_segments"] = len(archive.segments)
+
+        start = time.perf_counter()
+        history = branch.retention.history(branch.events)
+        results["history_rebuild_sec"] = time.perf_counter() - start
+        assert history.raw()[:4] == plain.events.raw()[:4]
+
+        # event ids and clocks spread over the archived part of the history
+        lookups = 100
+        archived_ids = len(archive) // 6
+        event_ids = [archived_ids * n // lookups for n in range(lookups)]
+        start = time.perf_counter()
+        for event_id in event_ids:
+            list(archive.iter_tracked(event_id))
+        results["event_id_lookups_per_sec"] = lookups / (time.perf_counter() - start)
+
+        clocks = [1 + len(archive) * n // lookups for n in range(lookups)]
+        start = time.perf_counter()
+        for clock in clocks:
+            list(archive.between(clock, clock + 99))
+        results["clock_range_lookups_per_sec"] = lookups / (time.perf_counter() - start)
+        return {"benchmark": "retention", "results": results}
+    finally:
+        shutil.rmtree(directory)
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--retain", type=int, default=10_000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.events, args.retain), indent=4))
@@ -0,0 +1,43 @@
+"""
+Simulated sub-events/sec of the in-memory discrete-event engine (no servers, no threads) for growing clusters.
+
+    python -m benchmarks.simulation --branches 10 100 1000 --events 2000
+"""
+import argparse
+import json
+import time
+
+from simulation import Simulation
+from workload import generate_workload, parse_mix
+
+
+def run(branch_counts: tuple = (10, 100, 1000), num_events: int = 2_000, jitter: float = 0.001) -> dict:
+    results = {}
+    for num_branches in branch_counts:
+        # `num_events` customer events in total, spread over one customer per branch
+        data = generate_workload(
+            num_branches=num_branches,
+            num_customers=num_branches,
+            events_per_customer=max(1, num_events // num_branches),
+            mix=parse_mix("deposit=0.6,withdraw=0.4"),
+            seed=0,
+        )
+        start = time.perf_counter()
+        stats = Simulation(data, jitter=jitter).run()
+        elapsed = time.perf_counter() - start
+        results[f"branches_{num_branches}"] = {
+            **stats,
+            "elapsed_sec": elapsed,
+            "sub_events_per_sec": stats["sub_events"] / elapsed,
+            "messages_per_sec": stats["messages"] / elapsed,
+        }
+    return {"benchmark": "simulation", "events": num_events, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--branches", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--events", type=int, default=2_000)
+    parser.add_argument("--jitter", type=float, default=0.001)
+    args = parser.parse_args()
+    print(json.dumps(run(tuple(args.branches), args.events, args.jitter), indent=4))
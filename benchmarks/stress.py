@@ -0,0 +1,90 @@
+"""
+Concurrency stress check for the clock / balance core of `Event` and for a running cluster.
+Exits with a non-zero status if a clock value repeats or goes backwards, or if a balance is off.
+
+    python -m benchmarks.stress --threads 8 --events 20000
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+
+from branch import Event
+from benchmarks.common import cluster, deposit_throughput
+
+
+def check_clocks(branch_events: list) -> bool:
+    """Clocks in a branch's event log must be strictly increasing (which also means unique)"""
+    clocks = [e["clock"] for e in branch_events]
+    return all(a < b for a, b in zip(clocks, clocks[1:]))
+
+
+def stress_event(num_threads: int, events_per_thread: int) -> dict:
+    """Hammers a single Event from several threads with request/execute sub-events"""
+    logging.disable(logging.CRITICAL)
+    event = Event()
+    barrier = threading.Barrier(num_threads)
+
+    def worker(index: int) -> None:
+        barrier.wait()
+        for n in range(events_per_thread):
+            event_id = index * events_per_thread + n
+            event.event_request_1(event_id=event_id, interface="deposit", remote_clock=n)
+            event.event_execute_2(event_id=event_id, interface="deposit", amount=1)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    logging.disable(logging.NOTSET)
+
+    expected = num_threads * events_per_thread
+    return {
+        "sub_events_per_sec": 2 * expected / elapsed,
+        "monotonic_clocks": check_clocks(event.branch_events),
+        "balance_ok": event.balance == expected,
+    }
+
+
+def stress_cluster(num_clients: int, events_per_client: int) -> dict:
+    """Concurrent customers on branch 1 of a 3-branch cluster; every replica must end with the same balance"""
+    with cluster(3, balance=0, max_workers=num_clients + 2) as branches:
+        stats = deposit_throughput(1, num_clients, events_per_client)
+        expected = num_clients * events_per_client
+        return {
+            "events_per_sec": stats["events_per_sec"],
+            "monotonic_clocks": all(check_clocks(b.branch_events) for b in branches),
+            "balance_ok": all(b.balance == expected for b in branches),
+        }
+
+
+def passed(results: dict) -> bool:
+    """Whether every part of a stress run kept its clocks monotonic and its balances right"""
+    return all(r["monotonic_clocks"] and r["balance_ok"] for r in results.values())
+
+
+def run(num_threads: int = 8, num_events: int = 20000, num_clients: int = 8, cluster_events: int = 100) -> dict:
+    return {
+        "benchmark": "stress",
+        "results": {
+            "event": stress_event(num_threads, num_events),
+            "cluster": stress_cluster(num_clients, cluster_events),
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--cluster-events", type=int, default=100)
+    args = parser.parse_args()
+    output = run(args.threads, args.events, args.clients, args.cluster_events)
+    print(json.dumps(output, indent=4))
+    sys.exit(0 if passed(output["results"]) else 1)
@@ -0,0 +1,29 @@
+"""
+Propagation latency over loopback TCP vs. Unix domain sockets (same host).
+
+    python -m benchmarks.transport --branches 3 --events 300
+"""
+import argparse
+import json
+import tempfile
+
+from benchmarks.common import cluster, summarize, time_deposits
+from membership import PortRangeRegistry, UnixSocketRegistry
+
+
+def run(num_branches: int = 3, num_events: int = 300) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, registry in (("tcp_loopback", PortRangeRegistry()), ("unix_socket", UnixSocketRegistry(tmp))):
+            with cluster(num_branches, registry=registry):
+                time_deposits(1, 20, registry=registry)  # warm-up
+                results[label] = summarize(time_deposits(1, num_events, first_event_id=100, registry=registry))
+    return {"benchmark": "transport", "branches": num_branches, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--branches", type=int, default=3)
+    parser.add_argument("--events", type=int, default=300)
+    args = parser.parse_args()
+    print(json.dumps(run(args.branches, args.events), indent=4))
@@ -0,0 +1,62 @@
+"""
+Write-ahead log append throughput and recovery time, scaled to one million sub-events.
+
+    python -m benchmarks.wal --events 1000000
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from branch import Event
+
+
+def _fill(path_prefix: str, num_events: int, snapshot_every: int, fsync: bool) -> float:
+    """Logs `num_events` sub-events (plus a balance change per event) and returns the elapsed time"""
+    event = Event()
+    event.enable_persistence(path_prefix, snapshot_every=snapshot_every, fsync=fsync)
+    start = time.perf_counter()
+    for n in range(num_events):
+        event.event_propagate_execute_4(event_id=n // 8, interface="deposit", amount=1)
+    event.wal.wait_durable(event.wal.tail)
+    elapsed = time.perf_counter() - start
+    event.close_persistence()
+    return elapsed
+
+
+def _recover(path_prefix: str) -> float:
+    start = time.perf_counter()
+    Event().enable_persistence(path_prefix)
+    return time.perf_counter() - start
+
+
+def run(num_events: int = 1_000_000, fsync: bool = True) -> dict:
+    logging.disable(logging.CRITICAL)
+    per_million = 1_000_000 / num_events
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # no snapshot: recovery replays the whole log
+        full = os.path.join(tmp, "full")
+        elapsed = _fill(full, num_events, snapshot_every=1 << 62, fsync=fsync)
+        results["append"] = {
+            "events_per_sec": num_events / elapsed,
+            "wal_bytes_per_event": os.path.getsize(f"{full}.wal") / num_events,
+        }
+        results["recover_full_replay_sec_per_million"] = _recover(full) * per_million
+
+        # a snapshot every ~5% of the log: recovery loads the snapshot and replays only the tail
+        snap = os.path.join(tmp, "snap")
+        _fill(snap, num_events, snapshot_every=os.path.getsize(f"{full}.wal") // 20, fsync=fsync)
+        results["recover_snapshot_tail_sec_per_million"] = _recover(snap) * per_million
+    logging.disable(logging.NOTSET)
+    return {"benchmark": "wal", "events": num_events, "fsync": fsync, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--no-fsync", action="store_true")
+    args = parser.parse_args()
+    print(json.dumps(run(args.events, fsync=not args.no_fsync), indent=4))
@@ -0,0 +1,53 @@
+"""
+Size and encode / decode cost of the v1 and v2 customer messages, and the precision v1's float32 amounts lose.
+
+    python -m benchmarks.wire
+"""
+import argparse
+import json
+
+import banking_pb2
+import banking_v2_pb2
+import wire
+from benchmarks.common import ops_per_sec
+
+
+def _messages(money: float, balance: float) -> dict:
+    """(v1, v2) customer request and reply for the same deposit"""
+    event = {"id": 4242, "interface": "deposit", "money": money, "account": 17}
+    v1_request = banking_pb2.BranchRequest(
+        interface="deposit", money=money, type="customer", id=3, event_id=4242, clock=1500, account=17
+    )
+    reply = dict(interface="deposit", balance=balance, id=1, clock=1503, event_id=4242, request_status="success")
+    return {
+        "request": (v1_request, wire.customer_request(event, 3, 1500)),
+        "reply": (banking_pb2.BranchReply(**reply, account=17), wire.reply_v2(**reply, account=17)),
+    }
+
+
+def run(number: int = 100_000, balance: float = 1_234_567.89) -> dict:
+    results = {}
+    for name, (v1, v2) in _messages(170, balance).items():
+        for version, message in (("v1", v1), ("v2", v2)):
+            encoded = message.SerializeToString()
+            results[f"{name}_{version}_bytes"] = len(encoded)
+            results[f"{name}_{version}_encode_per_sec"] = ops_per_sec(message.SerializeToString, number)
+            results[f"{name}_{version}_decode_per_sec"] = ops_per_sec(
+                lambda: type(message).FromString(encoded), number
+            )
+
+    # what a large balance reads back as on each wire
+    v1_balance = banking_pb2.BranchReply.FromString(banking_pb2.BranchReply(balance=balance).SerializeToString())
+    v2_balance = banking_v2_pb2.Reply.FromString(banking_v2_pb2.Reply(balance=wire.to_minor(balance)).SerializeToString())
+    results["balance"] = balance
+    results["balance_v1_error"] = abs(v1_balance.balance - balance)
+    results["balance_v2_error"] = abs(wire.from_minor(v2_balance.balance) - balance)
+    return {"benchmark": "wire", "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=100_000)
+    parser.add_argument("--balance", type=float, default=1_234_567.89)
+    args = parser.parse_args()
+    print(json.dumps(run(args.number, args.balance), indent=4))
@@ -1,16 +1,62 @@
-import copy
-import json
+import asyncio
+import functools
+import io
+import itertools
 import logging
-from collections import defaultdict
-from typing import Union, Literal, Any, Optional
+import os
+import threading
+import time
+from concurrent import futures
+from typing import Union, Literal, Any, Callable, Optional, Dict, Iterator, List, Tuple
 
 import grpc
+import analytics
 import banking_pb2
 import banking_pb2_grpc
+import banking_v2_pb2
+import banking_v2_pb2_grpc
+import export
+from anti_entropy import OpLog
+from batching import BatchFailed, PropagationBatcher
+from channel_pool import ChannelPool, PeerUnavailable
+from event_log import BranchEventsView, EventLog, EventTrackerView
+from ledger import ShardedLedger
+from membership import DEFAULT_REGISTRY, Registry
+from metrics import BranchMetrics, PhaseTimer
+from resilience import AdmissionControl, CircuitBreaker, CircuitOpen, RetryPolicy
+from retention import BranchHistory, Retention, full_events
+from total_order import OrderAborted, OrderQueue, OrderSender, OrderTimeout, PendingOperation
+from tracing import tracer
+from vector_clock import VectorClock
+import wal
+import wire
+
+
+def signed_amount(interface: Literal["deposit", "withdraw"], amount: Union[int, float]) -> Union[int, float]:
+    """Balance delta of a deposit / withdrawal"""
+    if interface == "withdraw":
+        return -amount
+    if interface != "deposit":
+        raise ValueError("Invalid interface")
+    return amount
+
+
+def message_vector(message: Any) -> Optional[VectorClock]:
+    """Vector clock carried by a BranchRequest / BranchReply (None if the sender doesn't track one)"""
+    if not message.vclock_ids:
+        return None
+    return VectorClock.decode(message.vclock_ids, message.vclock_counters)
 
 
 class Event:
-    """Helper class for organizing sub-events"""
+    """
+    Helper class for organizing sub-events
+    Note:
+        Sub-events may be triggered from several gRPC worker threads at once. The clock tick and the append to the
+        event logs happen together under one short lock (so logs stay in clock order and no clock value repeats),
+        and the branch balance is updated under the same lock, so a clock and the balance at that clock are always
+        published together. Formatting and logging happen outside the lock.
+    """
 
     def __init__(self):
         # keep track of the local clock
@@ -19,54 +65,432 @@ class Event:
         # replica of the Branch's balance
         self.balance = 0
 
-        # will keep track of branch events as they come in
-        self.branch_events = []
+        # balances of the customer accounts (account 0 is `balance` itself)
+        self.ledger = ShardedLedger()
+
+        # compact storage of every sub-event; 'branch_events' and 'event_tracker' are views over it
+        self.events = EventLog()
+
+        # guards local_clock, the event logs and balance
+        self._clock_lock = threading.Lock()
+
+        # (balance, clock) pair readers can take without a lock; replaced as a whole whenever the clock ticks, and
+        # readers that need a newer clock wait on `_clock_advanced`
+        self.read_snapshot = (self.balance, self.local_clock)
+        self._clock_advanced = threading.Condition(self._clock_lock)
+        self._clock_waiters = 0
+
+        # optional write-ahead log of every state change (see `enable_persistence`)
+        self.wal = None
+        self._snapshot_path = None
+        self._snapshot_every = 0
+        self._snapshot_offset = 0
+        self._snapshot_lock = threading.Lock()
+
+        # event log rows already written in snapshot chunks, and how many chunks there are (-1 rows: start over)
+        self._snapshot_rows = 0
+        self._snapshot_chunks = 0
+
+        # deposits / withdrawals applied so far, by origin branch (only tracked when anti-entropy is enabled)
+        self.op_log = None
+
+        # optional vector clock kept next to the Lamport clock (see `enable_vector_clock`)
+        self.vector_clock = None
+        self._vector_owner = None
+
+        # optional bound on the live event log (see `enable_retention`); a compaction is started once the log
+        # reaches `_compact_at` sub-events (0: never automatically)
+        self.retention = None
+        self._retain_events = 0
+        self._compact_at = 0
 
-        # will keep track of sub-events organized by event id
-        self.event_tracker = defaultdict(list)
+        # held from when a compaction is scheduled until it finished (at most one at a time)
+        self._compacting = threading.Lock()
+
+    @property
+    def branch_events(self) -> BranchEventsView:
+        """Branch events as they came in ({"id", "name", "clock"} entries)"""
+        return BranchEventsView(self.events)
+
+    @property
+    def event_tracker(self) -> EventTrackerView:
+        """Sub-events organized by event id ({"name", "clock"} entries)"""
+        return EventTrackerView(self.events)
 
     def _propagate_to_branches(
         self,
         amount: Union[int, float],
         propagate_type: Literal["deposit", "withdraw"],
         event_id: int,
+        account: int = 0,
     ) -> None:
         """Place holder for propagate to branches"""
         pass
 
-    def update_branch_balance(self, interface: Literal["deposit", "withdraw"], amount: Union[int, float]) -> None:
-        """Updates branch balance given a "deposit" or "withdraw" interface"""
-        if interface == "withdraw":
-            self.balance -= amount
-        elif interface == "deposit":
-            self.balance += amount
-        else:
-            raise ValueError("Invalid interface")
+    def update_branch_balance(
+        self,
+        interface: Literal["deposit", "withdraw"],
+        amount: Union[int, float],
+        op: Optional[Tuple[int, int]] = None,
+        account: int = 0,
+    ) -> None:
+        """
+        Updates branch balance (or a customer account's) given a "deposit" or "withdraw" interface
+        Note:
+            `op` is the (event id, origin branch) of the operation, logged together with the balance change.
+        """
+        if account:
+            self._apply_account(interface, amount, op, account)
+            return
+        with self._clock_lock:
+            self._apply_balance(interface, amount, op)
+            self._publish()
+
+    def _apply_balance(
+        self,
+        interface: Literal["deposit", "withdraw"],
+        amount: Union[int, float],
+        op: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        """Applies a balance change (caller must hold the clock lock)"""
+        amount = signed_amount(interface, amount)
+        self.balance += amount
+        if self.wal is not None:
+            self.wal.append_balance(amount, *(op or ()))
+
+    def _apply_account(
+        self,
+        interface: Literal["deposit", "withdraw"],
+        amount: Union[int, float],
+        op: Optional[Tuple[int, int]],
+        account: int,
+    ) -> None:
+        """Applies a change to a customer account (takes the account's ledger shard lock)"""
+        amount = signed_amount(interface, amount)
+        log = None
+        if self.wal is not None:
+            log = functools.partial(self.wal.append_balance, amount, *(op or (None, 0)), account=account)
+        self.ledger.apply(account, amount, log)
 
-    def update_local_clock(self, remote_clock: int = None) -> None:
+    def balance_of(self, account: int = 0) -> float:
+        """Current balance of a customer account (account 0: the branch's own balance)"""
+        return self.ledger.balance(account) if account else self.balance
+
+    def _publish(self) -> None:
+        """Publishes the current (balance, clock) pair to readers (caller must hold the clock lock)"""
+        self.read_snapshot = (self.balance, self.local_clock)
+        if self._clock_waiters:
+            self._clock_advanced.notify_all()
+
+    def read_balance(self, min_clock: int = 0, timeout: Optional[float] = None) -> Tuple[float, int, bool]:
         """
-        Helper method that updates the branch's local clock when a sub-event gets triggered.
+        Returns (balance, clock the balance reflects, whether the clock reached `min_clock`).
         Note:
-            Takes an optional "remote_clock" param which will be used to compare against the local clock.
-            Max is selected if present.
+            The common case is a single lock-free read of the published snapshot. Only when the caller asks for a
+            clock the branch hasn't reached yet does it wait (at most `timeout` seconds) for the clock to advance.
         """
+        balance, clock = self.read_snapshot
+        if clock >= min_clock:
+            return balance, clock, True
+
+        with self._clock_lock:
+            self._clock_waiters += 1
+            try:
+                reached = self._clock_advanced.wait_for(lambda: self.read_snapshot[1] >= min_clock, timeout)
+            finally:
+                self._clock_waiters -= 1
+        balance, clock = self.read_snapshot
+        return balance, clock, reached
+
+    def claim_op(
+        self,
+        origin: int,
+        event_id: int,
+        interface: Literal["deposit", "withdraw"],
+        money: Union[int, float],
+        account: int = 0,
+    ) -> bool:
+        """Returns False if the operation was already applied (always True when operations aren't tracked)"""
+        return self.op_log is None or self.op_log.add(origin, event_id, interface, money, account, self.local_clock)
+
+    def _tick(self, remote_clock: Optional[int] = None) -> int:
+        """Advances the local clock and returns the new value (caller must hold the clock lock)"""
         if remote_clock:
             self.local_clock = max(self.local_clock, remote_clock) + 1
         else:
             self.local_clock += 1
+        return self.local_clock
+
+    def update_local_clock(self, remote_clock: int = None) -> int:
+        """
+        Helper method that updates the branch's local clock when a sub-event gets triggered.
+        Note:
+            Takes an optional "remote_clock" param which will be used to compare against the local clock.
+            Max is selected if present. Returns the new clock value.
+        """
+        with self._clock_lock:
+            clock = self._tick(remote_clock)
+            if self.wal is not None:
+                # the clock may be sent out (e.g. in a reply), so a recovered clock must not be lower
+                self.wal.append_clock(clock)
+            self._publish()
+        return clock
+
+    def enable_vector_clock(self, owner: int) -> None:
+        """
+        Also tracks a vector clock (with `owner` as this process' entry) and stores it with every logged sub-event.
+        Note:
+            The Lamport clock and the output format are unchanged; the vectors live in `events.vectors` and make
+            it possible to tell causally related sub-events apart from concurrent ones (see vector_clock.py).
+        """
+        with self._clock_lock:
+            self.vector_clock = VectorClock()
+            self._vector_owner = owner
+            self.events.vectors = [()] * len(self.events)
+
+    def vector_fields(self) -> Dict[str, list]:
+        """Current vector clock as BranchRequest / BranchReply fields (empty in Lamport-only mode)"""
+        if self.vector_clock is None:
+            return {}
+        with self._clock_lock:
+            ids, counters = self.vector_clock.encode()
+        return {"vclock_ids": ids, "vclock_counters": counters}
 
     def log_event(self, event: dict, method_order_number: int, add_to_branch_events: bool = True) -> None:
         """Log events into a branch's 'branch_events' and 'event_tracker' logs"""
-        logging.debug(f"event {method_order_number}: {event}")
+        with self._clock_lock:
+            self._append_event(event["id"], event["name"], event["clock"], add_to_branch_events)
+
+        if tracer.isEnabledFor(logging.DEBUG):
+            tracer.debug(
+                "sub_event", getattr(self, "id", None), event["id"], event["name"], event["clock"], method_order_number
+            )
+
+    def record_sub_event(
+        self,
+        event_id: int,
+        name: str,
+        method_order_number: int,
+        remote_clock: Optional[int] = None,
+        remote_vector: Optional[VectorClock] = None,
+        balance_change: Optional[tuple] = None,
+    ) -> int:
+        """
+        Atomically ticks the local clock and logs the sub-event with the resulting clock value
+        Note:
+            `balance_change` ((interface, amount, op, account), see `update_branch_balance`) is applied in the same
+            step, before the new clock is published, so a reader that sees a clock also sees the balance change made
+            at that clock, for the branch balance and for customer accounts alike (an account change also takes the
+            account's ledger shard lock, inside the clock lock).
+        """
+        with self._clock_lock:
+            clock = self._tick(remote_clock)
+            if self.vector_clock is not None:
+                if remote_vector is not None:
+                    self.vector_clock.merge(remote_vector)
+                self.vector_clock.tick(self._vector_owner)
+            self._append_event(event_id, name, clock)
+            if balance_change is not None:
+                if balance_change[3]:
+                    self._apply_account(*balance_change)
+                else:
+                    self._apply_balance(*balance_change[:3])
+            self._publish()
+
+        # no formatting on the hot path: the trace pipeline (if enabled) formats on its own thread
+        if tracer.isEnabledFor(logging.DEBUG):
+            tracer.debug("sub_event", getattr(self, "id", None), event_id, name, clock, method_order_number)
+        if self.wal is not None and self.wal.tail - self._snapshot_offset >= self._snapshot_every:
+            self._schedule_snapshot()
+        if self._compact_at and len(self.events) >= self._compact_at:
+            self._schedule_compaction()
+        return clock
+
+    def _append_event(self, event_id: int, name: str, clock: int, add_to_branch_events: bool = True) -> None:
+        """Adds a sub-event to the event log and the write-ahead log (caller must hold the clock lock)"""
+        known_names = len(self.events.names)
+        row = self.events.append(event_id, name, clock, add_to_branch_events)
+        if self.events.vectors is not None:
+            self.events.vectors.append(self.vector_clock.frozen())
+        if self.wal is not None:
+            code = self.events.name_codes[row]
+            if code >= known_names:
+                self.wal.append_name(code, name)
+            self.wal.append_sub_event(event_id, code, clock)
+
+    def enable_retention(self, retention: Retention, retain_events: Optional[int] = None) -> None:
+        """
+        Takes old sub-events out of the live event log with `retention` (archived or summarized, see retention.py).
+        Note:
+            With `retain_events`, a background compaction starts whenever the log holds twice that many sub-events
+            and keeps the newest `retain_events` of them, or more if peers haven't acknowledged them yet (see
+            `acknowledged_clock`). `compact` can also be called directly with any watermark.
+        """
+        if retain_events is not None and retain_events < 1:
+            raise ValueError("Invalid number of retained events")
+        self.retention = retention
+        self._retain_events = retain_events or 0
+        self._compact_at = 2 * self._retain_events
+
+    def acknowledged_clock(self) -> Optional[int]:
+        """Clock below which every peer has acknowledged this branch's sub-events (None if that isn't tracked)"""
+        return None
 
-        # add to current branch's event log
-        if add_to_branch_events:
-            self.branch_events.append(event)
+    def compact(self, watermark: int) -> int:
+        """Moves the sub-events with a clock below `watermark` out of the live event log; returns how many"""
+        with self.retention.lock:
+            with self._clock_lock:
+                rows = self.events.rows_before(watermark)
+                if not rows:
+                    return 0
+                compacted = self.events.split(rows)
+                # the remaining rows were renumbered, so the next snapshot writes them again
+                self._snapshot_rows = -1
+            self.retention.store(compacted)
+        if self.op_log is not None:
+            # operations applied before the watermark are no longer deduplicated or sent to peers
+            self.op_log.prune(watermark)
+        if self.wal is not None:
+            # so a recovery starts from a snapshot without the compacted sub-events
+            self.take_snapshot()
+        return rows
 
-        # add to event tracker
-        event = copy.copy(event)
-        event_id = event.pop("id")
-        self.event_tracker[event_id].append(event)
+    def _schedule_compaction(self) -> None:
+        """Compacts on a background thread unless a compaction is already running"""
+        if not self._compacting.acquire(blocking=False):
+            return
+        events = self.events
+        watermark = events.clocks[len(events) - self._retain_events]
+        acknowledged = self.acknowledged_clock()
+        if acknowledged is not None:
+            watermark = min(watermark, acknowledged)
+        threading.Thread(target=self._compact_in_background, args=(watermark,), daemon=True).start()
+
+    def _compact_in_background(self, watermark: int) -> None:
+        try:
+            self.compact(watermark)
+        finally:
+            # next compaction once `retain_events` more sub-events came in (also when little could be compacted)
+            self._compact_at = len(self.events) + self._retain_events
+            self._compacting.release()
+
+    def enable_persistence(self, path_prefix: str, snapshot_every: int = 1 << 20, fsync: bool = True) -> bool:
+        """
+        Recovers the clock, balance and event log from "<path_prefix>.snap" + "<path_prefix>.wal" (if present)
+        and appends every later change to the write-ahead log. Returns True if existing state was recovered.
+        Note:
+            A snapshot is written in the background every `snapshot_every` bytes of log, so a restart only needs
+            to replay the tail of the log that came after the latest snapshot.
+        """
+        wal_path, self._snapshot_path = f"{path_prefix}.wal", f"{path_prefix}.snap"
+        self._snapshot_every = snapshot_every
+        recovered = self._recover(wal_path)
+
+        self.wal = wal.WriteAheadLog(wal_path, fsync=fsync)
+        if not recovered:
+            # log the starting balance so a replay from an empty state ends up with the same balance
+            self.wal.append_balance(self.balance)
+        return recovered
+
+    def _recover(self, wal_path: str) -> bool:
+        """Loads the latest snapshot and replays the log tail after it (memory-mapped)"""
+        snapshot = wal.read_snapshot(self._snapshot_path)
+        if snapshot is None and not os.path.exists(wal_path):
+            return False
+
+        offset, self.local_clock, self.balance, self.events = 0, 0, 0, EventLog()
+        if snapshot is not None:
+            offset, self.local_clock, self.balance = snapshot["offset"], snapshot["clock"], snapshot["balance"]
+            chunks = snapshot["event_chunks"]
+            self.events = EventLog.from_parts(
+                [wal.read_snapshot(f"{self._snapshot_path}.{n}") for n in range(chunks)]
+            )
+            self._snapshot_rows, self._snapshot_chunks = len(self.events), chunks
+            self.ledger.restore(snapshot.get("accounts", {}))
+            if self.op_log is not None:
+                self.op_log.restore(snapshot.get("ops", ()))
+        self._snapshot_offset = offset
+
+        events, names = self.events, self.events.names
+        for kind, a, b, c, amount, extra, end in wal.replay(wal_path, offset):
+            if kind == wal.SUB_EVENT:
+                events.append(a, names[b], c)
+                self.local_clock = max(self.local_clock, c)
+            elif kind == wal.BALANCE:
+                # c is 0 for untracked changes to the branch balance, else the account + 1
+                account = max(c - 1, 0)
+                if account:
+                    self.ledger.apply(account, amount)
+                else:
+                    self.balance += amount
+                if a and self.op_log is not None:
+                    interface = "withdraw" if amount < 0 else "deposit"
+                    self.op_log.add(b, a, interface, abs(amount), account, self.local_clock)
+            elif kind == wal.NAME:
+                events.name_code(extra.decode())
+            elif kind == wal.CLOCK:
+                self.local_clock = max(self.local_clock, c)
+            offset = end
+
+        if self.retention is not None:
+            if snapshot is not None:
+                self.retention.restore(snapshot.get("retention"))
+            # sub-events compacted after the snapshot was taken came back with the log replay
+            if events.split(events.rows_before(self.retention.last_clock + 1))[2]:
+                self._snapshot_rows = -1
+
+        # drop a torn record left by a crash so new records are appended after the last intact one
+        if os.path.exists(wal_path) and os.path.getsize(wal_path) > offset:
+            os.truncate(wal_path, offset)
+        self.read_snapshot = (self.balance, self.local_clock)
+        return True
+
+    def take_snapshot(self) -> None:
+        """
+        Writes a snapshot of the clock, balances and event log.
+        Note:
+            The event log is append-only, so a snapshot only copies (under the locks) and writes the rows added
+            since the previous one, as a new chunk file ("<snapshot>.<n>") that the snapshot lists. Only after a
+            compaction, which renumbers the rows, are the live rows written again from chunk 0.
+        """
+        if self.wal is None:
+            return
+        with self._snapshot_lock:
+            with self._clock_lock, self.ledger.locked():
+                start, chunks = self._snapshot_rows, self._snapshot_chunks
+                if start < 0:
+                    start, chunks = 0, 0
+                chunk = self.events.raw(start) if len(self.events) > start else None
+                if chunk is not None:
+                    chunks += 1
+                self._snapshot_rows, self._snapshot_chunks = len(self.events), chunks
+                state = {
+                    "offset": self.wal.tail,
+                    "clock": self.local_clock,
+                    "balance": self.balance,
+                    "accounts": self.ledger.raw(),
+                    "event_chunks": chunks,
+                    "ops": self.op_log.raw() if self.op_log is not None else [],
+                    "retention": self.retention.raw() if self.retention is not None else None,
+                }
+            self.wal.wait_durable(state["offset"])
+            if chunk is not None:
+                # written before the snapshot that lists it
+                wal.write_snapshot(f"{self._snapshot_path}.{chunks - 1}", chunk)
+            wal.write_snapshot(self._snapshot_path, state)
+            self._snapshot_offset = state["offset"]
+
+    def _schedule_snapshot(self) -> None:
+        """Takes a snapshot on a background thread unless one is already running"""
+        if not self._snapshot_lock.locked():
+            self._snapshot_offset = self.wal.tail  # don't schedule again while this one runs
+            threading.Thread(target=self.take_snapshot, daemon=True).start()
+
+    def close_persistence(self) -> None:
+        """Flushes and closes the write-ahead log"""
+        if self.wal is not None:
+            with self._snapshot_lock:
+                self.wal.close()
 
     # NOTE:
     #   The following set of methods is defined in the same order they are expected to be called
@@ -82,73 +506,90 @@ class Event:
         The Branch process selects the larger value between the local clock and the remote clock from the message,
         and increments one from the selected value.
         """
-        self.update_local_clock(remote_clock)
-        event = {"id": event_id, "name": f"{interface}_request", "clock": self.local_clock}
-        self.log_event(event, method_order_number=1)
+        self.record_sub_event(event_id, f"{interface}_request", method_order_number=1, remote_clock=remote_clock)
 
     def event_execute_2(
         self,
         event_id: int,
         interface: Literal["deposit", "withdraw"],
         amount: Union[int, float],
+        propagate: bool = True,
+        origin: Optional[int] = None,
+        account: int = 0,
     ) -> None:
         """
         This sub-event happens when the Branch process executes the event after the sub-event “Event_Request”.
         The Branch process increments one from its local clock.
+        Note:
+            Callers that propagate on their own (e.g. the asyncio servicer) pass propagate=False.
         """
-        self.update_local_clock()
-        event = {"id": event_id, "name": f"{interface}_execute", "clock": self.local_clock}
-        self.log_event(event, method_order_number=2)
-
-        # update local branch balance then propagate to other branches
-        self.update_branch_balance(interface=interface, amount=amount)
-        self._propagate_to_branches(amount=amount, propagate_type=interface, event_id=event_id)
+        # update local branch balance (together with the clock tick) then propagate to other branches
+        op = (event_id, origin) if origin is not None else None
+        self.record_sub_event(
+            event_id, f"{interface}_execute", method_order_number=2, balance_change=(interface, amount, op, account)
+        )
+        if propagate:
+            self._propagate_to_branches(amount=amount, propagate_type=interface, event_id=event_id, account=account)
 
     def event_propagate_request_3(
         self,
         event_id: int,
         interface: Literal["deposit", "withdraw"],
         remote_clock: int,
+        remote_vector: Optional[VectorClock] = None,
     ) -> None:
         """
         This sub-event happens when the Branch process sends the propagation request to its fellow branch processes.
         The Branch process increments one from its local clock.
         """
-        self.update_local_clock(remote_clock)
-        event = {"id": event_id, "name": f"{interface}_propagate_request", "clock": self.local_clock}
-        self.log_event(event, method_order_number=3)
+        self.record_sub_event(
+            event_id,
+            f"{interface}_propagate_request",
+            method_order_number=3,
+            remote_clock=remote_clock,
+            remote_vector=remote_vector,
+        )
 
     def event_propagate_execute_4(
         self,
         event_id: int,
         interface: Literal["deposit", "withdraw"],
         amount: Union[int, float],
+        origin: Optional[int] = None,
+        account: int = 0,
     ) -> None:
         """
         This sub-event happens when the Branch process executes the event after the sub-event “Propogate_Request”.
         The Branch process increments one from its local clock.
         """
-        self.update_local_clock()
-        event = {"id": event_id, "name": f"{interface}_propagate_execute", "clock": self.local_clock}
-        self.log_event(event, method_order_number=4)
-
-        # update local branch balance
-        self.update_branch_balance(interface=interface, amount=amount)
+        # update local branch balance (together with the clock tick)
+        op = (event_id, origin) if origin is not None else None
+        self.record_sub_event(
+            event_id,
+            f"{interface}_propagate_execute",
+            method_order_number=4,
+            balance_change=(interface, amount, op, account),
+        )
 
     def event_propagate_response_5(
         self,
         event_id: int,
         interface: Literal["deposit", "withdraw"],
         remote_clock: int,
+        remote_vector: Optional[VectorClock] = None,
     ) -> None:
         """
         This sub-event happens when the Branch receives the result of the sub-event “Propogate_Execute” from its
         fellow branches. The Branch process selects the biggest value between the local clock and the remote clock
         from the message, and increments one from the selected value.
         """
-        self.update_local_clock(remote_clock)
-        event = {"id": event_id, "name": f"{interface}_propagate_response", "clock": self.local_clock}
-        self.log_event(event, method_order_number=5)
+        self.record_sub_event(
+            event_id,
+            f"{interface}_propagate_response",
+            method_order_number=5,
+            remote_clock=remote_clock,
+            remote_vector=remote_vector,
+        )
 
     def event_response_6(self) -> None:
         """
@@ -160,7 +601,39 @@ class Event:
 
 
 class Branch(banking_pb2_grpc.BranchServicer, Event):
-    def __init__(self, _id: int, balance: int, branches: list):
+    def __init__(
+        self,
+        _id: int,
+        balance: int,
+        branches: list,
+        pooled_channels: bool = True,
+        fanout: Literal["sequential", "parallel"] = "sequential",
+        batch_size: int = 1,
+        batch_linger: float = 0.002,
+        wal_dir: Optional[str] = None,
+        snapshot_every: int = 1 << 20,
+        registry: Registry = DEFAULT_REGISTRY,
+        clock_mode: Literal["lamport", "vector"] = "lamport",
+        anti_entropy_interval: Optional[float] = None,
+        read_timeout: float = 1.0,
+        metrics_sample_every: int = 16,
+        rpc_timeout: Optional[float] = None,
+        propagation_attempts: int = 2,
+        breaker_threshold: Optional[int] = None,
+        breaker_reset: float = 1.0,
+        max_in_flight: Optional[int] = None,
+        max_queued: int = 0,
+        queue_timeout: float = 0.0,
+        ledger_shards: int = 16,
+        propagation_shards: int = 1,
+        ordering: Literal["immediate", "total"] = "immediate",
+        order_linger: float = 0.001,
+        order_timeout: float = 10.0,
+        order_attempts: int = 100,
+        retain_events: Optional[int] = None,
+        retention: Literal["archive", "summary"] = "archive",
+        archive_dir: Optional[str] = None,
+    ):
         super().__init__()
 
         # keep track of the local clock
@@ -171,40 +644,516 @@ class Branch(banking_pb2_grpc.BranchServicer, Event):
 
         # replica of the Branch's balance
         self.balance = balance
+        self.read_snapshot = (balance, 0)
+
+        # replicas of the customer account balances, in shards that are locked independently
+        self.ledger = ShardedLedger(ledger_shards)
 
         # the list of process IDs of the branches (excluding current one)
         self.branches = branches
 
-        # will keep track of branch events as they come in
-        self.branch_events = []
+        # where the other branches can be reached
+        self.registry = registry
+
+        # long-lived channels to the other branches (None means a new channel is opened per propagation); a
+        # channel that is still connecting is waited for up to the propagation deadline
+        self.channel_pool = (
+            ChannelPool(address_for=registry.address_of, ready_timeout=rpc_timeout or 5.0) if pooled_channels else None
+        )
+
+        # "sequential" calls one peer after another, "parallel" sends to all peers at once
+        if fanout not in ("sequential", "parallel"):
+            raise ValueError("Invalid fanout mode")
+        self.fanout = fanout
+        self._fanout_executor = (
+            futures.ThreadPoolExecutor(max_workers=max(1, len(branches))) if fanout == "parallel" else None
+        )
+
+        # with batch_size > 1, propagations to the same peer are coalesced into MsgDeliveryBatch calls that are
+        # sent once `batch_size` are pending or after `batch_linger` seconds (trading latency for throughput).
+        # Each peer gets `propagation_shards` batchers and an operation goes to the one of its account's shard, so
+        # batches for different accounts are sent (and applied by the peer) in parallel, while the operations on
+        # one account keep their order
+        if propagation_shards < 1:
+            raise ValueError("Invalid number of propagation shards")
+        self._batchers = {}
+        if batch_size > 1:
+            if self.channel_pool is None:
+                raise ValueError("Batched propagation requires pooled channels")
+            self._batchers = {
+                receiver: [
+                    PropagationBatcher(
+                        sender_id=_id,
+                        get_stub=lambda receiver=receiver: self.channel_pool.ready_stub(receiver),
+                        get_clock=lambda: self.local_clock,
+                        batch_size=batch_size,
+                        linger=batch_linger,
+                        timeout=rpc_timeout,
+                    )
+                    for _ in range(propagation_shards)
+                ]
+                for receiver in branches
+            }
+
+        # "immediate" applies a customer operation right away and then propagates it. "total" multicasts it with a
+        # (Lamport clock, branch id) timestamp and every branch applies the operations in timestamp order (see
+        # `total_order.py`), so all of them take the same decisions, e.g. which withdrawals would overdraw. Every
+        # branch of a cluster must use the same mode
+        if ordering not in ("immediate", "total"):
+            raise ValueError("Invalid ordering mode")
+        self.ordering = ordering
+        self._order_lock = threading.Lock()
+        self._order_queue = OrderQueue(branches)
+        self._order_pending: Dict[int, PendingOperation] = {}
+        self._order_received: Dict[int, int] = {}
+        self._order_senders: Dict[int, OrderSender] = {}
+
+        # peer a sender gave up on: the order can't make progress anymore (see `_order_failed`)
+        self._order_broken: Optional[int] = None
+        # how long (seconds) a customer operation may wait for its place in the order before the call fails with
+        # UNAVAILABLE, and how many times a batch is sent to an unresponsive peer before giving up on it
+        self.order_timeout = order_timeout
+        if ordering == "total":
+            if self.channel_pool is None:
+                raise ValueError("Total ordering requires pooled channels")
+            if anti_entropy_interval is not None:
+                raise ValueError("Total ordering does not support anti-entropy")
+            self._order_senders = {
+                receiver: OrderSender(
+                    sender_id=_id,
+                    get_stub=lambda receiver=receiver: self.channel_pool.ready_stub(receiver),
+                    lock=self._order_lock,
+                    get_clock=lambda: self.local_clock,
+                    on_reply=lambda requests, reply, receiver=receiver: self._order_acked(receiver, requests, reply),
+                    linger=order_linger,
+                    timeout=rpc_timeout,
+                    retry_policy=RetryPolicy(attempts=order_attempts),
+                    on_failed=lambda receiver=receiver: self._order_failed(receiver),
+                )
+                for receiver in branches
+            }
+
+        # deadline (seconds) of every propagation call, and how many times a call that failed with a retryable
+        # status is attempted (retries are safe: receivers drop operations they already applied, by event id)
+        self.rpc_timeout = rpc_timeout
+        self.retry_policy = RetryPolicy(attempts=propagation_attempts)
+
+        # with a breaker threshold, a peer that failed that many propagations in a row is skipped (fail fast) for
+        # `breaker_reset` seconds before it is tried again
+        self._breakers = {}
+        if breaker_threshold is not None:
+            self._breakers = {receiver: CircuitBreaker(breaker_threshold, breaker_reset) for receiver in branches}
+
+        # with max_in_flight, customer requests beyond that many at once wait up to `queue_timeout` seconds (at most
+        # `max_queued` of them) and are then rejected with RESOURCE_EXHAUSTED, keeping workers free for propagations
+        self.admission = (
+            AdmissionControl(max_in_flight, max_queued=max_queued, queue_timeout=queue_timeout)
+            if max_in_flight is not None else None
+        )
+
+        # longest a query waits for the clock to reach its `min_clock` before answering with a "stale" status
+        self.read_timeout = read_timeout
+
+        # number of MsgDelivery calls currently being handled (used to detect when the branch is idle)
+        self.in_flight = 0
+        self._idle = threading.Condition()
+
+        # counters, gauges and sampled per-phase latencies (one request in `metrics_sample_every` is timed)
+        self.metrics = BranchMetrics(_id, sample_every=metrics_sample_every)
+        self.metrics.gauge("in_flight", lambda: self.in_flight)
+        self.metrics.gauge("clock", lambda: self.local_clock)
+        if self._batchers:
+            self.metrics.gauge("propagation_queue_depth", lambda: sum(b.pending for b in self._all_batchers()))
+        if self._order_senders:
+            self.metrics.gauge("order_queue_depth", lambda: len(self._order_queue))
+
+        # with an anti-entropy interval, applied operations are tracked and the branch periodically compares digests
+        # with one peer after another (`sync_with`) to pull whatever propagations it missed
+        self.anti_entropy_interval = anti_entropy_interval
+        self._stop_sync = threading.Event()
+        self._sync_thread = None
+        if anti_entropy_interval is not None or rpc_timeout is not None or self.retry_policy.attempts > 1:
+            # applied operations are also what receivers deduplicate retried propagations by (a call that failed
+            # or timed out may still have been applied)
+            self.op_log = OpLog()
+
+        # "vector" additionally tracks a vector clock that is piggybacked on every branch-to-branch message
+        if clock_mode not in ("lamport", "vector"):
+            raise ValueError("Invalid clock mode")
+        if clock_mode == "vector":
+            if wal_dir is not None:
+                raise ValueError("Vector clock mode does not support persistence")
+            self.enable_vector_clock(owner=_id)
+
+        # with retain_events (or an archive directory), old sub-events leave the live event log: "archive" moves
+        # them to "<archive_dir>/branch-<id>-*.seg" (BranchDebugger reads them back), "summary" keeps per-event-id
+        # summaries only. An earlier archive is kept only if the branch recovers from a write-ahead log
+        if retain_events is not None or archive_dir is not None:
+            prefix = None
+            if archive_dir is not None:
+                os.makedirs(archive_dir, exist_ok=True)
+                prefix = os.path.join(archive_dir, f"branch-{_id}")
+            fresh = wal_dir is None or not os.path.exists(os.path.join(wal_dir, f"branch-{_id}.wal"))
+            self.enable_retention(Retention(retention, prefix, fresh=fresh), retain_events)
+
+        # persist state changes to "<wal_dir>/branch-<id>.wal" and recover from it on restart
+        if wal_dir is not None:
+            os.makedirs(wal_dir, exist_ok=True)
+            self.enable_persistence(os.path.join(wal_dir, f"branch-{_id}"), snapshot_every=snapshot_every)
+
+        if anti_entropy_interval is not None and branches:
+            self._sync_thread = threading.Thread(target=self._anti_entropy_loop, daemon=True)
+            self._sync_thread.start()
+
+    def close(self) -> None:
+        """Releases the channels, fan-out threads and write-ahead log held by the branch"""
+        self._stop_sync.set()
+        if self._sync_thread is not None:
+            self._sync_thread.join()
+        for batcher in self._all_batchers():
+            batcher.close()
+        for sender in self._order_senders.values():
+            sender.close()
+        self.close_persistence()
+        if self._fanout_executor is not None:
+            self._fanout_executor.shutdown(wait=False)
+        if self.channel_pool is not None:
+            self.channel_pool.close()
+
+    def _all_batchers(self) -> Iterator[PropagationBatcher]:
+        return itertools.chain.from_iterable(self._batchers.values())
+
+    @property
+    def v1_only(self) -> bool:
+        """Whether operations leave this branch only as v1 messages (total order, batches and anti-entropy)"""
+        return self.ordering == "total" or bool(self._batchers) or self.anti_entropy_interval is not None
+
+    def acknowledged_clock(self) -> Optional[int]:
+        # in total-order mode every peer has sent a timestamp at least this large, so it has seen everything before
+        if self.ordering == "total" and self.branches:
+            return min(self._order_queue.seen.values())
+        return None
+
+    def _enter(self) -> None:
+        with self._idle:
+            self.in_flight += 1
+
+    def _exit(self) -> None:
+        with self._idle:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until no request is being handled by the branch; returns False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self.in_flight, timeout)
 
     def MsgDelivery(
         self,
         request: Any,
         context: Any,
-        request_status: Optional[str] = None
+        request_status: Optional[str] = None,
+        reply_type: Callable[..., Any] = banking_pb2.BranchReply,
     ) -> Any:
-        """Processes the requests received from other processes and returns results to requested process."""
+        """
+        Processes the requests received from other processes and returns results to requested process.
+        Note:
+            The reply is built by `reply_type` from the fields of a BranchReply (`wire.reply_v2` for v2 requests).
+        """
+        if request.interface == "query":
+            return self.Query(request, context, reply_type)
+
+        admission = self.admission if request.type == "customer" else None
+        if admission is not None and not admission.try_acquire():
+            self.metrics.incr("rejected")
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"Branch {self.id} is overloaded")
+
+        self.metrics.incr("requests")
+        timer = self.metrics.timer()
+        self._enter()
+        try:
+            return self._deliver(request, request_status, timer, reply_type)
+        except OrderTimeout as e:
+            context.abort(grpc.StatusCode.UNAVAILABLE, str(e))
+        finally:
+            self._exit()
+            if admission is not None:
+                admission.release()
+            if timer is not None:
+                timer.finish()
+
+    def MsgDeliveryStream(self, request_iterator: Iterator[Any], context: Any) -> Iterator[Any]:
+        """
+        Pipelined customer session: applies the requests one after another in arrival order and streams each
+        reply back as soon as it is done, so the customer doesn't pay a round trip per operation.
+        Note:
+            The session holds one server worker while it is open.
+        """
+        for request in request_iterator:
+            yield self.MsgDelivery(request, context)
 
+    def _read_wait(self, context: Any) -> float:
+        """How long a query may wait for its `min_clock` (never past the client's deadline)"""
+        remaining = context.time_remaining() if context is not None else None
+        return self.read_timeout if remaining is None else max(0.0, min(self.read_timeout, remaining))
+
+    def _query_reply(
+        self,
+        request: Any,
+        balance: float,
+        clock: int,
+        reached: bool,
+        reply_type: Callable[..., Any] = banking_pb2.BranchReply,
+    ) -> Any:
+        if tracer.isEnabledFor(logging.DEBUG):
+            tracer.debug("query", self.id, balance, clock, not reached)
+        return reply_type(
+            balance=balance,
+            id=self.id,
+            event_id=request.event_id,
+            interface=request.interface,
+            clock=clock,
+            request_status=None if reached else "stale",
+            account=request.account,
+        )
+
+    def Query(self, request: Any, context: Any, reply_type: Callable[..., Any] = banking_pb2.BranchReply) -> Any:
+        """
+        Answers a query from the published (balance, clock) snapshot without taking any lock.
+        Note:
+            With `min_clock` set, waits until the branch's clock has reached it (e.g. the clock of the customer's
+            last write) for at most `read_timeout` seconds; past that the reply carries the status "stale" and the
+            clock the returned balance actually reflects.
+        """
+        balance, clock, reached = self.read_balance(request.min_clock, self._read_wait(context))
+        self.metrics.incr("queries" if reached else "stale_queries")
+        if request.account:
+            balance = self.ledger.balance(request.account)
+
+        # writes are only acknowledged once they are on disk, so don't show a balance that isn't yet
+        if self.wal is not None:
+            self.wal.wait_durable(self.wal.tail)
+        return self._query_reply(request, balance, clock, reached, reply_type)
+
+    def _deliver(
+        self,
+        request: Any,
+        request_status: Optional[str] = None,
+        timer: Optional[PhaseTimer] = None,
+        reply_type: Callable[..., Any] = banking_pb2.BranchReply,
+    ) -> Any:
         if request.interface in ["deposit", "withdraw"]:
-            if request.type == "customer":
-                self.deposit_or_withdraw(request)
+            if request.type == "customer" and self.ordering == "total":
+                request_status = self.deposit_or_withdraw_ordered(request, timer)
+            elif request.type == "customer":
+                if self.deposit_or_withdraw(request, timer):
+                    # applied here, but not every peer acknowledged it
+                    request_status = "partial"
             elif request.type == "branch":
-                self.deposit_or_withdraw_propagate(request)
+                self.deposit_or_withdraw_propagate(request, timer=timer)
 
-        elif request.interface == "query":
-            logging.info(f"\n*** Branch {self.id} received query request... Balance is ${self.balance}\n")
+        # group commit: only acknowledge once the changes made so far are on disk
+        if self.wal is not None:
+            self.wal.wait_durable(self.wal.tail)
 
-        return banking_pb2.BranchReply(
-            balance=self.balance,
+        return reply_type(
+            balance=self.balance_of(request.account),
             id=self.id,
             event_id=request.event_id,
             interface=request.interface,
             clock=self.local_clock,
             request_status=request_status,
+            account=request.account,
+            **self.vector_fields(),
         )
 
-    def _link_to_branch(
+    def MsgDeliveryBatch(self, request: Any, context: Any) -> Any:
+        """Applies a batch of propagations from another branch in order and returns one reply per request"""
+        self.metrics.incr("batches_received")
+        self._enter()
+        try:
+            return self._deliver_batch(request)
+        finally:
+            self._exit()
+
+    def _deliver_batch(self, request: Any) -> Any:
+        replies = []
+        for item in request.requests:
+            # the batch carries the sender's latest clock, which covers every request in it
+            self.deposit_or_withdraw_propagate(item, remote_clock=max(item.clock, request.clock))
+            replies.append(
+                banking_pb2.BranchReply(
+                    balance=self.balance_of(item.account),
+                    id=self.id,
+                    event_id=item.event_id,
+                    interface=item.interface,
+                    clock=self.local_clock,
+                    account=item.account,
+                    **self.vector_fields(),
+                )
+            )
+
+        return banking_pb2.BranchReplyBatch(id=self.id, clock=self.local_clock, replies=replies)
+
+    def OrderDelivery(self, request: Any, context: Any) -> Any:
+        """
+        Total-order mode: queues a peer's timestamped operations and notes its clock (an acknowledgement of every
+        operation with a lower timestamp), then applies whatever became deliverable
+        """
+        if self.ordering != "total":
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, f"Branch {self.id} is not in total-order mode")
+
+        self.metrics.incr("order_batches_received")
+        with self._order_lock:
+            if self._order_broken is not None:
+                # whatever is queued now could never be delivered; the sender gives up on us in turn
+                context.abort(grpc.StatusCode.UNAVAILABLE, self._broken_message())
+            # a retried batch (its reply was lost) was already queued
+            if request.sequence > self._order_received.get(request.id, 0):
+                self._order_received[request.id] = request.sequence
+                for item in request.requests:
+                    self.event_propagate_request_3(
+                        event_id=item.event_id,
+                        interface=item.interface,
+                        remote_clock=item.clock,
+                        remote_vector=message_vector(item),
+                    )
+                    self._enter()
+                    self._order_queue.push(item.clock, item.id, item)
+                self.metrics.observe_clock(request.id, request.clock, self.local_clock)
+                self._order_queue.observe(request.id, request.clock)
+
+                # acknowledge the new operations to every peer with the next batch (which carries a larger clock)
+                if request.requests:
+                    for sender in self._order_senders.values():
+                        sender.ack()
+                self._deliver_ordered()
+            clock = self.local_clock
+
+        return banking_pb2.BranchReply(id=self.id, clock=clock, **self.vector_fields())
+
+    def _digest_reply(self, request: Any) -> Any:
+        """This branch's digests for the buckets the caller of SyncDigests asks about"""
+        level = request.digests[0].level if request.digests else 0
+        buckets = [(d.origin, d.bucket) for d in request.digests] or None
+        return banking_pb2.DigestReply(
+            id=self.id,
+            digests=[
+                banking_pb2.SyncDigest(origin=origin, bucket=bucket, count=count, hash=h, level=level)
+                for origin, bucket, count, h in self.op_log.digests(level, buckets)
+            ],
+        )
+
+    def SyncDigests(self, request: Any, context: Any) -> Any:
+        """Anti-entropy: digests of one level of the bucket tree (see `sync_with`)"""
+        if self.op_log is None:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Anti-entropy is not enabled on this branch")
+        return self._digest_reply(request)
+
+    def _missing_ops(self, request: Any) -> Iterator[Any]:
+        """Operations of the buckets the caller of SyncOps found to differ"""
+        wanted = [(d.origin, d.level, d.bucket, d.count, d.hash) for d in request.digests]
+        for origin, event_id, interface, money, account in self.op_log.missing_from(wanted):
+            yield banking_pb2.BranchRequest(
+                interface=interface,
+                money=money,
+                type="branch",
+                id=origin,
+                clock=self.local_clock,
+                event_id=event_id,
+                account=account,
+            )
+
+    def SyncOps(self, request: Any, context: Any) -> Iterator[Any]:
+        """Anti-entropy: streams the deposits / withdrawals of the buckets the calling branch found to differ"""
+        if self.op_log is None:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Anti-entropy is not enabled on this branch")
+        yield from self._missing_ops(request)
+
+    def sync_with(self, peer: int, timeout: float = 10.0) -> int:
+        """
+        Runs one anti-entropy round against a peer and returns the number of missing operations applied.
+        Note:
+            The peer's top-level digests come back first; the children of the buckets that differ are asked for
+            next, one level per call, until the differing buckets are small enough to fetch their operations
+            (see `OpLog.differing`). Operations that were already applied (e.g. the live propagation won the race)
+            are dropped by event id.
+        """
+        if self.channel_pool is None:
+            with grpc.insecure_channel(self.registry.address_of(peer)) as channel:
+                return self._sync_with_stub(banking_pb2_grpc.BranchStub(channel), timeout)
+        return self._sync_with_stub(self.channel_pool.ready_stub(peer), timeout)
+
+    def _sync_with_stub(self, stub: Any, timeout: float) -> int:
+        # (origin, level, bucket) -> the peer's (count, hash) of every bucket to fetch
+        fetch = {}
+        level, asked = 0, []
+        while True:
+            request = banking_pb2.SyncRequest(
+                id=self.id,
+                clock=self.local_clock,
+                digests=[banking_pb2.SyncDigest(origin=origin, bucket=bucket, level=level) for origin, bucket in asked],
+            )
+            reply = stub.SyncDigests(request, timeout=timeout)
+            asked, found = self.op_log.differing(level, [(d.origin, d.bucket, d.count, d.hash) for d in reply.digests])
+            fetch.update({(origin, level, bucket): (count, h) for origin, bucket, count, h in found})
+            if not asked:
+                break
+            level += 1
+        if not fetch:
+            return 0
+
+        # with our own digests, so the peer skips buckets that match by the time it gets the request
+        digests = []
+        for origin, level, bucket in fetch:
+            count, h = self.op_log.digest(origin, level, bucket)
+            digests.append(banking_pb2.SyncDigest(origin=origin, bucket=bucket, count=count, hash=h, level=level))
+        request = banking_pb2.SyncRequest(id=self.id, clock=self.local_clock, digests=digests)
+        return self._apply_synced(stub.SyncOps(request, timeout=timeout), fetch)
+
+    def _apply_synced(self, items: Iterator[Any], fetch: Dict[Tuple[int, int, int], Tuple[int, int]]) -> int:
+        """Applies the operations a peer streamed for the fetched buckets that this branch is missing"""
+        streamed = {key: [] for key in fetch}
+        levels = sorted({level for _, level, _ in fetch})
+        for item in items:
+            for level in levels:
+                key = (item.id, level, self.op_log.bucket_of(item.event_id, level))
+                if key in streamed:
+                    streamed[key].append(item)
+                    break
+
+        applied = 0
+        for (origin, level, bucket), items in streamed.items():
+            event_ids = [item.event_id for item in items]
+            missing = set(self.op_log.to_apply(origin, level, bucket, fetch[(origin, level, bucket)], event_ids))
+            for item in items:
+                if item.event_id not in missing:
+                    continue
+                self._enter()
+                try:
+                    applied += self.deposit_or_withdraw_propagate(item)
+                finally:
+                    self._exit()
+        return applied
+
+    def _anti_entropy_loop(self) -> None:
+        """Background anti-entropy: one round every `anti_entropy_interval` seconds, peers in turn"""
+        peers = itertools.cycle(self.branches)
+        while not self._stop_sync.wait(self.anti_entropy_interval):
+            peer = next(peers)
+            try:
+                applied = self.sync_with(peer)
+            except (grpc.RpcError, RuntimeError) as e:
+                self.metrics.incr("sync_failures")
+                logging.debug(f"Branch {self.id} could not sync with branch {peer}: {e}")
+                continue
+            self.metrics.incr("sync_rounds")
+            if applied:
+                self.metrics.incr("ops_repaired", applied)
+                logging.info(f"Branch {self.id} repaired {applied} missed operations from branch {peer}")
+
+    def _send_to_branch(
         self,
         _id: int,
         receiver: int,
@@ -212,10 +1161,16 @@ class Branch(banking_pb2_grpc.BranchServicer, Event):
         money: Union[int, float],
         clock: int,
         event_id: int,
-    ) -> None:
-        """Helper that creates a gRPC channel to a specific branch"""
-        with grpc.insecure_channel(f"localhost:5005{receiver}") as channel:
-            stub = banking_pb2_grpc.BranchStub(channel)
+        vector: Optional[Dict[str, list]] = None,
+        account: int = 0,
+    ) -> Any:
+        """
+        Helper that sends a propagation request to a specific branch and returns its reply
+        Note:
+            An amount or clock that v1's float32 / int32 fields can't hold (from a v2 request) goes out as a v2
+            request, whose reply comes back as a `wire.ExactReply`.
+        """
+        if wire.fits_v1(money, clock, event_id):
             request = banking_pb2.BranchRequest(
                 interface=interface,
                 money=money,
@@ -223,69 +1178,699 @@ class Branch(banking_pb2_grpc.BranchServicer, Event):
                 id=_id,
                 clock=clock,
                 event_id=event_id,
+                account=account,
+                **(vector or {}),
             )
-            response = stub.MsgDelivery(request)
+        else:
+            request = wire.branch_request(_id, interface, money, clock, event_id, vector, account)
 
-            # propagate sub-event response
-            self.event_propagate_response_5(
-                event_id=response.event_id,
-                interface=response.interface,
-                remote_clock=response.clock,
-            )
+        breaker = self._admit_peer(receiver)
+        self.metrics.incr("propagations_sent")
+        delays = self.retry_policy.delays()
+        reconnect = False
+        while True:
+            try:
+                response = self._call_peer(receiver, request, reconnect)
+                break
+            except grpc.RpcError as e:
+                delay = next(delays, None) if self.retry_policy.retryable(e) else None
+                if delay is None:
+                    self.metrics.incr("propagation_failures")
+                    if breaker is not None:
+                        breaker.record_failure()
+                    raise
+                # the pooled connection may have gone away (e.g. peer restarted), so retry on a fresh channel
+                reconnect = e.code() == grpc.StatusCode.UNAVAILABLE
+            self.metrics.incr("propagation_retries")
+            time.sleep(delay)
+
+        if breaker is not None:
+            breaker.record_success()
+        return response
+
+    def _call_peer(self, receiver: int, request: Any, reconnect: bool = False) -> Any:
+        """One MsgDelivery call to a peer (v1 or v2, depending on the request), bounded by the propagation deadline"""
+        v2 = isinstance(request, banking_v2_pb2.Request)
+        if self.channel_pool is None:
+            with grpc.insecure_channel(self.registry.address_of(receiver)) as channel:
+                if v2:
+                    return wire.reply_from_v2(
+                        banking_v2_pb2_grpc.BranchStub(channel).MsgDelivery(request, timeout=self.rpc_timeout)
+                    )
+                return banking_pb2_grpc.BranchStub(channel).MsgDelivery(request, timeout=self.rpc_timeout)
+        if reconnect:
+            self.metrics.incr("reconnects")
+            self.channel_pool.reconnect(receiver)
+        try:
+            # a peer whose channel is down is skipped rather than called (and its channel reconnects by itself)
+            stub = self.channel_pool.ready_stub(receiver)
+        except PeerUnavailable:
+            self.metrics.incr("peers_skipped")
+            raise
+        if v2:
+            stub = banking_v2_pb2_grpc.BranchStub(self.channel_pool.channel(receiver))
+            return wire.reply_from_v2(stub.MsgDelivery(request, timeout=self.rpc_timeout))
+        return stub.MsgDelivery(request, timeout=self.rpc_timeout)
+
+    def _admit_peer(self, receiver: int) -> Optional[CircuitBreaker]:
+        """Returns the peer's circuit breaker (if any), raising CircuitOpen while it doesn't let calls through"""
+        breaker = self._breakers.get(receiver)
+        if breaker is not None and not breaker.allow():
+            self.metrics.incr("circuit_open")
+            raise CircuitOpen(f"Circuit to branch {receiver} is open")
+        return breaker
+
+    def _peer_failed(self, receiver: int, event_id: int, error: Exception) -> None:
+        logging.debug("Branch %s could not propagate event %s to branch %s: %s", self.id, event_id, receiver, error)
+
+    def _propagate_response(self, response: Any) -> None:
+        """Records a peer's reply to a propagation (sub-event 5)"""
+        self.metrics.observe_clock(response.id, response.clock, self.local_clock)
+        self.event_propagate_response_5(
+            event_id=response.event_id,
+            interface=response.interface,
+            remote_clock=response.clock,
+            remote_vector=message_vector(response),
+        )
+
+    def _link_to_branch(
+        self,
+        _id: int,
+        receiver: int,
+        interface: str,
+        money: Union[int, float],
+        clock: int,
+        event_id: int,
+        vector: Optional[Dict[str, list]] = None,
+        account: int = 0,
+    ) -> None:
+        """Helper that propagates to a specific branch and records its response"""
+        response = self._send_to_branch(_id, receiver, interface, money, clock, event_id, vector, account)
+
+        # propagate sub-event response
+        self._propagate_response(response)
 
     def _propagate_to_branches(
         self,
         amount: Union[int, float],
         propagate_type: Literal["deposit", "withdraw"],
         event_id: int,
-    ) -> None:
-        """Helper that propagates deposits or withdrawals to other branches"""
+        account: int = 0,
+    ) -> List[int]:
+        """
+        Helper that propagates deposits or withdrawals to other branches
+        Note:
+            Returns the peers that could not be reached (after retries, or skipped by an open circuit breaker).
+            The operation stays applied here; anti-entropy, when enabled, brings it to those peers later.
+        """
+        if self._batchers:
+            return self._propagate_in_batches(
+                amount=amount, propagate_type=propagate_type, event_id=event_id, account=account
+            )
 
-        for target_branch in self.branches:
-            self._link_to_branch(
-                _id=self.id,
-                receiver=target_branch,
-                interface=propagate_type,
-                money=amount,
-                clock=self.local_clock,
-                event_id=event_id,
+        if self.fanout == "parallel" and len(self.branches) > 1:
+            return self._propagate_in_parallel(
+                amount=amount, propagate_type=propagate_type, event_id=event_id, account=account
             )
 
-    def deposit_or_withdraw(self, request: Any) -> None:
-        """Initiate either a deposit or withdraw action for a branch-to-customer interface"""
+        unreached = []
+        for target_branch in self.branches:
+            try:
+                self._link_to_branch(
+                    _id=self.id,
+                    receiver=target_branch,
+                    interface=propagate_type,
+                    money=amount,
+                    clock=self.local_clock,
+                    event_id=event_id,
+                    vector=self.vector_fields(),
+                    account=account,
+                )
+            except (grpc.RpcError, CircuitOpen) as e:
+                self._peer_failed(target_branch, event_id, e)
+                unreached.append(target_branch)
+        return unreached
+
+    def _propagate_in_parallel(
+        self,
+        amount: Union[int, float],
+        propagate_type: Literal["deposit", "withdraw"],
+        event_id: int,
+        account: int = 0,
+    ) -> List[int]:
+        """
+        Sends the propagation to every peer at once.
+        Note:
+            All requests carry the clock of the execute sub-event. Replies are merged one at a time on this thread
+            (in arrival order) so every "propagate_response" still gets its own, strictly increasing clock value.
+        """
+        clock, vector = self.local_clock, self.vector_fields()
+        pending = {
+            self._fanout_executor.submit(
+                self._send_to_branch, self.id, target_branch, propagate_type, amount, clock, event_id, vector, account
+            ): target_branch
+            for target_branch in self.branches
+        }
+        unreached = []
+        for done in futures.as_completed(pending):
+            try:
+                response = done.result()
+            except (grpc.RpcError, CircuitOpen) as e:
+                self._peer_failed(pending[done], event_id, e)
+                unreached.append(pending[done])
+                continue
+            self._propagate_response(response)
+        return unreached
+
+    def _propagate_in_batches(
+        self,
+        amount: Union[int, float],
+        propagate_type: Literal["deposit", "withdraw"],
+        event_id: int,
+        account: int = 0,
+    ) -> List[int]:
+        """Queues the propagation on every peer's batcher and merges the replies as their batches complete"""
+        request = banking_pb2.BranchRequest(
+            interface=propagate_type,
+            money=amount,
+            type="branch",
+            id=self.id,
+            event_id=event_id,
+            account=account,
+            **self.vector_fields(),
+        )
+        unreached, pending = [], {}
+        for receiver, batchers in self._batchers.items():
+            batcher = batchers[account % len(batchers)]
+            try:
+                self._admit_peer(receiver)
+            except CircuitOpen as e:
+                self._peer_failed(receiver, event_id, e)
+                unreached.append(receiver)
+                continue
+            pending[batcher.submit(request)] = receiver
+        self.metrics.incr("propagations_sent", len(pending))
+
+        for done in futures.as_completed(pending):
+            receiver = pending[done]
+            breaker = self._breakers.get(receiver)
+            try:
+                response = done.result()
+            except (grpc.RpcError, BatchFailed) as e:
+                self.metrics.incr("propagation_failures")
+                if breaker is not None:
+                    breaker.record_failure()
+                self._peer_failed(receiver, event_id, e)
+                unreached.append(receiver)
+                continue
+            if breaker is not None:
+                breaker.record_success()
+            self._propagate_response(response)
+        return unreached
+
+    def deposit_or_withdraw(self, request: Any, timer: Optional[PhaseTimer] = None) -> List[int]:
+        """
+        Initiate either a deposit or withdraw action for a branch-to-customer interface
+        Note:
+            Returns the peers the operation could not be propagated to. With a `timer` (sampled requests), the
+            time spent in each phase is recorded in the branch metrics.
+        """
+        unreached = []
         # Invoke request
         self.event_request_1(
             event_id=request.event_id,
             interface=request.interface,
             remote_clock=request.clock,
         )
+        if timer is not None:
+            timer.lap("request")
 
-        # Execute and propagate request
-        self.event_execute_2(
-            event_id=request.event_id,
-            interface=request.interface,
-            amount=request.money,
-        )
+        # Execute and propagate request (a repeated event id has already been applied)
+        if self.claim_op(self.id, request.event_id, request.interface, request.money, request.account):
+            self.event_execute_2(
+                event_id=request.event_id,
+                interface=request.interface,
+                amount=request.money,
+                propagate=False,
+                origin=self.id,
+                account=request.account,
+            )
+            if timer is not None:
+                timer.lap("execute")
 
-        # Getting to this point means that no errors were observed and the customer request was successful
+            unreached = self._propagate_to_branches(
+                amount=request.money,
+                propagate_type=request.interface,
+                event_id=request.event_id,
+                account=request.account,
+            )
+            if timer is not None:
+                timer.lap("propagate")
+
+        # Getting to this point means that the customer request was applied (and acknowledged by every peer not in
+        # `unreached`)
         self.event_response_6()
+        if timer is not None:
+            timer.lap("response")
+        return unreached
 
-    def deposit_or_withdraw_propagate(self, request: Any) -> None:
-        """Initiate either a deposit or withdraw action for a branch-to-branch interface"""
+    def deposit_or_withdraw_propagate(
+        self,
+        request: Any,
+        remote_clock: Optional[int] = None,
+        timer: Optional[PhaseTimer] = None,
+    ) -> bool:
+        """
+        Initiate either a deposit or withdraw action for a branch-to-branch interface
+        Note:
+            Returns False if the operation had already been applied (e.g. repaired by anti-entropy first).
+        """
+        self.metrics.incr("propagations_received")
+        self.metrics.observe_clock(request.id, request.clock, self.local_clock)
+        if not self.claim_op(request.id, request.event_id, request.interface, request.money, request.account):
+            self.metrics.incr("duplicates_dropped")
+            return False
 
         # Invoke propagate request
         self.event_propagate_request_3(
             event_id=request.event_id,
             interface=request.interface,
-            remote_clock=request.clock,
+            remote_clock=request.clock if remote_clock is None else remote_clock,
+            remote_vector=message_vector(request),
         )
+        if timer is not None:
+            timer.lap("propagate_request")
 
         # Execute request
         self.event_propagate_execute_4(
             event_id=request.event_id,
             interface=request.interface,
             amount=request.money,
+            origin=request.id,
+            account=request.account,
+        )
+        if timer is not None:
+            timer.lap("propagate_execute")
+        return True
+
+    def deposit_or_withdraw_ordered(self, request: Any, timer: Optional[PhaseTimer] = None) -> str:
+        """
+        Total-order mode: timestamps a customer deposit / withdrawal, multicasts it and waits until it was applied
+        here (in timestamp order) and every peer acknowledged it
+        Note:
+            Returns the request status: "success", or "rejected" for a withdrawal that would have overdrawn the
+            account at that point of the total order (every branch rejects the same withdrawals). Raises
+            OrderTimeout if that takes longer than `order_timeout` seconds (e.g. a peer is down), so the worker is
+            freed; the operation keeps its place in the order and may still be applied. Raises OrderAborted once
+            the order stopped because a peer is unreachable.
+        """
+        pending = PendingOperation(request, acks=len(self._order_senders))
+        with self._order_lock:
+            if self._order_broken is not None:
+                raise OrderAborted(self._broken_message())
+            # ticking and queueing under the ordering lock: no batch can promise a clock above this timestamp
+            # before the operation is queued for every peer
+            self.event_request_1(event_id=request.event_id, interface=request.interface, remote_clock=request.clock)
+            timestamp = self.local_clock
+            message = banking_pb2.BranchRequest(
+                interface=request.interface,
+                money=request.money,
+                type="branch",
+                id=self.id,
+                clock=timestamp,
+                event_id=request.event_id,
+                account=request.account,
+                **self.vector_fields(),
+            )
+            self._order_pending[request.event_id] = pending
+            self._enter()
+            self._order_queue.push(timestamp, self.id, message)
+            for sender in self._order_senders.values():
+                sender.add(message)
+            self.metrics.incr("propagations_sent", len(self._order_senders))
+            self._deliver_ordered()
+        if timer is not None:
+            timer.lap("request")
+
+        done = pending.done.wait(self.order_timeout)
+        with self._order_lock:
+            del self._order_pending[request.event_id]
+        if pending.aborted:
+            raise OrderAborted(f"{self._broken_message()} (event {request.event_id} may have been applied)")
+        if not done:
+            self.metrics.incr("order_timeouts")
+            raise OrderTimeout(
+                f"Branch {self.id}: event {request.event_id} wasn't ordered and acknowledged within "
+                f"{self.order_timeout}s (it may still be applied)"
+            )
+        if timer is not None:
+            timer.lap("propagate")
+
+        self.event_response_6()
+        if timer is not None:
+            timer.lap("response")
+        return pending.status
+
+    def _order_acked(self, receiver: int, requests: list, reply: Any) -> None:
+        """
+        A peer answered one of our OrderDelivery batches: it has queued those operations
+        Note:
+            The reply's clock doesn't count towards delivery order: the peer may still have operations with lower
+            timestamps queued for us, so only its own OrderDelivery batches (FIFO) move `seen` forward.
+        """
+        with self._order_lock:
+            self.metrics.observe_clock(receiver, reply.clock, self.local_clock)
+            for item in requests:
+                self.event_propagate_response_5(
+                    event_id=item.event_id,
+                    interface=item.interface,
+                    remote_clock=reply.clock,
+                    remote_vector=message_vector(reply),
+                )
+                pending = self._order_pending.get(item.event_id)
+                if pending is not None:
+                    pending.acked()
+
+    def _order_failed(self, receiver: int) -> None:
+        """
+        A sender gave up on a peer (caller holds the ordering lock)
+        Note:
+            Nothing queued can become deliverable anymore without that peer, so the queue is dropped (which also
+            lets `wait_idle` return), the operations of this branch still waiting fail with UNAVAILABLE, and so do
+            later ones. Dropped operations of other branches may have been applied elsewhere.
+        """
+        if self._order_broken is not None:
+            return
+        self._order_broken = receiver
+        dropped = self._order_queue.clear()
+        self.metrics.incr("order_dropped", len(dropped))
+        logging.error(f"Branch {self.id}: total order stopped, peer {receiver} is unreachable")
+        for _ in dropped:
+            self._exit()
+        for pending in self._order_pending.values():
+            pending.abort()
+
+    def _broken_message(self) -> str:
+        return f"Branch {self.id}: the total order stopped, peer {self._order_broken} is unreachable"
+
+    def _deliver_ordered(self) -> None:
+        """Applies the queued operations that are stable, in timestamp order (caller holds the ordering lock)"""
+        for _, origin, item in self._order_queue.deliverable():
+            # deterministic: every branch sees the same balance here, so every branch takes the same decision
+            status = "success"
+            amount = item.money
+            if item.interface == "withdraw" and self.balance_of(item.account) < item.money:
+                # a rejected withdrawal is still executed (and logged) in its place, without changing the balance
+                status, amount = "rejected", 0
+                self.metrics.incr("withdrawals_rejected")
+
+            if origin == self.id:
+                self.event_execute_2(
+                    event_id=item.event_id,
+                    interface=item.interface,
+                    amount=amount,
+                    propagate=False,
+                    origin=origin,
+                    account=item.account,
+                )
+                pending = self._order_pending.get(item.event_id)
+                if pending is not None:
+                    pending.executed(status)
+            else:
+                self.metrics.incr("propagations_received")
+                self.event_propagate_execute_4(
+                    event_id=item.event_id,
+                    interface=item.interface,
+                    amount=amount,
+                    origin=origin,
+                    account=item.account,
+                )
+            self._exit()
+
+
+class AsyncBranch(Branch):
+    """
+    Branch servicer for grpc.aio servers.
+    Note:
+        Every request runs as a coroutine on the server's event loop, so nested propagations never hold a worker
+        thread and a single loop can keep thousands of requests in flight. The clock / event log logic is shared
+        with the synchronous Branch, so both produce the same output.
+    """
+
+    def __init__(self, _id: int, balance: int, branches: list, **kwargs):
+        super().__init__(_id=_id, balance=balance, branches=branches, pooled_channels=False, **kwargs)
+
+        # the thread pool is not needed, fan-out is done with coroutines
+        if self._fanout_executor is not None:
+            self._fanout_executor.shutdown(wait=False)
+            self._fanout_executor = None
+
+        # long-lived grpc.aio channels/stubs to the other branches (created lazily)
+        self._aio_channels = {}
+        self._aio_stubs = {}
+
+    def _aio_stub(self, receiver: int) -> Any:
+        """Returns the (pooled) grpc.aio stub of a branch"""
+        if receiver not in self._aio_stubs:
+            channel = grpc.aio.insecure_channel(self.registry.address_of(receiver))
+            self._aio_channels[receiver] = channel
+            self._aio_stubs[receiver] = banking_pb2_grpc.BranchStub(channel)
+        return self._aio_stubs[receiver]
+
+    async def aclose(self) -> None:
+        """Closes the grpc.aio channels held by the branch"""
+        for channel in self._aio_channels.values():
+            await channel.close()
+        self._aio_channels.clear()
+        self._aio_stubs.clear()
+
+    async def MsgDelivery(
+        self,
+        request: Any,
+        context: Any,
+        request_status: Optional[str] = None
+    ) -> Any:
+        """Processes the requests received from other processes and returns results to requested process."""
+        if request.interface == "query":
+            return await self.Query(request, context)
+
+        # the event loop must not block, so requests over the admission limit are shed right away (no queueing)
+        admission = self.admission if request.type == "customer" else None
+        if admission is not None and not admission.try_acquire(wait=False):
+            self.metrics.incr("rejected")
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"Branch {self.id} is overloaded")
+
+        self.metrics.incr("requests")
+        timer = self.metrics.timer()
+        self._enter()
+        try:
+            return await self._deliver_async(request, request_status, timer)
+        finally:
+            self._exit()
+            if admission is not None:
+                admission.release()
+            if timer is not None:
+                timer.finish()
+
+    async def MsgDeliveryStream(self, request_iterator: Any, context: Any) -> Any:
+        """Pipelined customer session: applies the requests in arrival order and streams back each reply"""
+        async for request in request_iterator:
+            yield await self.MsgDelivery(request, context)
+
+    async def Query(self, request: Any, context: Any) -> Any:
+        """Answers a query from the published snapshot, waiting (without blocking the loop) for `min_clock`"""
+        deadline = asyncio.get_running_loop().time() + self._read_wait(context)
+        balance, clock, reached = self.read_balance(request.min_clock, 0)
+        while not reached and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.001)
+            balance, clock, reached = self.read_balance(request.min_clock, 0)
+        self.metrics.incr("queries" if reached else "stale_queries")
+        if request.account:
+            balance = self.ledger.balance(request.account)
+        await self._wait_durable_async()
+        return self._query_reply(request, balance, clock, reached)
+
+    async def _wait_durable_async(self) -> None:
+        """Like the sync path, only acknowledge once the changes made so far are on disk (waits off the loop)"""
+        if self.wal is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.wal.wait_durable, self.wal.tail)
+
+    async def _deliver_async(
+        self,
+        request: Any,
+        request_status: Optional[str] = None,
+        timer: Optional[PhaseTimer] = None,
+    ) -> Any:
+        if request.interface in ["deposit", "withdraw"]:
+            if request.type == "customer":
+                if await self.deposit_or_withdraw_async(request, timer):
+                    request_status = "partial"
+            elif request.type == "branch":
+                self.deposit_or_withdraw_propagate(request, timer=timer)
+
+        await self._wait_durable_async()
+        return banking_pb2.BranchReply(
+            balance=self.balance_of(request.account),
+            id=self.id,
+            event_id=request.event_id,
+            interface=request.interface,
+            clock=self.local_clock,
+            request_status=request_status,
+            account=request.account,
+            **self.vector_fields(),
+        )
+
+    async def MsgDeliveryBatch(self, request: Any, context: Any) -> Any:
+        """Applies a batch of propagations from another branch in order and returns one reply per request"""
+        return Branch.MsgDeliveryBatch(self, request, context)
+
+    async def SyncDigests(self, request: Any, context: Any) -> Any:
+        """Anti-entropy: digests of one level of the bucket tree (see `sync_with`)"""
+        if self.op_log is None:
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Anti-entropy is not enabled on this branch")
+        return self._digest_reply(request)
+
+    async def SyncOps(self, request: Any, context: Any) -> Any:
+        """Anti-entropy: streams the deposits / withdrawals of the buckets the calling branch found to differ"""
+        if self.op_log is None:
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Anti-entropy is not enabled on this branch")
+        for item in self._missing_ops(request):
+            yield item
+
+    async def wait_idle_async(self) -> None:
+        """Waits (without blocking the event loop) until no request is being handled by the branch"""
+        while self.in_flight:
+            await asyncio.sleep(0.001)
+
+    async def _send_to_branch_async(
+        self,
+        receiver: int,
+        interface: str,
+        money: Union[int, float],
+        clock: int,
+        event_id: int,
+        vector: Optional[Dict[str, list]] = None,
+        account: int = 0,
+    ) -> Any:
+        """Helper that sends a propagation request to a specific branch and returns its reply"""
+        request = banking_pb2.BranchRequest(
+            interface=interface,
+            money=money,
+            type="branch",
+            id=self.id,
+            clock=clock,
+            event_id=event_id,
+            account=account,
+            **(vector or {}),
         )
+        breaker = self._admit_peer(receiver)
+        self.metrics.incr("propagations_sent")
+        delays = self.retry_policy.delays()
+        while True:
+            try:
+                response = await self._aio_stub(receiver).MsgDelivery(request, timeout=self.rpc_timeout)
+                break
+            except grpc.RpcError as e:
+                delay = next(delays, None) if self.retry_policy.retryable(e) else None
+                if delay is None:
+                    self.metrics.incr("propagation_failures")
+                    if breaker is not None:
+                        breaker.record_failure()
+                    raise
+            self.metrics.incr("propagation_retries")
+            await asyncio.sleep(delay)
+
+        if breaker is not None:
+            breaker.record_success()
+        return response
+
+    async def _propagate_to_branches_async(
+        self,
+        amount: Union[int, float],
+        propagate_type: Literal["deposit", "withdraw"],
+        event_id: int,
+        account: int = 0,
+    ) -> List[int]:
+        """
+        Helper that propagates deposits or withdrawals to other branches (sequentially or all at once)
+        Note:
+            Returns the peers that could not be reached.
+        """
+        async def reach(target_branch: int, clock: int, vector: Dict[str, list]) -> Tuple[int, Any]:
+            try:
+                return target_branch, await self._send_to_branch_async(
+                    target_branch, propagate_type, amount, clock, event_id, vector, account
+                )
+            except (grpc.RpcError, CircuitOpen) as e:
+                self._peer_failed(target_branch, event_id, e)
+                return target_branch, None
+
+        if self.fanout == "parallel":
+            clock, vector = self.local_clock, self.vector_fields()
+            replies = asyncio.as_completed([reach(target_branch, clock, vector) for target_branch in self.branches])
+        else:
+            replies = (reach(target_branch, self.local_clock, self.vector_fields()) for target_branch in self.branches)
+
+        unreached = []
+        for reply in replies:
+            target_branch, response = await reply
+            if response is None:
+                unreached.append(target_branch)
+            else:
+                self._propagate_response(response)
+        return unreached
+
+    async def deposit_or_withdraw_async(self, request: Any, timer: Optional[PhaseTimer] = None) -> List[int]:
+        """Initiate either a deposit or withdraw action for a branch-to-customer interface"""
+        unreached = []
+        self.event_request_1(
+            event_id=request.event_id,
+            interface=request.interface,
+            remote_clock=request.clock,
+        )
+        if timer is not None:
+            timer.lap("request")
+
+        # execute locally, then propagate without blocking the event loop (a repeated event id was already applied)
+        if self.claim_op(self.id, request.event_id, request.interface, request.money, request.account):
+            self.event_execute_2(
+                event_id=request.event_id,
+                interface=request.interface,
+                amount=request.money,
+                propagate=False,
+                origin=self.id,
+                account=request.account,
+            )
+            if timer is not None:
+                timer.lap("execute")
+
+            unreached = await self._propagate_to_branches_async(
+                amount=request.money,
+                propagate_type=request.interface,
+                event_id=request.event_id,
+                account=request.account,
+            )
+            if timer is not None:
+                timer.lap("propagate")
+
+        self.event_response_6()
+        if timer is not None:
+            timer.lap("response")
+        return unreached
+
+
+def serve_reader(branch: Branch, registry: Registry, max_workers: int) -> Any:
+    """
+    Starts a dedicated query server for a branch at its registry read address and returns it.
+    Note:
+        Every branch server also answers BranchReader.Query; a dedicated server has its own thread pool, so
+        queries never queue behind deposits, withdrawals and their propagations.
+    """
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    banking_pb2_grpc.add_BranchReaderServicer_to_server(branch, server)
+    registry.register_reader(branch.id, server.add_insecure_port(registry.read_bind_address(branch.id)))
+    server.start()
+    return server
 
 
 class BranchDebugger:
@@ -299,18 +1884,49 @@ class BranchDebugger:
         for b in self.branches:
             logging.info(f"\t- id: {b.id}, balance: {b.balance}")
 
+    def history(self) -> list:
+        """
+        The branches with their full event history.
+        Note:
+            Branches that archive old sub-events (see retention.py) have them read back from disk and put before
+            the live ones, so the output is the same as without retention. Summarized sub-events can't be rebuilt.
+        """
+        if all(getattr(b, "retention", None) is None for b in self.branches):
+            return self.branches
+        return [BranchHistory(b.id, full_events(b)) for b in self.branches]
+
     def output_logger(self) -> None:
-        # collect branch events
-        branch_events = [{"id": b.id, "data": b.branch_events} for b in self.branches]
+        # branch sections followed by event-id sections, rendered incrementally
+        output = io.StringIO()
+        export.write_json(self.history(), output)
+        logging.info(f"\nOutput:\n{output.getvalue()}")
 
-        # collect events from all branches and group them by event id
-        event_tracker = defaultdict(list)
-        for b in self.branches:
-            for event_id, sub_events in b.event_tracker.items():
-                event_tracker[event_id] += sub_events
+    def export(self, path: str, fmt: Literal["json", "ndjson"] = "ndjson") -> None:
+        """Streams the same output to a file section by section, without building it in memory first"""
+        export.export(self.history(), path, fmt)
+
+    def columns(self) -> analytics.EventColumns:
+        """Every sub-event of the branches as a columnar table (see `analytics.py`)"""
+        return analytics.EventColumns.from_branches(self.history())
 
-        events_by_event_ids = [{"eventid": _id, "data": sorted(data, key=lambda x: x["clock"]),}
-                               for _id, data in event_tracker.items()]
+    def log_analysis(self) -> None:
+        """Logs propagation lag and per-branch clock gap statistics, computed on the columnar event log"""
+        columns = self.columns()
+        lags = list(analytics.propagation_lag(columns).values())
+        if lags:
+            logging.info(
+                f"\nPropagation lag ({len(lags)} events): mean {sum(lags) / len(lags):.2f}, max {max(lags)} ticks"
+            )
+        logging.info("\nClock gaps:")
+        for branch_id, gaps in analytics.clock_gaps(columns).items():
+            logging.info(
+                f"\t- id: {branch_id}, sub-events: {gaps['sub_events']}, mean gap: {gaps['mean_gap']:.2f}, "
+                f"max gap: {gaps['max_gap']}, jumps: {gaps['jumps']}"
+            )
 
-        output = branch_events + events_by_event_ids
-        logging.info(f"\nOutput:\n{json.dumps(output, indent=4)}")
+    def log_concurrent_events(self) -> None:
+        """Logs which customer events executed concurrently (requires branches in vector-clock mode)"""
+        pairs = analytics.concurrent_events(self.columns())
+        logging.info(f"\nConcurrent events ({len(pairs)} pairs):")
+        for a, b in pairs:
+            logging.info(f"\t- {a} || {b}")
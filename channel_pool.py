@@ -0,0 +1,147 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import grpc
+import banking_pb2_grpc
+
+# states a channel settles in after a connection attempt (anything else is still connecting)
+_HEALTHY = (grpc.ChannelConnectivity.READY, grpc.ChannelConnectivity.IDLE)
+_FAILED = (grpc.ChannelConnectivity.TRANSIENT_FAILURE, grpc.ChannelConnectivity.SHUTDOWN)
+
+
+class PeerUnavailable(grpc.RpcError):
+    """A peer's channel is known to be down, so no call was made (handled like an UNAVAILABLE call)"""
+
+    def code(self) -> grpc.StatusCode:
+        return grpc.StatusCode.UNAVAILABLE
+
+    def details(self) -> str:
+        return str(self)
+
+
+class ChannelPool:
+    """
+    Keeps one long-lived gRPC channel (and its stub) per peer branch.
+    Note:
+        Channels are created lazily on first use and reused across MsgDelivery calls, so the TCP + HTTP/2
+        handshake is paid once per peer instead of once per propagated event. A channel reconnects by itself
+        after a peer went away, so it is only replaced when the peer's address changed. The replaced channel is
+        never closed while the pool is in use: other threads may still have calls in flight on it. The pool
+        tracks every channel's connectivity state, and `ready_stub` uses it to skip peers whose channel is down
+        instead of calling them; the channel keeps reconnecting in the background and is used again once READY.
+    """
+
+    def __init__(self, address_for: Callable[[int], str], ready_timeout: float = 5.0):
+        # maps a branch id to its "host:port" address
+        self.address_for = address_for
+
+        # how long `ready_stub` waits for a channel that is still connecting
+        self.ready_timeout = ready_timeout
+
+        # branch id -> (channel, stub), and the address the channel dials
+        self._channels: Dict[int, Any] = {}
+        self._stubs: Dict[int, Any] = {}
+        self._addresses: Dict[int, str] = {}
+
+        # channels replaced by `reconnect`, closed together with the pool
+        self._retired: List[Any] = []
+
+        # branch id -> last observed connectivity state (updated by gRPC in the background)
+        self._states: Dict[int, grpc.ChannelConnectivity] = {}
+        self._state_changed = threading.Condition()
+
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self, _id: int, address: Optional[str] = None) -> None:
+        """Creates the channel/stub pair for a branch (caller must hold the lock)"""
+        address = address or self.address_for(_id)
+        channel = grpc.insecure_channel(address)
+        self._channels[_id] = channel
+        self._addresses[_id] = address
+        # the state of a replaced channel says nothing about this one
+        self._states.pop(_id, None)
+        channel.subscribe(lambda state: self._on_state_change(_id, channel, state), try_to_connect=True)
+        self._stubs[_id] = banking_pb2_grpc.BranchStub(channel)
+
+    def _on_state_change(self, _id: int, channel: Any, state: grpc.ChannelConnectivity) -> None:
+        """Connectivity callback; ignores late notifications from channels that were already replaced"""
+        with self._state_changed:
+            if self._channels.get(_id) is not channel:
+                return
+            if state == grpc.ChannelConnectivity.IDLE and _id not in self._states:
+                # a new channel starts out IDLE, before its first connection attempt: that says nothing yet
+                return
+            self._states[_id] = state
+            self._state_changed.notify_all()
+
+    def get_stub(self, _id: int) -> Any:
+        """Returns the stub for a branch, creating its channel on first use"""
+        # lock-free fast path: pooled channels are only closed together with the pool
+        stub = self._stubs.get(_id)
+        if stub is not None:
+            return stub
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Channel pool is closed")
+            if _id not in self._stubs:
+                self._open(_id)
+            return self._stubs[_id]
+
+    def channel(self, _id: int) -> Any:
+        """The pooled channel to a branch, for stubs of other services (e.g. the v2 schema)"""
+        self.get_stub(_id)
+        return self._channels[_id]
+
+    def is_healthy(self, _id: int) -> bool:
+        """Health check: a channel is healthy once it is READY (or IDLE, which reconnects on the next call)"""
+        return self._states.get(_id) in _HEALTHY
+
+    def wait_ready(self, _id: int, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks while the channel to a branch is still connecting (at most `timeout` seconds, default
+        `ready_timeout`) and returns whether it is healthy; a channel that failed to connect returns False at once.
+        """
+        self.get_stub(_id)
+        with self._state_changed:
+            self._state_changed.wait_for(
+                lambda: self._states.get(_id) in _HEALTHY + _FAILED, timeout or self.ready_timeout
+            )
+        return self.is_healthy(_id)
+
+    def ready_stub(self, _id: int) -> Any:
+        """The stub for a branch if its channel is healthy (see `wait_ready`), else raises PeerUnavailable"""
+        stub = self.get_stub(_id)
+        if self._states.get(_id) in _HEALTHY or self.wait_ready(_id):
+            return stub
+        raise PeerUnavailable(f"Channel to branch {_id} is {getattr(self._states.get(_id), 'name', 'connecting')}")
+
+    def reconnect(self, _id: int) -> Any:
+        """
+        Returns a stub that dials the branch's current address.
+        Note:
+            If the registry now has another address for the branch (e.g. it restarted on a new port), the entry
+            is swapped to a new channel under the lock and the old channel is retired; otherwise the current
+            channel is kept, since it reconnects on its own.
+        """
+        address = self.address_for(_id)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Channel pool is closed")
+            if self._addresses.get(_id) != address:
+                logging.debug("Reconnecting channel to branch %s at %s", _id, address)
+                if _id in self._channels:
+                    self._retired.append(self._channels[_id])
+                self._open(_id, address)
+            return self._stubs[_id]
+
+    def close(self) -> None:
+        """Closes every pooled (and retired) channel; the pool cannot be used afterwards"""
+        with self._lock:
+            self._closed = True
+            channels = list(self._channels.values()) + self._retired
+            self._channels, self._stubs, self._states, self._addresses, self._retired = {}, {}, {}, {}, []
+        for channel in channels:
+            channel.close()
@@ -1,13 +1,44 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
 import grpc
 import banking_pb2
 import banking_pb2_grpc
+import banking_v2_pb2_grpc
+import wire
+from membership import DEFAULT_REGISTRY, Registry
+from resilience import RetryPolicy
+
+# how a customer backs off while its branch sheds load (a rejected request had no effect, so resending is safe)
+OVERLOAD_RETRY = RetryPolicy(attempts=8, backoff=0.01, max_backoff=0.5)
+
+
+def overloaded(error: grpc.RpcError) -> bool:
+    return error.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
 
 
 class Customer:
-    def __init__(self, _id: int, events: list):
+    def __init__(
+        self,
+        _id: int,
+        events: list,
+        branch_id: Optional[int] = None,
+        registry: Registry = DEFAULT_REGISTRY,
+        fast_reads: bool = False,
+        window: int = 1,
+        wire_version: wire.WireVersion = "auto",
+    ):
         # unique ID of the Customer
         self.id = _id
 
+        # ID of the branch the customer talks to (the branch with the matching ID by default)
+        self.branch_id = _id if branch_id is None else branch_id
+
+        # resolves the branch's address
+        self.registry = registry
+
         # events from the input
         self.events = events
 
@@ -17,28 +48,159 @@ class Customer:
         # pointer for the stub
         self.stub = None
 
+        # with fast reads, queries go to the branch's query server (BranchReader) instead of MsgDelivery
+        self.fast_reads = fast_reads
+        self.reader = None
+
+        # highest branch clock seen in a reply; queries ask for at least this clock (read-your-writes)
+        self.branch_clock = 0
+
+        # with window > 1, up to `window` events are in flight at once on one MsgDeliveryStream session
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+
+        # message schema of MsgDelivery calls: "auto" tries v2 and falls back to v1 (for good) if the branch doesn't
+        # serve it; pipelined sessions and fast reads always use v1
+        if wire_version not in ("v1", "v2", "auto"):
+            raise ValueError("Invalid wire version")
+        self.wire_version = wire_version
+        self.stub_v2 = None
+
         # keep track of the local clock
         self.local_clock = 0
 
     def create_stub(self) -> None:
         """Helper to facilitate communication between customers and a branch process with matching ID"""
-        with grpc.insecure_channel(f"localhost:5005{self.id}") as channel:
+        with grpc.insecure_channel(self.registry.address_of(self.branch_id)) as channel:
             self.stub = banking_pb2_grpc.BranchStub(channel)
-            self.execute_events()
+            self.stub_v2 = banking_v2_pb2_grpc.BranchStub(channel)
+            if not self.fast_reads:
+                self.execute_events()
+                return
+
+            with grpc.insecure_channel(self.registry.read_address_of(self.branch_id)) as read_channel:
+                self.reader = banking_pb2_grpc.BranchReaderStub(read_channel)
+                self.execute_events()
+
+    def make_request(self, event: dict) -> banking_pb2.BranchRequest:
+        return banking_pb2.BranchRequest(
+            interface=event["interface"],
+            money=event.get("money"),
+            type="customer",
+            id=self.id,
+            event_id=event.get("id"),
+            clock=self.local_clock,
+            account=event.get("account", 0),
+        )
+
+    def receive(self, response: banking_pb2.BranchReply) -> None:
+        self.branch_clock = max(self.branch_clock, response.clock)
+        self.update_local_clock(response.clock)
 
     def execute_events(self) -> None:
         """Processes the events from the list of events and submits the request to the Branch process"""
+        if self.window > 1:
+            self.execute_events_pipelined()
+            return
+
         for event in self.events:
-            request = banking_pb2.BranchRequest(
-                interface=event["interface"],
-                money=event.get("money"),
-                type="customer",
-                id=self.id,
-                event_id=event.get("id"),
-                clock=self.local_clock,
-            )
-            response = self.stub.MsgDelivery(request)
-            self.update_local_clock(response.clock)
+            if self.reader is not None and event["interface"] == "query":
+                request = self.make_request(event)
+                request.min_clock = self.branch_clock
+                response = self.reader.Query(request)
+            else:
+                response = self.deliver(event)
+            self.receive(response)
+
+    def deliver(self, event: dict) -> Any:
+        """Sends one event with MsgDelivery in the negotiated schema version"""
+        if self.wire_version != "v1":
+            request = wire.customer_request(event, self.id, self.local_clock)
+            try:
+                return self.call(self.stub_v2.MsgDelivery, request)
+            except grpc.RpcError as e:
+                if self.wire_version == "v2" or not wire.unsupported(e):
+                    raise
+                self.wire_version = "v1"
+        return self.call(self.stub.MsgDelivery, self.make_request(event))
+
+    def call(self, method: Callable[[Any], Any], request: banking_pb2.BranchRequest) -> Any:
+        """Sends one request, backing off and resending it while the branch rejects it as overloaded"""
+        for delay in OVERLOAD_RETRY.delays():
+            try:
+                return method(request)
+            except grpc.RpcError as e:
+                if not overloaded(e):
+                    raise
+            time.sleep(delay)
+        return method(request)
+
+    def execute_events_pipelined(self) -> None:
+        """
+        Streams the events over one MsgDeliveryStream session, keeping up to `window` of them in flight.
+        Note:
+            The branch applies them in order (queries included, so they still see this customer's earlier writes),
+            and replies are processed as they arrive. A request carries the customer's clock as of when it is sent.
+        """
+        slots = threading.Semaphore(self.window)
+
+        def requests() -> Iterator[banking_pb2.BranchRequest]:
+            for event in self.events:
+                slots.acquire()
+                yield self.make_request(event)
+
+        for response in self.stub.MsgDeliveryStream(requests()):
+            self.receive(response)
+            slots.release()
 
     def update_local_clock(self, *args: int) -> None:
         self.local_clock = max(self.local_clock, *args) + 1
+
+
+class AsyncCustomer(Customer):
+    """Customer driver for grpc.aio; many customers can share a single event loop"""
+
+    async def create_stub(self) -> None:
+        """Helper to facilitate communication between customers and a branch process with matching ID"""
+        async with grpc.aio.insecure_channel(self.registry.address_of(self.branch_id)) as channel:
+            self.stub = banking_pb2_grpc.BranchStub(channel)
+            await self.execute_events()
+
+    async def execute_events(self) -> None:
+        """Processes the events from the list of events and submits the request to the Branch process"""
+        if self.window > 1:
+            await self.execute_events_pipelined()
+            return
+
+        for event in self.events:
+            response = await self.call(self.stub.MsgDelivery, self.make_request(event))
+            self.receive(response)
+
+    async def call(self, method: Callable[[Any], Any], request: banking_pb2.BranchRequest) -> Any:
+        """Sends one request, backing off and resending it while the branch rejects it as overloaded"""
+        for delay in OVERLOAD_RETRY.delays():
+            try:
+                return await method(request)
+            except grpc.RpcError as e:
+                if not overloaded(e):
+                    raise
+            await asyncio.sleep(delay)
+        return await method(request)
+
+    async def execute_events_pipelined(self) -> None:
+        """Streams the events over one MsgDeliveryStream session, keeping up to `window` of them in flight"""
+        slots = asyncio.Semaphore(self.window)
+        call = self.stub.MsgDeliveryStream()
+
+        async def send() -> None:
+            for event in self.events:
+                await slots.acquire()
+                await call.write(self.make_request(event))
+            await call.done_writing()
+
+        sender = asyncio.create_task(send())
+        async for response in call:
+            self.receive(response)
+            slots.release()
+        await sender
@@ -0,0 +1,234 @@
+import bisect
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Optional
+
+
+class EventLog:
+    """
+    Compact, append-only storage for a branch's sub-events.
+    Note:
+        Sub-events are kept in parallel typed arrays of (event id, name code, clock) instead of one dict per entry.
+        Interface names are interned once and referenced by a small integer code, and the per-event-id index only
+        stores row numbers into the same arrays, so nothing is copied between 'branch_events' and 'event_tracker'.
+    """
+
+    __slots__ = ("event_ids", "name_codes", "clocks", "in_branch", "vectors", "names", "_codes", "index", "_hidden")
+
+    def __init__(self):
+        # one entry per sub-event (row)
+        self.event_ids = array("q")
+        self.name_codes = array("H")
+        self.clocks = array("q")
+
+        # 1 if the row belongs to the branch's own event log, 0 if it is only tracked by event id
+        self.in_branch = bytearray()
+
+        # per-row vector clock (sorted (branch id, counter) tuples) in vector-clock mode, otherwise None
+        self.vectors = None
+
+        # interned sub-event names; a name's code is its position in this list
+        self.names: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+        # event id -> row numbers of its sub-events (insertion ordered, like the old defaultdict)
+        self.index: Dict[int, array] = {}
+
+        # number of rows that are not part of the branch's own event log
+        self._hidden = 0
+
+    @classmethod
+    def restore(
+        cls,
+        event_ids: array,
+        name_codes: array,
+        clocks: array,
+        in_branch: bytearray,
+        names: list,
+        vectors: Optional[list] = None,
+    ):
+        """Rebuilds a log (and its per-event-id index) from the raw arrays, e.g. when loading a snapshot"""
+        log = cls()
+        log.event_ids, log.name_codes, log.clocks, log.in_branch = event_ids, name_codes, clocks, in_branch
+        log.vectors = vectors
+        for name in names:
+            log.name_code(name)
+        index = log.index
+        for row, event_id in enumerate(event_ids):
+            rows = index.get(event_id)
+            if rows is None:
+                rows = index[event_id] = array("I")
+            rows.append(row)
+        log._hidden = len(in_branch) - sum(in_branch)
+        return log
+
+    def raw(self, start: int = 0) -> tuple:
+        """Copies of the raw arrays from row `start` on (cheap memcpy), the counterpart of `restore`"""
+        vectors = self.vectors[start:] if self.vectors is not None else None
+        return (
+            self.event_ids[start:],
+            self.name_codes[start:],
+            self.clocks[start:],
+            self.in_branch[start:],
+            list(self.names),
+            vectors,
+        )
+
+    @classmethod
+    def from_parts(cls, parts: List[tuple]):
+        """Rebuilds a log from consecutive `raw` copies of one log (e.g. the chunks of incremental snapshots)"""
+        event_ids, name_codes, clocks, in_branch = array("q"), array("H"), array("q"), bytearray()
+        vectors = [] if parts and all(part[5] is not None for part in parts) else None
+        for part in parts:
+            event_ids.extend(part[0])
+            name_codes.extend(part[1])
+            clocks.extend(part[2])
+            in_branch.extend(part[3])
+            if vectors is not None:
+                vectors.extend(part[5])
+        # names are only ever added, so the last copy knows every code used before it
+        return cls.restore(event_ids, name_codes, clocks, in_branch, parts[-1][4] if parts else [], vectors)
+
+    def __getstate__(self) -> tuple:
+        return self.raw()
+
+    def __setstate__(self, state: tuple) -> None:
+        restored = EventLog.restore(*state)
+        for slot in EventLog.__slots__:
+            setattr(self, slot, getattr(restored, slot))
+
+    def name_code(self, name: str) -> int:
+        """Returns the code of a sub-event name, interning it on first use"""
+        code = self._codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.names.append(sys.intern(name))
+            self._codes[self.names[code]] = code
+        return code
+
+    def append(self, event_id: int, name: str, clock: int, add_to_branch_events: bool = True) -> int:
+        """Stores a sub-event and returns its row number"""
+        row = len(self.clocks)
+        self.event_ids.append(event_id)
+        self.name_codes.append(self.name_code(name))
+        self.clocks.append(clock)
+        self.in_branch.append(add_to_branch_events)
+        if not add_to_branch_events:
+            self._hidden += 1
+
+        rows = self.index.get(event_id)
+        if rows is None:
+            rows = self.index[event_id] = array("I")
+        rows.append(row)
+        return row
+
+    def __len__(self) -> int:
+        return len(self.clocks)
+
+    def rows_before(self, clock: int) -> int:
+        """Number of leading rows with a clock below `clock` (rows are stored in clock order)"""
+        return bisect.bisect_left(self.clocks, clock)
+
+    def split(self, rows: int) -> tuple:
+        """
+        Removes the first `rows` rows and returns them as raw arrays (see `raw`).
+        Note:
+            The remaining rows are copied to new arrays and re-indexed, so a split costs O(remaining rows); the
+            interned names are kept, so name codes stay valid on both sides.
+        """
+        vectors = self.vectors
+        head = (
+            self.event_ids[:rows],
+            self.name_codes[:rows],
+            self.clocks[:rows],
+            self.in_branch[:rows],
+            list(self.names),
+            vectors[:rows] if vectors is not None else None,
+        )
+        tail = EventLog.restore(
+            self.event_ids[rows:],
+            self.name_codes[rows:],
+            self.clocks[rows:],
+            self.in_branch[rows:],
+            self.names,
+            vectors[rows:] if vectors is not None else None,
+        )
+        for slot in EventLog.__slots__:
+            setattr(self, slot, getattr(tail, slot))
+        return head
+
+    def record(self, row: int) -> dict:
+        """Row as a {"id", "name", "clock"} dict (the format of 'branch_events')"""
+        return {"id": self.event_ids[row], "name": self.names[self.name_codes[row]], "clock": self.clocks[row]}
+
+    def branch_rows(self) -> Iterator[int]:
+        """Row numbers that belong to the branch's own event log"""
+        if not self._hidden:
+            return iter(range(len(self.clocks)))
+        return (row for row, flag in enumerate(self.in_branch) if flag)
+
+    def iter_branch_records(self) -> Iterator[dict]:
+        """Lazily yields the branch's event log as dicts, in clock order"""
+        return (self.record(row) for row in self.branch_rows())
+
+    def branch_records(self) -> List[dict]:
+        """The branch's event log as a list of dicts"""
+        return list(self.iter_branch_records())
+
+    def iter_tracked(self, event_id: int) -> Iterator[dict]:
+        """Lazily yields the sub-events of one event id as {"name", "clock"} dicts, in clock order"""
+        names, codes, clocks = self.names, self.name_codes, self.clocks
+        return ({"name": names[codes[row]], "clock": clocks[row]} for row in self.index.get(event_id, ()))
+
+    def tracked(self, event_id: int) -> List[dict]:
+        """Sub-events of one event id as {"name", "clock"} dicts (the format of 'event_tracker')"""
+        return list(self.iter_tracked(event_id))
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the stored rows and index"""
+        total = sys.getsizeof(self.event_ids) + sys.getsizeof(self.name_codes) + sys.getsizeof(self.clocks)
+        total += sys.getsizeof(self.in_branch) + sys.getsizeof(self.index)
+        return total + sum(sys.getsizeof(rows) for rows in self.index.values())
+
+
+class BranchEventsView(Sequence):
+    """Read-only, list-like view of an EventLog in the old 'branch_events' format"""
+
+    __slots__ = ("_log",)
+
+    def __init__(self, log: EventLog):
+        self._log = log
+
+    def __len__(self) -> int:
+        return len(self._log) - self._log._hidden
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if not self._log._hidden:
+            return self._log.record(range(len(self._log))[i])
+        return self._log.record(list(self._log.branch_rows())[i])
+
+    def __iter__(self) -> Iterator[dict]:
+        return (self._log.record(row) for row in self._log.branch_rows())
+
+
+class EventTrackerView(Mapping):
+    """Read-only, dict-like view of an EventLog in the old 'event_tracker' format"""
+
+    __slots__ = ("_log",)
+
+    def __init__(self, log: EventLog):
+        self._log = log
+
+    def __getitem__(self, event_id: int) -> List[dict]:
+        if event_id not in self._log.index:
+            raise KeyError(event_id)
+        return self._log.tracked(event_id)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._log.index)
+
+    def __len__(self) -> int:
+        return len(self._log.index)
@@ -0,0 +1,79 @@
+import heapq
+import json
+from itertools import chain
+from typing import Iterable, Iterator, TextIO
+
+
+def event_ids(branches: list) -> Iterator[int]:
+    """Every event id seen by the branches, in first-seen order (branch by branch)"""
+    return iter(dict.fromkeys(chain.from_iterable(b.events.index for b in branches)))
+
+
+def merged_sub_events(branches: list, event_id: int) -> Iterator[dict]:
+    """
+    Sub-events of one event id across all branches, ordered by clock.
+    Note:
+        Each branch logs sub-events in clock order, so a k-way merge of the per-branch lists is enough (no global
+        sort). Ties keep branch order, which matches the stable sort previously used by `output_logger`.
+    """
+    return heapq.merge(*(b.events.iter_tracked(event_id) for b in branches), key=lambda e: e["clock"])
+
+
+def sections(branches: list) -> Iterator[tuple]:
+    """Yields ("id" | "eventid", key, records) for every branch section followed by every event-id section"""
+    for b in branches:
+        yield "id", b.id, b.events.iter_branch_records()
+    for event_id in event_ids(branches):
+        yield "eventid", event_id, merged_sub_events(branches, event_id)
+
+
+def _indent(text: str, prefix: str) -> str:
+    return "\n".join(prefix + line for line in text.split("\n"))
+
+
+def _write_section(fp: TextIO, kind: str, key: int, records: Iterable[dict]) -> None:
+    """Writes one {"<kind>": key, "data": [...]} section, one record at a time"""
+    fp.write("    {\n")
+    fp.write(f'        "{kind}": {json.dumps(key)},\n')
+    fp.write('        "data": [')
+
+    first = True
+    for record in records:
+        fp.write("\n" if first else ",\n")
+        fp.write(_indent(json.dumps(record, indent=4), " " * 12))
+        first = False
+    fp.write("]\n" if first else "\n        ]\n")
+    fp.write("    }")
+
+
+def write_json(branches: list, fp: TextIO) -> None:
+    """Streams the debugger output as an indented JSON array (same text as `json.dumps(output, indent=4)`)"""
+    empty = True
+    for kind, key, records in sections(branches):
+        fp.write("[\n" if empty else ",\n")
+        _write_section(fp, kind, key, records)
+        empty = False
+    fp.write("[]" if empty else "\n]")
+
+
+def write_ndjson(branches: list, fp: TextIO) -> None:
+    """
+    Streams the debugger output as newline-delimited JSON, one sub-event per line.
+    Note:
+        Branch log lines look like {"branch": 1, "id": 2, "name": ..., "clock": ...} and event-id lines like
+        {"eventid": 2, "name": ..., "clock": ...}.
+    """
+    for kind, key, records in sections(branches):
+        header = {"branch" if kind == "id" else kind: key}
+        for record in records:
+            fp.write(json.dumps({**header, **record}))
+            fp.write("\n")
+
+
+def export(branches: list, path: str, fmt: str = "ndjson") -> None:
+    """Writes the debugger output of the branches to a file in "json" or "ndjson" format"""
+    writers = {"json": write_json, "ndjson": write_ndjson}
+    if fmt not in writers:
+        raise ValueError("Invalid export format")
+    with open(path, "w") as fp:
+        writers[fmt](branches, fp)
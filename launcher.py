@@ -0,0 +1,165 @@
+import logging
+import multiprocessing
+from concurrent import futures
+from typing import List, Optional
+
+import grpc
+import banking_pb2_grpc
+from branch import Branch, serve_reader
+from event_log import EventLog
+from membership import DEFAULT_REGISTRY, Registry
+from retention import full_events
+from wire import add_v2_servicer
+
+
+class BranchSnapshot:
+    """Final state of a branch that ran in another process (enough for BranchDebugger)"""
+
+    def __init__(self, _id: int, balance: float, local_clock: int = 0, events: Optional[EventLog] = None):
+        self.id = _id
+        self.balance = balance
+        self.local_clock = local_clock
+        self.events = events if events is not None else EventLog()
+
+    @classmethod
+    def of(cls, branch: Branch) -> "BranchSnapshot":
+        return cls(branch.id, branch.balance, branch.local_clock, full_events(branch))
+
+
+def _serve_branches(
+    group: list,
+    branch_ids: list,
+    registry: Registry,
+    branch_options: dict,
+    max_workers: int,
+    read_workers: Optional[int],
+    conn,
+) -> None:
+    """Entry point of a branch process: serves its group of branches until the parent asks for their state"""
+    branches, servers = [], []
+    try:
+        for p in group:
+            branch = Branch(
+                _id=p["id"],
+                balance=p["balance"],
+                branches=[_id for _id in branch_ids if _id != p["id"]],
+                registry=registry,
+                **branch_options,
+            )
+            server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+            banking_pb2_grpc.add_BranchServicer_to_server(branch, server)
+            banking_pb2_grpc.add_BranchReaderServicer_to_server(branch, server)
+            add_v2_servicer(branch, server)
+            registry.register(p["id"], server.add_insecure_port(registry.bind_address(p["id"])))
+            server.start()
+            branches.append(branch)
+            servers.append(server)
+            if read_workers:
+                servers.append(serve_reader(branch, registry, read_workers))
+        conn.send("ready")
+
+        # block until the parent is done with the workload
+        conn.recv()
+        for b in branches:
+            b.wait_idle()
+        conn.send([BranchSnapshot.of(b) for b in branches])
+
+    except Exception as e:
+        conn.send(e)
+
+    finally:
+        for b in branches:
+            b.close()
+        for server in servers:
+            server.stop(grace=None)
+        conn.close()
+
+
+class ProcessLauncher:
+    """
+    Runs branch servers in their own OS processes so the cluster is not limited to one GIL / one core.
+    Note:
+        Branches are split into groups of `branches_per_process`, each group served by one spawned process.
+        `stop` waits for every branch to go idle, collects their final state (clock, balance and event log)
+        back into this process as BranchSnapshot objects, and shuts the processes down.
+    """
+
+    def __init__(
+        self,
+        branch_processes: list,
+        registry: Registry = DEFAULT_REGISTRY,
+        branch_options: Optional[dict] = None,
+        branches_per_process: int = 1,
+        max_workers: int = 3,
+        read_workers: Optional[int] = None,
+    ):
+        if branches_per_process < 1:
+            raise ValueError("branches_per_process must be at least 1")
+
+        self.branch_processes = branch_processes
+        self.registry = registry
+        self.branch_options = branch_options or {}
+        self.branches_per_process = branches_per_process
+        self.max_workers = max_workers
+        self.read_workers = read_workers
+
+        self._processes = []
+        self._conns = []
+
+    def start(self) -> None:
+        """Spawns the branch processes and waits until every server is listening"""
+        # spawn (not fork): gRPC's internal threads don't survive a fork
+        context = multiprocessing.get_context("spawn")
+        branch_ids = [p["id"] for p in self.branch_processes]
+        for i in range(0, len(self.branch_processes), self.branches_per_process):
+            group = self.branch_processes[i:i + self.branches_per_process]
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_serve_branches,
+                args=(
+                    group,
+                    branch_ids,
+                    self.registry,
+                    self.branch_options,
+                    self.max_workers,
+                    self.read_workers,
+                    child_conn,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+            self._conns.append(parent_conn)
+
+        for conn in self._conns:
+            message = conn.recv()
+            if isinstance(message, Exception):
+                self.terminate()
+                raise message
+        logging.info(f"\t- {len(self.branch_processes)} branches started in {len(self._processes)} processes")
+
+    def stop(self) -> List[BranchSnapshot]:
+        """Collects the final state of every branch and stops the processes"""
+        for conn in self._conns:
+            conn.send("stop")
+
+        snapshots = []
+        try:
+            for conn in self._conns:
+                message = conn.recv()
+                if isinstance(message, Exception):
+                    raise message
+                snapshots += message
+        finally:
+            for process in self._processes:
+                process.join(timeout=10)
+            self.terminate()
+        order = {p["id"]: n for n, p in enumerate(self.branch_processes)}
+        return sorted(snapshots, key=lambda s: order[s.id])
+
+    def terminate(self) -> None:
+        """Kills whatever branch process is still running (used on errors)"""
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        self._processes, self._conns = [], []
@@ -0,0 +1,60 @@
+import contextlib
+import threading
+from typing import Callable, Dict, Iterator, Optional, Union
+
+
+class ShardedLedger:
+    """
+    Balances of the customer accounts held at a branch, split into `num_shards` shards with a lock each.
+    Note:
+        An account always maps to the same shard (account id modulo the shard count), so updates to accounts in
+        different shards never wait for each other, and updates to one account are applied in a single order.
+    """
+
+    def __init__(self, num_shards: int = 16):
+        if num_shards < 1:
+            raise ValueError("Invalid number of shards")
+        self.num_shards = num_shards
+        self._balances: list = [{} for _ in range(num_shards)]
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+
+    def shard_of(self, account: int) -> int:
+        return account % self.num_shards
+
+    def apply(
+        self,
+        account: int,
+        delta: Union[int, float],
+        log: Optional[Callable[[], object]] = None,
+    ) -> float:
+        """Adds `delta` to an account and returns its new balance; `log` is called under the same shard lock"""
+        shard = account % self.num_shards
+        balances = self._balances[shard]
+        with self._locks[shard]:
+            balance = balances[account] = balances.get(account, 0) + delta
+            if log is not None:
+                log()
+        return balance
+
+    def balance(self, account: int) -> float:
+        # a single dict read, no lock needed
+        return self._balances[account % self.num_shards].get(account, 0)
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[None]:
+        """Holds every shard lock (in shard order), e.g. to copy the ledger consistently with the write-ahead log"""
+        with contextlib.ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock)
+            yield
+
+    def raw(self) -> Dict[int, float]:
+        """Every account balance (callers that need a consistent copy hold `locked()`)"""
+        return {account: balance for shard in self._balances for account, balance in shard.items()}
+
+    def restore(self, balances: Dict[int, float]) -> None:
+        for account, balance in balances.items():
+            self._balances[account % self.num_shards][account] = balance
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._balances)
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from concurrent import futures
+from typing import Literal, Optional
+
+import grpc
+import banking_pb2
+import banking_pb2_grpc
+from membership import DEFAULT_REGISTRY, Registry
+from metrics import LatencyHistogram
+
+
+class LoadDriver:
+    """
+    Replays the customer events of a workload against running branches and measures throughput and latency.
+    Note:
+        "closed" mode runs one thread per customer that sends its next event as soon as the previous reply arrives
+        (optionally paced to `rate` events/sec in total). "open" mode issues events on a fixed schedule at `rate`
+        events/sec no matter how fast replies come back, and measures latency from the scheduled send time, so a
+        slow cluster shows up as queueing delay instead of a silently lower offered load. Events of one customer
+        may overlap in open mode.
+    """
+
+    def __init__(
+        self,
+        customer_processes: list,
+        mode: Literal["closed", "open"] = "closed",
+        rate: Optional[float] = None,
+        max_in_flight: int = 256,
+        registry: Registry = DEFAULT_REGISTRY,
+    ):
+        if mode not in ("closed", "open"):
+            raise ValueError("Invalid load mode")
+        if mode == "open" and not rate:
+            raise ValueError("Open-loop load needs a target rate")
+
+        self.customer_processes = customer_processes
+        self.mode = mode
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        self.registry = registry
+
+        self.histograms = {"deposit": LatencyHistogram(), "withdraw": LatencyHistogram(), "query": LatencyHistogram()}
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._stubs = {}
+
+    def _stub(self, branch_id: int):
+        stub = self._stubs.get(branch_id)
+        if stub is None:
+            with self._lock:
+                if branch_id not in self._stubs:
+                    self._channels[branch_id] = grpc.insecure_channel(self.registry.address_of(branch_id))
+                    self._stubs[branch_id] = banking_pb2_grpc.BranchStub(self._channels[branch_id])
+                stub = self._stubs[branch_id]
+        return stub
+
+    def _send(self, customer: dict, event: dict, clock: int, scheduled: float) -> int:
+        """Sends one customer event and records its latency; returns the reply clock"""
+        branch_id = customer.get("branch_id", customer["id"])
+        request = banking_pb2.BranchRequest(
+            interface=event["interface"],
+            money=event.get("money"),
+            type="customer",
+            id=customer["id"],
+            event_id=event["id"],
+            clock=clock,
+            account=event.get("account", 0),
+        )
+        try:
+            response = self._stub(branch_id).MsgDelivery(request)
+        except grpc.RpcError as e:
+            logging.debug("Request %s failed: %s", event["id"], e.code())
+            with self._lock:
+                self.errors += 1
+            return clock
+
+        latency = time.perf_counter() - scheduled
+        with self._lock:
+            self.histograms[event["interface"]].record(latency)
+        return response.clock
+
+    def _run_closed(self) -> None:
+        interval = len(self.customer_processes) / self.rate if self.rate else 0.0
+
+        def customer_loop(customer: dict) -> None:
+            clock = 0
+            next_send = time.perf_counter()
+            for event in customer["events"]:
+                if interval:
+                    delay = next_send - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_send += interval
+                clock = max(clock, self._send(customer, event, clock, time.perf_counter())) + 1
+
+        threads = [threading.Thread(target=customer_loop, args=(c,)) for c in self.customer_processes]
+        for t in threads:
+            t.start()
+
+        # completion is simply every customer having received its last reply
+        for t in threads:
+            t.join()
+
+    def _run_open(self) -> None:
+        # interleave customers so the schedule spreads every customer's events over the whole run
+        schedule = []
+        longest = max((len(c["events"]) for c in self.customer_processes), default=0)
+        for n in range(longest):
+            schedule += [(c, c["events"][n]) for c in self.customer_processes if n < len(c["events"])]
+
+        with futures.ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            start = time.perf_counter()
+            pending = []
+            for n, (customer, event) in enumerate(schedule):
+                scheduled = start + n / self.rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pending.append(executor.submit(self._send, customer, event, 0, scheduled))
+
+            # completion is every issued request having been answered (or failed)
+            futures.wait(pending)
+
+    def run(self) -> dict:
+        """Runs the whole workload and returns the throughput / latency report"""
+        start = time.perf_counter()
+        try:
+            self._run_open() if self.mode == "open" else self._run_closed()
+        finally:
+            for channel in self._channels.values():
+                channel.close()
+        elapsed = time.perf_counter() - start
+
+        overall = LatencyHistogram()
+        for histogram in self.histograms.values():
+            overall.merge(histogram)
+
+        return {
+            "mode": self.mode,
+            "target_rate": self.rate,
+            "elapsed_sec": elapsed,
+            "completed": overall.count,
+            "errors": self.errors,
+            "throughput_per_sec": overall.count / elapsed if elapsed else 0.0,
+            "latency": overall.summary(),
+            "latency_by_interface": {k: h.summary() for k, h in self.histograms.items() if h.count},
+            "histogram_ms": overall.buckets(),
+        }
@@ -1,21 +1,95 @@
 import sys
-import time
+import json
+import asyncio
+import argparse
+import functools
 import grpc
 import logging
 import threading
 import banking_pb2_grpc
 from concurrent import futures
+from typing import Callable, List, Literal, Optional
 
-from customer import Customer
-from branch import Branch, BranchDebugger
+from customer import AsyncCustomer, Customer
+from branch import AsyncBranch, Branch, BranchDebugger, serve_reader
+from launcher import BranchSnapshot, ProcessLauncher
+from load_driver import LoadDriver
+from membership import DEFAULT_REGISTRY, Registry, registry_from_spec
+from simulation import Simulation
+from metrics import BranchMetrics, MetricsDumper, MetricsServer
+from tracing import enable_tracing
 from test_input_output import input_test
+from wire import WireVersion, add_v2_servicer
+from workload import generate_workload, parse_mix
 
 
 class Main:
-    def __init__(self, input_data: list) -> None:
+    def __init__(
+        self,
+        input_data: list,
+        branch_options: Optional[dict] = None,
+        mode: Literal["sync", "aio", "sim"] = "sync",
+        export_path: Optional[str] = None,
+        load_driver: Optional[Callable[..., LoadDriver]] = None,
+        registry: Registry = DEFAULT_REGISTRY,
+        branches_per_process: Optional[int] = None,
+        read_workers: Optional[int] = None,
+        window: int = 1,
+        metrics_port: Optional[int] = None,
+        metrics_dump: Optional[str] = None,
+        simulation_options: Optional[dict] = None,
+        analyze: bool = False,
+        columns_path: Optional[str] = None,
+        wire_version: WireVersion = "auto",
+    ) -> None:
         logging.info("Collecting input data...")
         self.input_data = input_data
 
+        # "sync" runs thread-pool servers and one thread per customer, "aio" runs everything on one event loop,
+        # "sim" runs the protocol on the in-memory, simulated-time transport (no servers)
+        if mode not in ("sync", "aio", "sim"):
+            raise ValueError("Invalid mode")
+        self.mode = mode
+
+        # extra keyword arguments for the Simulation in "sim" mode (e.g. {"seed": 1, "jitter": 0.001})
+        self.simulation_options = simulation_options or {}
+
+        # when set, the event output is streamed to this file (NDJSON) instead of being logged
+        self.export_path = export_path
+
+        # when set, customer events are replayed by a LoadDriver built from the customer processes (sync mode only)
+        self.load_driver = load_driver
+
+        # extra keyword arguments for every Branch (e.g. {"fanout": "parallel"})
+        self.branch_options = branch_options or {}
+
+        # where branches listen and how branches / customers find each other
+        self.registry = registry
+
+        # when set, branches run in separate OS processes, this many per process (sync mode only)
+        self.branches_per_process = branches_per_process
+
+        # when set, every branch also gets a query server with this many workers and customers send their queries
+        # there (sync mode only)
+        self.read_workers = read_workers
+
+        # events each customer keeps in flight on a pipelined MsgDeliveryStream session (1: one request at a time)
+        self.window = window
+
+        # message schema customers use for MsgDelivery ("auto": v2 where the branch serves it, else v1); branch
+        # servers serve both (v2 in sync mode only)
+        self.wire_version = wire_version
+
+        # when set, branch metrics are served at http://localhost:<metrics_port>/metrics and / or periodically
+        # written to the `metrics_dump` file (in-process branches only, i.e. not with branches_per_process)
+        self.metrics_port = metrics_port
+        self.metrics_dump = metrics_dump
+
+        # after the run, log propagation lag / clock gap statistics and / or write the sub-events as columns to
+        # `columns_path` (".parquet" with pyarrow, ".npz" with numpy)
+        self.analyze = analyze
+        self.columns_path = columns_path
+
         # collect branch and customer data from input
         self.branch_processes = []
         self.customer_processes = []
@@ -24,6 +98,25 @@ class Main:
         # for debugging purposes
         self.list_processes()
 
+    def server_workers(self, branch_id: int) -> int:
+        """
+        Worker threads of a branch server.
+        Note:
+            A customer request (or pipelined session) holds a worker until its peers have acknowledged the
+            propagation, and they need free workers of their own to do that. So a branch gets one worker per
+            customer it serves, plus spare ones that propagations can always use.
+        """
+        return 3 + sum(1 for p in self.customer_processes if p.get("branch_id", p["id"]) == branch_id)
+
+    def branch_kwargs(self, workers: int) -> dict:
+        """`branch_options` for a branch served by `workers` threads, admission-controlled by default"""
+        options = dict(self.branch_options)
+        if options.get("max_in_flight") is None:
+            # customer requests can't take the spare workers (e.g. overlapping open-loop load events), so the
+            # propagations keep going and the cluster can't deadlock
+            options["max_in_flight"] = workers - 2
+        return options
+
     def parse_processes(self) -> None:
         """Extract branch and customer event information from the input data"""
         for process in self.input_data:
@@ -34,7 +127,7 @@ class Main:
 
     def list_processes(self) -> None:
         """Log processes to execute to facilitate with debugging"""
-        logging.debug("\nBranch Processes:")
+        logging.info("\nBranch Processes:")
         for p in self.branch_processes:
             logging.info(f"\t{p}")
 
@@ -45,25 +138,77 @@ class Main:
     def execute_customer_events(self) -> None:
         """Execute customer events in parallel"""
 
+        if self.load_driver is not None:
+            report = self.load_driver(self.customer_processes, registry=self.registry).run()
+            logging.info(f"\nLoad report:\n{json.dumps(report, indent=4)}")
+            return
+
         threads = []
         for p in self.customer_processes:
-            customer = Customer(p["id"], p["events"])
+            customer = Customer(
+                p["id"],
+                p["events"],
+                branch_id=p.get("branch_id"),
+                registry=self.registry,
+                fast_reads=bool(self.read_workers),
+                window=self.window,
+                wire_version=self.wire_version,
+            )
             threads.append(threading.Thread(target=customer.create_stub))  # create stub and process events
 
         # start threads
         for t in threads:
             t.start()
-            time.sleep(0.2)
 
         # wait until the threads complete execution
         for t in threads:
             t.join()
 
+    async def execute_customer_events_async(self) -> None:
+        """Execute customer events concurrently on the running event loop"""
+
+        tasks = []
+        for p in self.customer_processes:
+            customer = AsyncCustomer(
+                p["id"], p["events"], branch_id=p.get("branch_id"), registry=self.registry, window=self.window
+            )
+            tasks.append(asyncio.create_task(customer.create_stub()))  # create stub and process events
+
+        # wait until the customers complete execution
+        await asyncio.gather(*tasks)
+
+    def output_events(self, branch_debugger: BranchDebugger) -> None:
+        """Logs the branch events, or streams them to `export_path` if one was given"""
+        if self.export_path:
+            branch_debugger.export(self.export_path)
+            logging.info(f"\nOutput written to {self.export_path}")
+        else:
+            branch_debugger.output_logger()
+        if self.branch_options.get("clock_mode") == "vector":
+            branch_debugger.log_concurrent_events()
+        if self.analyze:
+            branch_debugger.log_analysis()
+        if self.columns_path:
+            branch_debugger.columns().write(self.columns_path)
+            logging.info(f"\nColumns written to {self.columns_path}")
+
     def run(self) -> None:
+        if self.mode == "aio":
+            asyncio.run(self.run_async())
+            return
+        if self.mode == "sim":
+            self.run_simulation()
+            return
+        if self.branches_per_process:
+            self.run_processes()
+            return
+
         logging.info("\nStarting branch processes...")
 
         # will keep track of running branch server threads (will get closed once input data has been processed)
         branch_server_procs = []
+        reader_server_procs = []
+        exporters = []
         branch_objs = []
         branch_debugger = BranchDebugger(branch_objs)
 
@@ -73,20 +218,31 @@ class Main:
 
             # start up branch servers
             for p in self.branch_processes:
-                port = f"5005{p['id']}"
+                workers = self.server_workers(p["id"])
                 branch = Branch(
                     _id=p["id"],
                     balance=p["balance"],
                     branches=list(branch_process_ids.difference({p["id"]})),
+                    registry=self.registry,
+                    **self.branch_kwargs(workers),
                 )
                 branch_objs.append(branch)
 
-                server = grpc.server(futures.ThreadPoolExecutor(max_workers=3))
+                server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
                 banking_pb2_grpc.add_BranchServicer_to_server(branch, server)
-                server.add_insecure_port(f"[::]:{port}")
+                banking_pb2_grpc.add_BranchReaderServicer_to_server(branch, server)
+                add_v2_servicer(branch, server)
+                port = server.add_insecure_port(self.registry.bind_address(p["id"]))
+                self.registry.register(p["id"], port)
                 server.start()
                 branch_server_procs.append(server)
-                logging.info(f"\t- Server started, listening on {port}")
+                logging.info(f"\t- Server started, listening on {self.registry.address_of(p['id'])}")
+
+                if self.read_workers:
+                    reader_server_procs.append(serve_reader(branch, self.registry, self.read_workers))
+                    logging.info(f"\t- Query server started, listening on {self.registry.read_address_of(p['id'])}")
+
+            exporters = self.start_metrics([b.metrics for b in branch_objs])
 
             # log initial branch balances (should all be the same or in sync)
             branch_debugger.log_balances("initial balance")
@@ -97,8 +253,9 @@ class Main:
             logging.info("\n... FINISHED CUSTOMER EVENTS ...")
 
             # allow any lingering transaction to be completed
-            logging.debug("\nWaiting 3 sec before wrapping up...")
-            time.sleep(3)
+            logging.debug("\nWaiting for branches to finish in-flight requests...")
+            for b in branch_objs:
+                b.wait_idle()
 
         except Exception as e:
             logging.error(f"\n\n!!! Failed with error: {e}\n\n")
@@ -109,15 +266,376 @@ class Main:
             branch_debugger.log_balances("final balance")
 
             # log branch events (organized by both branch and event ids)
-            branch_debugger.output_logger()
+            self.output_events(branch_debugger)
 
         finally:
+            for exporter in exporters:
+                exporter.close()
+
+            # release the pooled branch-to-branch channels
+            for b in branch_objs:
+                b.close()
+
             # stop/release branch servers
-            for p in branch_server_procs:
+            for p in branch_server_procs + reader_server_procs:
                 p.stop(grace=None)
 
+    def start_metrics(self, sources: List[BranchMetrics]) -> list:
+        """Starts the requested metrics endpoint / dump file over the given branch metrics"""
+        exporters = []
+        if self.metrics_port is not None:
+            exporters.append(MetricsServer(sources, self.metrics_port))
+            logging.info(f"\t- Metrics served at http://localhost:{exporters[-1].port}/metrics")
+        if self.metrics_dump:
+            exporters.append(MetricsDumper(sources, self.metrics_dump))
+        return exporters
+
+    def run_simulation(self) -> None:
+        """Same flow as `run`, but on the deterministic in-memory simulation"""
+        simulation = Simulation(
+            self.input_data,
+            fanout=self.branch_options.get("fanout", "sequential"),
+            clock_mode=self.branch_options.get("clock_mode", "lamport"),
+            **self.simulation_options,
+        )
+        branch_debugger = BranchDebugger(simulation.branches)
+        branch_debugger.log_balances("initial balance")
+
+        logging.info("\n... STARTING CUSTOMER EVENTS ...")
+        stats = simulation.run()
+        logging.info(f"\n... FINISHED CUSTOMER EVENTS ... ({json.dumps(stats)})")
+
+        branch_debugger.log_balances("final balance")
+        self.output_events(branch_debugger)
+
+    def run_processes(self) -> None:
+        """Same flow as `run`, but every group of branches is served by its own OS process"""
+        logging.info("\nStarting branch processes...")
+
+        workers = max(self.server_workers(p["id"]) for p in self.branch_processes)
+        launcher = ProcessLauncher(
+            self.branch_processes,
+            registry=self.registry,
+            branch_options=self.branch_kwargs(workers),
+            branches_per_process=self.branches_per_process,
+            max_workers=workers,
+            read_workers=self.read_workers,
+        )
+
+        try:
+            launcher.start()
+
+            # log initial branch balances (should all be the same or in sync)
+            BranchDebugger([BranchSnapshot(p["id"], p["balance"]) for p in self.branch_processes]).log_balances(
+                "initial balance"
+            )
+
+            # initialize customer processes and execute events
+            logging.info("\n... STARTING CUSTOMER EVENTS ...")
+            self.execute_customer_events()
+            logging.info("\n... FINISHED CUSTOMER EVENTS ...")
+
+            # waits for every branch to go idle and brings their event logs back to this process
+            branch_debugger = BranchDebugger(launcher.stop())
+
+        except Exception as e:
+            logging.error(f"\n\n!!! Failed with error: {e}\n\n")
+
+        else:
+            # if no errors are raised
+            # log final balances and output detailed customer events
+            branch_debugger.log_balances("final balance")
+
+            # log branch events (organized by both branch and event ids)
+            self.output_events(branch_debugger)
+
+        finally:
+            launcher.terminate()
+
+    async def run_async(self) -> None:
+        """Same flow as `run`, but with grpc.aio servers and customers sharing one event loop"""
+        logging.info("\nStarting branch processes...")
+
+        branch_servers = []
+        exporters = []
+        branch_objs = []
+        branch_debugger = BranchDebugger(branch_objs)
+
+        try:
+            # collect branch ids from input
+            branch_process_ids = set(p["id"] for p in self.branch_processes)
+
+            # start up branch servers
+            for p in self.branch_processes:
+                branch = AsyncBranch(
+                    _id=p["id"],
+                    balance=p["balance"],
+                    branches=list(branch_process_ids.difference({p["id"]})),
+                    registry=self.registry,
+                    **self.branch_options,
+                )
+                branch_objs.append(branch)
+
+                server = grpc.aio.server()
+                banking_pb2_grpc.add_BranchServicer_to_server(branch, server)
+                banking_pb2_grpc.add_BranchReaderServicer_to_server(branch, server)
+                port = server.add_insecure_port(self.registry.bind_address(p["id"]))
+                self.registry.register(p["id"], port)
+                await server.start()
+                branch_servers.append(server)
+                logging.info(f"\t- Server started, listening on {self.registry.address_of(p['id'])}")
+
+            exporters = self.start_metrics([b.metrics for b in branch_objs])
+
+            # log initial branch balances (should all be the same or in sync)
+            branch_debugger.log_balances("initial balance")
+
+            # initialize customer processes and execute events
+            logging.info("\n... STARTING CUSTOMER EVENTS ...")
+            await self.execute_customer_events_async()
+            logging.info("\n... FINISHED CUSTOMER EVENTS ...")
+
+            # allow any lingering transaction to be completed
+            logging.debug("\nWaiting for branches to finish in-flight requests...")
+            for b in branch_objs:
+                await b.wait_idle_async()
+
+        except Exception as e:
+            logging.error(f"\n\n!!! Failed with error: {e}\n\n")
+
+        else:
+            # if no errors are raised
+            # log final balances and output detailed customer events
+            branch_debugger.log_balances("final balance")
+
+            # log branch events (organized by both branch and event ids)
+            self.output_events(branch_debugger)
+
+        finally:
+            for exporter in exporters:
+                exporter.close()
+
+            # release the branch-to-branch channels
+            for b in branch_objs:
+                await b.aclose()
+
+            # stop/release branch servers
+            for server in branch_servers:
+                await server.stop(grace=None)
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Lamport's logical clock banking simulator")
+    parser.add_argument("--aio", action="store_true", help="run servers and customers on one grpc.aio event loop")
+    parser.add_argument("--export", metavar="PATH", help="stream the event output to PATH (NDJSON)")
+    parser.add_argument(
+        "--registry",
+        default="ports:50050",
+        help='branch addresses: "ports:<base>", "static:<file>", "ephemeral:<file>" or "unix:<directory>"',
+    )
+
+    workload = parser.add_argument_group("generated workload (default: the static input_test)")
+    workload.add_argument("--branches", type=int, help="number of branches")
+    workload.add_argument("--customers", type=int, help="number of customers (default: one per branch)")
+    workload.add_argument("--events", type=int, default=10, help="events per customer")
+    workload.add_argument("--mix", default="deposit=0.4,withdraw=0.2,query=0.4", help="operation mix")
+    workload.add_argument("--seed", type=int, default=0)
+    workload.add_argument(
+        "--accounts", type=int, default=0, metavar="N", help="spread the events over N customer accounts"
+    )
+
+    load = parser.add_argument_group("load driver")
+    load.add_argument("--load", choices=["closed", "open"], help="replay events with the load driver")
+    load.add_argument("--rate", type=float, help="target events/sec (required for open loop)")
+
+    sim = parser.add_argument_group("simulation (no servers, simulated time)")
+    sim.add_argument("--simulate", action="store_true", help="run on the in-memory bus with a discrete-event scheduler")
+    sim.add_argument("--latency", type=float, default=0.0005, metavar="SECONDS", help="one-way link latency")
+    sim.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        metavar="SECONDS",
+        help="extra random latency per message (reorders deliveries, seeded by --seed)",
+    )
+
+    parser.add_argument(
+        "--clock-mode",
+        choices=["lamport", "vector"],
+        default="lamport",
+        help="also track vector clocks to tell concurrent events apart",
+    )
+    parser.add_argument(
+        "--anti-entropy",
+        type=float,
+        metavar="SECONDS",
+        help="let branches compare digests with a peer every SECONDS and pull missed deposits / withdrawals",
+    )
+    parser.add_argument(
+        "--read-workers",
+        type=int,
+        metavar="N",
+        help="serve queries from a separate server with N workers per branch (bounded-staleness fast path)",
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=1,
+        metavar="N",
+        help="pipeline up to N events per customer over one streaming session",
+    )
+    parser.add_argument(
+        "--ordering",
+        choices=["immediate", "total"],
+        default="immediate",
+        help="apply deposits / withdrawals right away, or in one (Lamport clock, branch id) order on every branch",
+    )
+    parser.add_argument(
+        "--wire",
+        choices=["v1", "v2", "auto"],
+        default="auto",
+        help="customer message schema (auto: v2, falling back to v1 where a branch doesn't serve it)",
+    )
+    parser.add_argument(
+        "--fanout",
+        choices=["sequential", "parallel"],
+        default="sequential",
+        help="propagate a deposit / withdrawal to one peer after the other, or to all of them at once",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        metavar="N",
+        help="coalesce up to N propagations to a peer into one MsgDeliveryBatch call (not with --aio)",
+    )
+    parser.add_argument(
+        "--rpc-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="deadline of every propagation call (timed out calls are retried, receivers drop duplicates)",
+    )
+    parser.add_argument(
+        "--breaker",
+        type=int,
+        metavar="N",
+        help="stop calling a peer for a second after N propagations to it failed in a row",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        metavar="N",
+        help="reject customer requests with RESOURCE_EXHAUSTED beyond N at once per branch (default: customers + 1)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        metavar="PORT",
+        help="serve branch metrics (Prometheus text format) at http://localhost:PORT/metrics",
+    )
+    parser.add_argument(
+        "--metrics-dump",
+        metavar="PATH",
+        help="write branch metrics (JSON) to PATH every second",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="write a structured trace (NDJSON, one record per sub-event and query) to PATH (in-process branches)",
+    )
+    parser.add_argument(
+        "--trace-sample",
+        type=int,
+        default=1,
+        metavar="N",
+        help="keep one trace record out of every N",
+    )
+    parser.add_argument(
+        "--analyze",
+        action="store_true",
+        help="log propagation lag and clock gap statistics of the event logs",
+    )
+    parser.add_argument(
+        "--columns",
+        metavar="PATH",
+        help="write every sub-event as columns to PATH (.parquet needs pyarrow, .npz needs numpy)",
+    )
+    parser.add_argument(
+        "--retain-events",
+        type=int,
+        metavar="N",
+        help="keep about N sub-events per branch in memory and compact older ones (see --retention)",
+    )
+    parser.add_argument(
+        "--retention",
+        choices=["archive", "summary"],
+        default="archive",
+        help="move compacted sub-events to --archive-dir (the output stays complete), or keep per-event summaries",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        default="archive",
+        metavar="DIR",
+        help="where branches archive compacted sub-events",
+    )
+    parser.add_argument("--verbose", action="store_true", help="log at DEBUG level")
+    parser.add_argument(
+        "--branches-per-process",
+        type=int,
+        metavar="N",
+        help="run the branches in separate OS processes, N branches per process",
+    )
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
-    main = Main(input_data=input_test)
-    main.run()
+    args = parse_args(sys.argv[1:])
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+
+    input_data = input_test
+    if args.branches:
+        input_data = generate_workload(
+            num_branches=args.branches,
+            num_customers=args.customers or args.branches,
+            events_per_customer=args.events,
+            mix=parse_mix(args.mix),
+            seed=args.seed,
+            num_accounts=args.accounts,
+        )
+
+    main = Main(
+        input_data=input_data,
+        branch_options={
+            "clock_mode": args.clock_mode,
+            "fanout": args.fanout,
+            "batch_size": args.batch_size,
+            "anti_entropy_interval": args.anti_entropy,
+            "rpc_timeout": args.rpc_timeout,
+            "breaker_threshold": args.breaker,
+            "max_in_flight": args.max_in_flight,
+            "ordering": args.ordering,
+            "retain_events": args.retain_events,
+            "retention": args.retention,
+            "archive_dir": args.archive_dir if args.retain_events and args.retention == "archive" else None,
+        },
+        mode="sim" if args.simulate else "aio" if args.aio else "sync",
+        export_path=args.export,
+        load_driver=functools.partial(LoadDriver, mode=args.load, rate=args.rate) if args.load else None,
+        registry=registry_from_spec(args.registry),
+        branches_per_process=args.branches_per_process,
+        read_workers=args.read_workers,
+        window=args.window,
+        metrics_port=args.metrics_port,
+        metrics_dump=args.metrics_dump,
+        simulation_options={"seed": args.seed, "latency": args.latency, "jitter": args.jitter},
+        analyze=args.analyze,
+        columns_path=args.columns,
+        wire_version=args.wire,
+    )
+
+    tracing = enable_tracing(args.trace, sample_every=args.trace_sample) if args.trace else None
+    try:
+        main.run()
+    finally:
+        if tracing is not None:
+            tracing.close()
@@ -0,0 +1,237 @@
+import fcntl
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class Registry(ABC):
+    """
+    Maps branch ids to gRPC addresses.
+    Note:
+        Servers bind to `bind_address(id)` and then call `register(id, port)` with the port gRPC actually bound
+        (relevant when binding port 0); clients dial `address_of(id)`.
+    """
+
+    @abstractmethod
+    def address_of(self, _id: int) -> str:
+        """Address clients use to reach a branch"""
+
+    @abstractmethod
+    def bind_address(self, _id: int) -> str:
+        """Address a branch server binds to"""
+
+    def register(self, _id: int, port: int) -> None:
+        """Records where a branch server ended up listening (no-op for registries with fixed addresses)"""
+
+    def read_address_of(self, _id: int) -> str:
+        """Address of a branch's dedicated query server (defaults to the branch server itself)"""
+        return self.address_of(_id)
+
+    @abstractmethod
+    def read_bind_address(self, _id: int) -> str:
+        """Address a branch's dedicated query server binds to"""
+
+    def register_reader(self, _id: int, port: int) -> None:
+        """Records where a branch's query server ended up listening"""
+
+
+class PortRangeRegistry(Registry):
+    """Branch `id` listens on `base_port + id` (the default; ids 1-9 keep the original 50051-50059 ports)"""
+
+    def __init__(self, base_port: int = 50050, host: str = "localhost", read_port_offset: int = 1000):
+        self.base_port = base_port
+        self.host = host
+
+        # query servers listen `read_port_offset` ports above their branch server
+        self.read_port_offset = read_port_offset
+
+    def _port(self, _id: int) -> int:
+        port = self.base_port + _id
+        if not 0 < port < 65536:
+            raise ValueError(f"Branch id {_id} is outside of the port range")
+        return port
+
+    def address_of(self, _id: int) -> str:
+        return f"{self.host}:{self._port(_id)}"
+
+    def bind_address(self, _id: int) -> str:
+        return f"[::]:{self._port(_id)}"
+
+    def read_address_of(self, _id: int) -> str:
+        return f"{self.host}:{self._port(_id) + self.read_port_offset}"
+
+    def read_bind_address(self, _id: int) -> str:
+        return f"[::]:{self._port(_id) + self.read_port_offset}"
+
+
+class StaticRegistry(Registry):
+    """
+    Addresses come from a JSON config file like {"1": "10.0.0.5:50051", "2": "10.0.0.6:50051"}.
+    Note:
+        An entry can also be {"address": "10.0.0.5:50051", "read": "10.0.0.5:51051"} to give the branch a
+        dedicated query server; without one, queries go to the branch server.
+    """
+
+    def __init__(self, path: str):
+        self.addresses, self.read_addresses = {}, {}
+        with open(path) as f:
+            for _id, entry in json.load(f).items():
+                if isinstance(entry, dict):
+                    self.addresses[int(_id)] = entry["address"]
+                    if "read" in entry:
+                        self.read_addresses[int(_id)] = entry["read"]
+                else:
+                    self.addresses[int(_id)] = entry
+
+    def address_of(self, _id: int) -> str:
+        return self.addresses[_id]
+
+    @staticmethod
+    def _bind(address: str) -> str:
+        if address.startswith("unix:"):
+            return address
+        return f"[::]:{address.rsplit(':', 1)[1]}"
+
+    def bind_address(self, _id: int) -> str:
+        return self._bind(self.addresses[_id])
+
+    def read_address_of(self, _id: int) -> str:
+        return self.read_addresses.get(_id) or self.address_of(_id)
+
+    def read_bind_address(self, _id: int) -> str:
+        if _id not in self.read_addresses:
+            raise KeyError(f"Branch {_id} has no read address in the registry")
+        return self._bind(self.read_addresses[_id])
+
+
+class EphemeralPortRegistry(Registry):
+    """
+    Servers bind to a port picked by the OS and publish it in a shared JSON registration file.
+    Note:
+        The file is updated under an exclusive lock and replaced atomically, so branches started by different
+        processes can register concurrently. Lookups are cached and the file is only re-read on a miss.
+    """
+
+    def __init__(self, path: str, host: str = "localhost"):
+        self.path = path
+        self.host = host
+        # registration key ("<id>", or "<id>/read" for query servers) -> address
+        self._cache: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self) -> Dict[str, str]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _lookup(self, key: str) -> str:
+        address = self._cache.get(key)
+        if address is None:
+            with self._lock:
+                self._cache = self._read()
+            address = self._cache.get(key)
+            if address is None:
+                raise KeyError(f"Branch {key} is not registered in {self.path}")
+        return address
+
+    def address_of(self, _id: int) -> str:
+        return self._lookup(str(_id))
+
+    def bind_address(self, _id: int) -> str:
+        return "[::]:0"
+
+    def read_address_of(self, _id: int) -> str:
+        try:
+            return self._lookup(f"{_id}/read")
+        except KeyError:
+            return self.address_of(_id)
+
+    def read_bind_address(self, _id: int) -> str:
+        return "[::]:0"
+
+    def __getstate__(self) -> dict:
+        # the registry is handed to branch processes, locks can't be pickled
+        return {"path": self.path, "host": self.host}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def _publish(self, key: str, port: int) -> None:
+        with self._locked():
+            addresses = self._read()
+            addresses[key] = f"{self.host}:{port}"
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(addresses, f)
+            os.replace(tmp, self.path)
+        with self._lock:
+            self._cache = addresses
+
+    def register(self, _id: int, port: int) -> None:
+        self._publish(str(_id), port)
+
+    def register_reader(self, _id: int, port: int) -> None:
+        self._publish(f"{_id}/read", port)
+
+
+class UnixSocketRegistry(Registry):
+    """Same-host branches talk over Unix domain sockets in `directory` (skips the loopback TCP stack)"""
+
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, _id: int, role: str = "branch") -> str:
+        return os.path.join(self.directory, f"{role}-{_id}.sock")
+
+    def _bind(self, path: str) -> str:
+        # a socket file left behind by a previous run would make the bind fail
+        if os.path.exists(path):
+            os.unlink(path)
+        return f"unix:{path}"
+
+    def address_of(self, _id: int) -> str:
+        return f"unix:{self._path(_id)}"
+
+    def bind_address(self, _id: int) -> str:
+        return self._bind(self._path(_id))
+
+    def read_address_of(self, _id: int) -> str:
+        return f"unix:{self._path(_id, 'reader')}"
+
+    def read_bind_address(self, _id: int) -> str:
+        return self._bind(self._path(_id, "reader"))
+
+
+def registry_from_spec(spec: str) -> Registry:
+    """
+    Builds a registry from a "<kind>:<argument>" string:
+    "ports:50050", "static:peers.json", "ephemeral:/tmp/branches.json" or "unix:/tmp/branch-sockets".
+    """
+    kind, _, argument = spec.partition(":")
+    if kind == "ports":
+        return PortRangeRegistry(int(argument) if argument else 50050)
+    if kind == "static":
+        return StaticRegistry(argument)
+    if kind == "ephemeral":
+        return EphemeralPortRegistry(argument)
+    if kind == "unix":
+        return UnixSocketRegistry(argument)
+    raise ValueError(f"Invalid registry spec: {spec}")
+
+
+DEFAULT_REGISTRY = PortRangeRegistry()
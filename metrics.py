@@ -0,0 +1,244 @@
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram (HDR style) with constant-time recording.
+    Note:
+        Each power of two (in microseconds) is split into `sub_buckets` linear buckets, so the relative error of any
+        reported percentile is bounded by 1 / sub_buckets regardless of the latency range.
+    """
+
+    def __init__(self, sub_buckets: int = 16, max_exponent: int = 32):
+        self.sub_buckets = sub_buckets
+        self.counts: List[int] = [0] * (sub_buckets * (max_exponent + 1))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _bucket(self, micros: float) -> int:
+        if micros < 1:
+            return 0
+        exponent = int(math.log2(micros))
+        linear = int((micros / (1 << exponent) - 1) * self.sub_buckets)
+        return min(exponent * self.sub_buckets + linear, len(self.counts) - 1)
+
+    def _upper_bound(self, bucket: int) -> float:
+        exponent, linear = divmod(bucket, self.sub_buckets)
+        return (1 << exponent) * (1 + (linear + 1) / self.sub_buckets)
+
+    def record(self, seconds: float) -> None:
+        """Adds one latency sample (in seconds)"""
+        self.counts[self._bucket(seconds * 1e6)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Adds the samples of another histogram with the same layout"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, pct: float) -> float:
+        """Latency (seconds) below which `pct` percent of the samples fall"""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * pct / 100))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._upper_bound(bucket) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """Count, mean, max and the usual percentiles in milliseconds"""
+        return {
+            "count": self.count,
+            "mean_ms": 1000 * self.total / self.count if self.count else 0.0,
+            "p50_ms": 1000 * self.percentile(50),
+            "p90_ms": 1000 * self.percentile(90),
+            "p99_ms": 1000 * self.percentile(99),
+            "p999_ms": 1000 * self.percentile(99.9),
+            "max_ms": 1000 * self.max,
+        }
+
+    def buckets(self) -> List[tuple]:
+        """Non-empty buckets as (upper bound in ms, count) pairs"""
+        return [(self._upper_bound(b) / 1000, c) for b, c in enumerate(self.counts) if c]
+
+
+class BranchMetrics:
+    """
+    Always-on, low-overhead instrumentation of one branch.
+    Note:
+        Counters are plain integers behind one short lock. Phase latencies are only measured for one request out of
+        every `sample_every` (0 disables timing), so un-sampled requests pay a single counter check. Gauges (e.g.
+        queue depth) are callables evaluated only when the metrics are read.
+    """
+
+    PHASES = ("request", "execute", "propagate", "response", "propagate_request", "propagate_execute", "total")
+
+    def __init__(self, branch_id: int, sample_every: int = 16):
+        self.branch_id = branch_id
+        self.sample_every = sample_every
+
+        self.counters: Dict[str, int] = {}
+        self.phases = {phase: LatencyHistogram() for phase in self.PHASES}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+
+        # peer id -> local clock minus the peer's clock, as last seen in a message from it
+        self.clock_drift: Dict[int, int] = {}
+
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def sampled(self) -> bool:
+        """Whether the current request should be timed"""
+        return bool(self.sample_every) and next(self._sequence) % self.sample_every == 0
+
+    def timer(self) -> Optional["PhaseTimer"]:
+        """A PhaseTimer if the current request is sampled, else None"""
+        return PhaseTimer(self) if self.sampled() else None
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[phase].record(seconds)
+
+    def observe_clock(self, peer: int, remote_clock: int, local_clock: int) -> None:
+        self.clock_drift[peer] = local_clock - remote_clock
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        self.gauges[name] = read
+
+    def snapshot(self) -> dict:
+        """Everything as plain data (counters, gauges, per-peer clock drift and phase latency summaries)"""
+        with self._lock:
+            counters = dict(self.counters)
+            phases = {phase: h.summary() for phase, h in self.phases.items() if h.count}
+        return {
+            "branch": self.branch_id,
+            "counters": counters,
+            "gauges": {name: read() for name, read in self.gauges.items()},
+            "clock_drift": dict(self.clock_drift),
+            "phases": phases,
+        }
+
+
+class PhaseTimer:
+    """Times the consecutive phases of one sampled request"""
+
+    __slots__ = ("metrics", "start", "last")
+
+    def __init__(self, metrics: BranchMetrics):
+        self.metrics = metrics
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        """Records the time since the previous lap (or the start) as `phase`"""
+        now = time.perf_counter()
+        self.metrics.observe(phase, now - self.last)
+        self.last = now
+
+    def finish(self, phase: str = "total") -> None:
+        """Records the time since the start as `phase`"""
+        self.metrics.observe(phase, time.perf_counter() - self.start)
+
+
+def prometheus_text(snapshots: List[dict], prefix: str = "bank") -> str:
+    """Renders BranchMetrics snapshots in the Prometheus text exposition format"""
+    # (metric name, type) -> [(name suffix, labels, value)]
+    families: Dict[tuple, List[tuple]] = {}
+    for s in snapshots:
+        branch = f'branch="{s["branch"]}"'
+        for name, value in s["counters"].items():
+            families.setdefault((f"{prefix}_{name}_total", "counter"), []).append(("", branch, value))
+        for name, value in s["gauges"].items():
+            families.setdefault((f"{prefix}_{name}", "gauge"), []).append(("", branch, value))
+        for peer, drift in s["clock_drift"].items():
+            families.setdefault((f"{prefix}_clock_drift", "gauge"), []).append(("", f'{branch},peer="{peer}"', drift))
+        for phase, summary in s["phases"].items():
+            samples = families.setdefault((f"{prefix}_phase_seconds", "summary"), [])
+            labels = f'{branch},phase="{phase}"'
+            for quantile, key in (("0.5", "p50_ms"), ("0.9", "p90_ms"), ("0.99", "p99_ms")):
+                samples.append(("", f'{labels},quantile="{quantile}"', summary[key] / 1000))
+            samples.append(("_count", labels, summary["count"]))
+            samples.append(("_sum", labels, summary["mean_ms"] * summary["count"] / 1000))
+
+    lines = []
+    for (name, kind), samples in families.items():
+        lines.append(f"# TYPE {name} {kind}")
+        lines += [f"{name}{suffix}{{{labels}}} {value}" for suffix, labels, value in samples]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves the metrics of a set of branches at http://<host>:<port>/metrics (Prometheus text format)"""
+
+    def __init__(self, sources: List[BranchMetrics], port: int, host: str = "localhost"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = prometheus_text([m.snapshot() for m in sources]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                # no per-scrape access log
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class MetricsDumper:
+    """Periodically writes the metrics of a set of branches to a JSON file (replaced atomically)"""
+
+    def __init__(self, sources: List[BranchMetrics], path: str, interval: float = 1.0):
+        self.sources = sources
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def dump(self) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"time": time.time(), "branches": [m.snapshot() for m in self.sources]}, f, indent=4)
+        os.replace(tmp, self.path)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def close(self) -> None:
+        """Stops the dumper after writing the final state"""
+        self._stop.set()
+        self._thread.join()
+        self.dump()
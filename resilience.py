@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+from typing import Iterator, Optional
+
+import grpc
+
+# failures after which repeating the same call may succeed (the receiver deduplicates by event id)
+RETRYABLE_CODES = frozenset({
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+})
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a peer whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Per-peer circuit breaker.
+    Note:
+        After `failure_threshold` consecutive failures the circuit opens and calls fail fast for `reset_timeout`
+        seconds. Then a single trial call is let through (half open): success closes the circuit again, failure
+        re-opens it for another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 1.0):
+        if failure_threshold < 1:
+            raise ValueError("Invalid failure threshold")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half_open"""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._trial or time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the trial call when the open period is over)"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter between `attempts` tries of an idempotent call"""
+
+    def __init__(self, attempts: int = 2, backoff: float = 0.01, max_backoff: float = 0.5):
+        if attempts < 1:
+            raise ValueError("Invalid number of attempts")
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delays(self) -> Iterator[float]:
+        """Seconds to wait before each retry (one fewer than `attempts`)"""
+        for retry in range(self.attempts - 1):
+            yield random.uniform(0, min(self.max_backoff, self.backoff * (1 << retry)))
+
+    @staticmethod
+    def retryable(error: Exception) -> bool:
+        return isinstance(error, grpc.RpcError) and error.code() in RETRYABLE_CODES
+
+
+class AdmissionControl:
+    """
+    Bounds the number of customer requests a branch handles at once.
+    Note:
+        A customer request holds a server worker until every peer has acknowledged its propagation, and the peers
+        need free workers of their own to do that. Capping customer requests below the worker count keeps workers
+        free for propagations, so a burst of customers can't deadlock the cluster. Requests over the cap wait up to
+        `queue_timeout` seconds for a slot (at most `max_queued` at a time) and are rejected after that.
+    """
+
+    def __init__(self, max_in_flight: int, max_queued: int = 0, queue_timeout: float = 0.0):
+        if max_in_flight < 1:
+            raise ValueError("Invalid admission limit")
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self.queued = 0
+        self._cond = threading.Condition()
+
+    def try_acquire(self, wait: bool = True) -> bool:
+        """Takes a slot, queueing for it if allowed; returns False if the request should be shed"""
+        with self._cond:
+            if self.in_flight < self.max_in_flight:
+                self.in_flight += 1
+                return True
+            if not wait or self.queued >= self.max_queued or self.queue_timeout <= 0:
+                return False
+
+            self.queued += 1
+            try:
+                admitted = self._cond.wait_for(lambda: self.in_flight < self.max_in_flight, self.queue_timeout)
+            finally:
+                self.queued -= 1
+            if admitted:
+                self.in_flight += 1
+            return admitted
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
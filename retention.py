@@ -0,0 +1,219 @@
+import bisect
+import itertools
+import os
+import sys
+import threading
+from array import array
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
+
+import wal
+from event_log import EventLog
+
+
+class EventArchive:
+    """
+    On-disk archive of compacted sub-events: one segment file ("<prefix>-<n>.seg") per compaction.
+    Note:
+        The manifest ("<prefix>.archive") lists every segment with its clock range and event id range. Lookups by
+        event id or by clock only open the segments whose range matches, and the index costs memory per segment,
+        not per sub-event. Each segment also holds its row numbers sorted by event id, so finding an event's rows
+        in it is a binary search. A segment is written before the manifest that lists it, so a crash in between
+        only leaves an unlisted file behind, which the next compaction overwrites.
+    """
+
+    def __init__(self, path_prefix: str, fresh: bool = False):
+        self.path_prefix = path_prefix
+        self._manifest_path = f"{path_prefix}.archive"
+
+        # (first clock, last clock, lowest event id, highest event id, rows) per segment, in clock order
+        self.segments: List[Tuple[int, int, int, int, int]] = []
+
+        manifest = wal.read_snapshot(self._manifest_path)
+        if manifest is not None:
+            self.segments = manifest["segments"]
+        if fresh:
+            # a new history (e.g. a branch without a write-ahead log): drop what an earlier run archived
+            for number in range(len(self.segments)):
+                if os.path.exists(self.segment_path(number)):
+                    os.remove(self.segment_path(number))
+            self.segments = []
+            if manifest is not None:
+                os.remove(self._manifest_path)
+
+        # the most recently loaded segment (lookups tend to hit the same one repeatedly)
+        self._cached: Tuple[int, Optional[tuple]] = (-1, None)
+
+    def segment_path(self, number: int) -> str:
+        return f"{self.path_prefix}-{number:06d}.seg"
+
+    @property
+    def last_clock(self) -> int:
+        """Clock of the newest archived sub-event (0 if none)"""
+        return self.segments[-1][1] if self.segments else 0
+
+    def __len__(self) -> int:
+        return sum(segment[4] for segment in self.segments)
+
+    def append(self, rows: tuple) -> None:
+        """Writes raw rows (see `EventLog.raw`) as a new segment; they must come after every archived row"""
+        event_ids, clocks = rows[0], rows[2]
+        number = len(self.segments)
+        order = array("I", sorted(range(len(event_ids)), key=event_ids.__getitem__))
+        sorted_ids = array("q", [event_ids[row] for row in order])
+        wal.write_snapshot(self.segment_path(number), {"rows": rows, "order": order, "sorted_ids": sorted_ids})
+        self.segments.append((clocks[0], clocks[-1], min(event_ids), max(event_ids), len(clocks)))
+        wal.write_snapshot(self._manifest_path, {"segments": self.segments})
+
+    def _segment(self, number: int) -> dict:
+        if self._cached[0] != number:
+            self._cached = (number, wal.read_snapshot(self.segment_path(number)))
+        return self._cached[1]
+
+    def load(self, number: int) -> tuple:
+        """Raw rows of one segment"""
+        return self._segment(number)["rows"]
+
+    def iter_tracked(self, event_id: int) -> Iterator[dict]:
+        """Archived sub-events of one event id as {"name", "clock"} dicts, in clock order"""
+        for number, (_, _, lowest, highest, _) in enumerate(self.segments):
+            if not lowest <= event_id <= highest:
+                continue
+            segment = self._segment(number)
+            event_ids, codes, clocks, _, names, _ = segment["rows"]
+            order, sorted_ids = segment["order"], segment["sorted_ids"]
+            start = bisect.bisect_left(sorted_ids, event_id)
+            end = bisect.bisect_right(sorted_ids, event_id, start)
+            # rows of one event id are in row (clock) order: the sort is stable
+            for row in order[start:end]:
+                yield {"name": names[codes[row]], "clock": clocks[row]}
+
+    def between(self, first_clock: int, last_clock: int) -> Iterator[dict]:
+        """Archived sub-events with a clock in [first_clock, last_clock] as {"id", "name", "clock"} dicts"""
+        for number, (first, last, _, _, _) in enumerate(self.segments):
+            if last < first_clock or first > last_clock:
+                continue
+            event_ids, codes, clocks, _, names, _ = self.load(number)
+            for row in range(bisect.bisect_left(clocks, first_clock), bisect.bisect_right(clocks, last_clock)):
+                yield {"id": event_ids[row], "name": names[codes[row]], "clock": clocks[row]}
+
+
+class Retention:
+    """
+    Bounds the live event log of a branch by taking old sub-events out of it.
+    Note:
+        The sub-events below a clock watermark form a prefix of the log (it is kept in clock order), so they are
+        split off in one piece. "archive" writes them to an EventArchive, and `history` puts them back in front of
+        the live log when the full output is needed. "summary" keeps only a per-event-id summary (number of
+        sub-events, first and last clock) and the sub-events themselves are gone.
+    """
+
+    def __init__(
+        self,
+        mode: Literal["archive", "summary"] = "archive",
+        path_prefix: Optional[str] = None,
+        fresh: bool = True,
+    ):
+        if mode not in ("archive", "summary"):
+            raise ValueError("Invalid retention mode")
+        if mode == "archive" and path_prefix is None:
+            raise ValueError("Archiving requires an archive path")
+        self.mode = mode
+        self.archive = EventArchive(path_prefix, fresh=fresh) if mode == "archive" else None
+
+        # event id -> [sub-events, first clock, last clock] of the compacted sub-events ("summary" mode)
+        self.summaries: Dict[int, List[int]] = {}
+
+        # clock of the newest compacted sub-event, and how many sub-events were compacted
+        self.last_clock = self.archive.last_clock if self.archive is not None else 0
+        self.compacted = len(self.archive) if self.archive is not None else 0
+
+        # serializes compactions (held while the rows are split off and while they are stored)
+        self.lock = threading.Lock()
+
+    def store(self, rows: tuple) -> None:
+        """Archives or summarizes raw rows split off a live log (see `EventLog.split`)"""
+        event_ids, _, clocks = rows[:3]
+        if not clocks:
+            return
+        if self.archive is not None:
+            self.archive.append(rows)
+        else:
+            summaries = self.summaries
+            for event_id, clock in zip(event_ids, clocks):
+                summary = summaries.get(event_id)
+                if summary is None:
+                    summaries[event_id] = [1, clock, clock]
+                else:
+                    summary[0] += 1
+                    summary[2] = clock
+        self.last_clock = clocks[-1]
+        self.compacted += len(clocks)
+
+    def summary(self, event_id: int) -> Optional[dict]:
+        """Summary of the compacted sub-events of one event id ("summary" mode; None if none were compacted)"""
+        summary = self.summaries.get(event_id)
+        if summary is None:
+            return None
+        return {"sub_events": summary[0], "first_clock": summary[1], "last_clock": summary[2]}
+
+    def history(self, live: EventLog) -> EventLog:
+        """The archived sub-events followed by the live ones as one log (just `live` if nothing is archived)"""
+        with self.lock:
+            # not in the middle of a compaction (whose rows would be in neither place)
+            if self.archive is None or not self.archive.segments:
+                return live
+            return self._history(live)
+
+    def _history(self, live: EventLog) -> EventLog:
+        event_ids, codes, clocks, in_branch = array("q"), array("H"), array("q"), bytearray()
+        vectors = [] if live.vectors is not None else None
+        log = EventLog()
+        for name in live.names:
+            log.name_code(name)
+
+        # one segment in memory at a time, besides the result
+        parts = itertools.chain((self.archive.load(n) for n in range(len(self.archive.segments))), [live.raw()])
+        for part_ids, part_codes, part_clocks, part_in_branch, names, part_vectors in parts:
+            event_ids.extend(part_ids)
+            clocks.extend(part_clocks)
+            in_branch.extend(part_in_branch)
+            if names == log.names[:len(names)]:
+                codes.extend(part_codes)
+            else:
+                # archived by an earlier run whose names were interned in a different order
+                mapping = [log.name_code(name) for name in names]
+                codes.extend(array("H", [mapping[code] for code in part_codes]))
+            if vectors is not None:
+                vectors.extend(part_vectors if part_vectors is not None else [()] * len(part_clocks))
+        return EventLog.restore(event_ids, codes, clocks, in_branch, log.names, vectors)
+
+    def raw(self) -> dict:
+        """State to keep in a branch snapshot (the archive itself is on disk)"""
+        return {"summaries": self.summaries, "last_clock": self.last_clock, "compacted": self.compacted}
+
+    def restore(self, state: Optional[dict]) -> None:
+        if not state:
+            return
+        self.summaries = state["summaries"]
+        if self.archive is None:
+            self.last_clock, self.compacted = state["last_clock"], state["compacted"]
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the summaries (the archive is on disk)"""
+        return sys.getsizeof(self.summaries) + sum(sys.getsizeof(s) for s in self.summaries.values())
+
+
+class BranchHistory:
+    """A branch's id and full event history, as BranchDebugger / export / analytics expect a branch"""
+
+    __slots__ = ("id", "events")
+
+    def __init__(self, _id: int, events: EventLog):
+        self.id = _id
+        self.events = events
+
+
+def full_events(branch: Any) -> EventLog:
+    """Every sub-event a branch logged, archived ones included"""
+    retention = getattr(branch, "retention", None)
+    return branch.events if retention is None else retention.history(branch.events)
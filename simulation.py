@@ -0,0 +1,290 @@
+import heapq
+import itertools
+import random
+from typing import Any, Callable, Dict, Iterator, List, Literal, Optional, Tuple
+
+from branch import Event
+from vector_clock import VectorClock
+
+
+class Scheduler:
+    """Discrete-event scheduler: callbacks run one at a time in (time, scheduling order) order"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.processed = 0
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+
+    def schedule(self, delay: float, callback: Callable[..., None], *args: Any) -> None:
+        heapq.heappush(self._queue, (self.now + delay, next(self._sequence), callback, args))
+
+    def run(self, until: Optional[float] = None) -> int:
+        """Runs callbacks until none are left (or simulated time passes `until`); returns how many ran"""
+        queue, ran = self._queue, 0
+        while queue and (until is None or queue[0][0] <= until):
+            self.now, _, callback, args = heapq.heappop(queue)
+            callback(*args)
+            ran += 1
+        self.processed += ran
+        return ran
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+
+class LatencyModel:
+    """
+    One-way link latency: `base` seconds plus a uniform random `jitter`.
+    Note:
+        With jitter, a message can overtake one sent earlier on another link (or on the same link), which is
+        what reorders deliveries; with `jitter=0` every link is FIFO.
+    """
+
+    def __init__(self, base: float = 0.0005, jitter: float = 0.0, seed: int = 0):
+        self.base = base
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+
+    def __call__(self, sender: Any, receiver: Any) -> float:
+        if not self.jitter:
+            return self.base
+        return self.base + self.rng.random() * self.jitter
+
+
+class MessageBus:
+    """In-memory transport: delivers (kind, payload) messages to registered nodes after the link latency"""
+
+    def __init__(self, scheduler: Scheduler, latency: LatencyModel, record: bool = False):
+        self.scheduler = scheduler
+        self.latency = latency
+        self.nodes: Dict[Any, Any] = {}
+        self.sent = 0
+
+        # with record=True, every delivery as (time, sender, receiver, kind, event id), e.g. to diff two runs
+        self.deliveries: Optional[List[tuple]] = [] if record else None
+
+    def register(self, address: Any, node: Any) -> None:
+        self.nodes[address] = node
+
+    def send(self, sender: Any, receiver: Any, kind: str, payload: tuple) -> None:
+        self.sent += 1
+        self.scheduler.schedule(self.latency(sender, receiver), self._deliver, sender, receiver, kind, payload)
+
+    def _deliver(self, sender: Any, receiver: Any, kind: str, payload: tuple) -> None:
+        if self.deliveries is not None:
+            self.deliveries.append((self.scheduler.now, sender, receiver, kind, payload[0]))
+        self.nodes[receiver].on_message(sender, kind, payload)
+
+
+class SimBranch(Event):
+    """
+    A branch driven by the message bus.
+    Note:
+        Records exactly the sub-events a gRPC Branch records, in the same order. A customer request is handled as
+        a chain of continuations instead of a blocked worker thread: with "sequential" fan-out the next peer is
+        only contacted once the previous one replied, as in `Branch._propagate_to_branches`.
+    """
+
+    def __init__(
+        self,
+        _id: int,
+        balance: int,
+        branches: list,
+        bus: MessageBus,
+        fanout: Literal["sequential", "parallel"] = "sequential",
+        clock_mode: Literal["lamport", "vector"] = "lamport",
+    ):
+        super().__init__()
+        self.id = _id
+        self.balance = balance
+        self.read_snapshot = (balance, 0)
+        self.branches = branches
+        self.bus = bus
+
+        if fanout not in ("sequential", "parallel"):
+            raise ValueError("Invalid fanout mode")
+        self.fanout = fanout
+
+        if clock_mode not in ("lamport", "vector"):
+            raise ValueError("Invalid clock mode")
+        if clock_mode == "vector":
+            self.enable_vector_clock(owner=_id)
+
+        # event id -> [customer address, index of the next peer to contact, replies still expected]
+        self._pending: Dict[int, list] = {}
+        bus.register(("branch", _id), self)
+
+    def _vector(self) -> Optional[VectorClock]:
+        return None if self.vector_clock is None else VectorClock(self.vector_clock.counters)
+
+    def on_message(self, sender: Any, kind: str, payload: tuple) -> None:
+        getattr(self, f"_on_{kind}")(sender, *payload)
+
+    def _on_request(self, sender: Any, event_id: int, interface: str, money: Any, clock: int, account: int) -> None:
+        """A customer request (deposit, withdraw or query)"""
+        if interface == "query":
+            reply = (event_id, self.balance_of(account), self.local_clock)
+            self.bus.send(("branch", self.id), sender, "reply", reply)
+            return
+
+        self.event_request_1(event_id=event_id, interface=interface, remote_clock=clock)
+        if not self.claim_op(self.id, event_id, interface, money, account):
+            self._respond(sender, event_id, account)
+            return
+        self.event_execute_2(
+            event_id=event_id, interface=interface, amount=money, propagate=False, origin=self.id, account=account
+        )
+
+        if not self.branches:
+            self._respond(sender, event_id, account)
+            return
+        if self.fanout == "parallel":
+            self._pending[event_id] = [sender, len(self.branches), len(self.branches)]
+            for peer in self.branches:
+                self._propagate(peer, event_id, interface, money, account)
+        else:
+            self._pending[event_id] = [sender, 1, 1]
+            self._propagate(self.branches[0], event_id, interface, money, account)
+
+    def _propagate(self, peer: int, event_id: int, interface: str, money: Any, account: int) -> None:
+        payload = (event_id, interface, money, account, self.local_clock, self._vector())
+        self.bus.send(("branch", self.id), ("branch", peer), "propagate", payload)
+
+    def _on_propagate(
+        self,
+        sender: Any,
+        event_id: int,
+        interface: str,
+        money: Any,
+        account: int,
+        clock: int,
+        vector: Optional[VectorClock],
+    ) -> None:
+        """A propagation from another branch (sub-events 3 and 4)"""
+        if self.claim_op(sender[1], event_id, interface, money, account):
+            self.event_propagate_request_3(
+                event_id=event_id, interface=interface, remote_clock=clock, remote_vector=vector
+            )
+            self.event_propagate_execute_4(
+                event_id=event_id, interface=interface, amount=money, origin=sender[1], account=account
+            )
+        payload = (event_id, interface, money, account, self.local_clock, self._vector())
+        self.bus.send(("branch", self.id), sender, "propagated", payload)
+
+    def _on_propagated(
+        self,
+        sender: Any,
+        event_id: int,
+        interface: str,
+        money: Any,
+        account: int,
+        clock: int,
+        vector: Optional[VectorClock],
+    ) -> None:
+        """A peer's reply to a propagation (sub-event 5), then either the next peer or the customer's reply"""
+        self.event_propagate_response_5(
+            event_id=event_id, interface=interface, remote_clock=clock, remote_vector=vector
+        )
+        pending = self._pending[event_id]
+        customer, next_peer, _ = pending
+        if next_peer < len(self.branches):
+            pending[1] += 1
+            self._propagate(self.branches[next_peer], event_id, interface, money, account)
+            return
+
+        pending[2] -= 1
+        if not pending[2]:
+            del self._pending[event_id]
+            self._respond(customer, event_id, account)
+
+    def _respond(self, customer: Any, event_id: int, account: int) -> None:
+        self.event_response_6()
+        self.bus.send(("branch", self.id), customer, "reply", (event_id, self.balance_of(account), self.local_clock))
+
+
+class SimCustomer:
+    """Sends its events to its branch one at a time, like `Customer.execute_events`"""
+
+    def __init__(self, _id: int, events: list, branch_id: int, bus: MessageBus):
+        self.id = _id
+        self.events = events
+        self.branch_id = branch_id
+        self.bus = bus
+        self.local_clock = 0
+        self._next = iter(events)
+        bus.register(("customer", _id), self)
+
+    def start(self) -> None:
+        self._send_next()
+
+    def _send_next(self) -> None:
+        event = next(self._next, None)
+        if event is None:
+            return
+        payload = (event.get("id"), event["interface"], event.get("money"), self.local_clock, event.get("account", 0))
+        self.bus.send(("customer", self.id), ("branch", self.branch_id), "request", payload)
+
+    def on_message(self, sender: Any, kind: str, payload: Tuple[int, Any, int]) -> None:
+        event_id, balance, clock = payload
+        self.local_clock = max(self.local_clock, clock) + 1
+        self._send_next()
+
+
+class Simulation:
+    """
+    Runs a Main-style input (branch and customer processes) on an in-memory bus instead of gRPC servers.
+    Note:
+        The Lamport clock / event log logic of `Event` is transport-agnostic, so the branches record the same
+        sub-events a gRPC Branch does. A discrete-event scheduler advances simulated time from one delivery to the
+        next (no sleeping, no threads) and link latency comes from a seeded generator, so re-running with the same
+        seed and options replays the exact same interleaving. `branches` keep the usual event logs, so
+        BranchDebugger / export work on them as on real branches.
+    """
+
+    def __init__(
+        self,
+        input_data: list,
+        seed: int = 0,
+        latency: float = 0.0005,
+        jitter: float = 0.0,
+        fanout: Literal["sequential", "parallel"] = "sequential",
+        clock_mode: Literal["lamport", "vector"] = "lamport",
+        record: bool = False,
+    ):
+        self.scheduler = Scheduler()
+        self.bus = MessageBus(self.scheduler, LatencyModel(latency, jitter, seed), record=record)
+
+        branch_ids = [p["id"] for p in input_data if p["type"] == "branch"]
+        self.branches = [
+            SimBranch(
+                p["id"],
+                p["balance"],
+                [i for i in branch_ids if i != p["id"]],
+                self.bus,
+                fanout=fanout,
+                clock_mode=clock_mode,
+            )
+            for p in input_data
+            if p["type"] == "branch"
+        ]
+        self.customers = [
+            SimCustomer(p["id"], p["events"], p.get("branch_id", p["id"]), self.bus)
+            for p in input_data
+            if p["type"] == "customer"
+        ]
+
+    def run(self) -> dict:
+        """Runs every customer to completion and returns simple statistics"""
+        for customer in self.customers:
+            customer.start()
+        self.scheduler.run()
+        return {
+            "simulated_seconds": self.scheduler.now,
+            "messages": self.bus.sent,
+            "sub_events": sum(len(b.events) for b in self.branches),
+        }
+
+    def deliveries(self) -> Iterator[tuple]:
+        """The recorded delivery order (requires record=True)"""
+        return iter(self.bus.deliveries)
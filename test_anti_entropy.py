@@ -0,0 +1,59 @@
+import banking_pb2
+from anti_entropy import OpLog
+from benchmarks.anti_entropy import repair
+from benchmarks.common import cluster
+
+
+def _logs(history: int, dropped: set) -> tuple:
+    source, replica = OpLog(), OpLog()
+    for n in range(history):
+        source.add(1 + n % 3, n, "deposit", 1, 0, n)
+        if n not in dropped:
+            replica.add(1 + n % 3, n, "deposit", 1, 0, n)
+    return source, replica
+
+
+def test_repair_traffic_does_not_grow_with_the_history():
+    streamed = []
+    for history in (1_000, 50_000):
+        source, replica = _logs(history, {7, history // 2, history - 1})
+        stats = repair(source, replica)
+        assert stats["ops_applied"] == 3
+        assert source.digests() == replica.digests()
+        streamed.append(stats["ops_streamed"])
+    assert max(streamed) <= 3 * 2 * OpLog().leaf_size
+
+
+def test_pruned_operations_are_not_taken_back():
+    source, replica = _logs(2_000, {1_500})
+    assert replica.prune(1_000) == 1_000
+    assert len(replica) == 999 and 10 not in replica
+    # the source still has every operation, the replica only misses 1500
+    stats = repair(source, replica)
+    assert stats["ops_applied"] == 1
+    assert 1_500 in replica and 10 not in replica
+    assert source.digests() == replica.digests()
+
+
+def test_raw_and_restore_keep_pruned_digests():
+    log, _ = _logs(500, set())
+    log.prune(200)
+    copy = OpLog()
+    copy.restore(log.raw())
+    assert sorted(copy.digests()) == sorted(log.digests())
+    assert len(copy) == 300 and 100 not in copy
+    assert copy.raw() == log.raw()
+
+
+def test_sync_with_pulls_what_a_branch_missed():
+    with cluster(2, balance=100, rpc_timeout=1.0) as branches:
+        for event_id in range(1, 301):
+            request = banking_pb2.BranchRequest(
+                interface="deposit", money=1, type="branch", id=3, clock=event_id, event_id=event_id
+            )
+            branches[1].deposit_or_withdraw_propagate(request)
+            if event_id % 50:
+                branches[0].deposit_or_withdraw_propagate(request)
+        assert branches[0].sync_with(2) == 6
+        assert branches[0].sync_with(2) == 0
+        assert branches[0].balance == branches[1].balance == 400
@@ -0,0 +1,31 @@
+import json
+
+import benchmarks.stress
+from benchmarks.__main__ import main
+
+
+def _stress_results(balance_ok: bool) -> dict:
+    return {
+        "benchmark": "stress",
+        "results": {
+            "event": {"sub_events_per_sec": 1.0, "monotonic_clocks": True, "balance_ok": True},
+            "cluster": {"events_per_sec": 1.0, "monotonic_clocks": True, "balance_ok": balance_ok},
+        },
+    }
+
+
+def test_stress_check_passes(tmp_path):
+    output = tmp_path / "bench.json"
+    assert main(["--quick", "--only", "stress", "--output", str(output)]) == 0
+    assert benchmarks.stress.passed(json.loads(output.read_text())["results"]["stress"])
+
+
+def test_runner_fails_when_stress_check_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmarks.stress, "run", lambda **kwargs: _stress_results(balance_ok=False))
+    output = tmp_path / "bench.json"
+    assert main(["--only", "stress", "--output", str(output)]) == 1
+    # the results are still written
+    assert not json.loads(output.read_text())["results"]["stress"]["cluster"]["balance_ok"]
+
+    monkeypatch.setattr(benchmarks.stress, "run", lambda **kwargs: _stress_results(balance_ok=True))
+    assert main(["--only", "stress", "--output", str(output)]) == 0
@@ -0,0 +1,63 @@
+import time
+from concurrent import futures
+
+import grpc
+import pytest
+
+import banking_pb2
+import banking_pb2_grpc
+from branch import Branch
+from channel_pool import ChannelPool, PeerUnavailable
+
+ADDRESS = "localhost:50098"
+
+
+def _serve(branch: Branch) -> grpc.Server:
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    banking_pb2_grpc.add_BranchServicer_to_server(branch, server)
+    server.add_insecure_port(ADDRESS)
+    server.start()
+    return server
+
+
+def test_down_peer_is_skipped_until_it_comes_back():
+    pool = ChannelPool(lambda _id: ADDRESS, ready_timeout=2.0)
+    peer = Branch(_id=2, balance=0, branches=[])
+    server = None
+    try:
+        start = time.monotonic()
+        with pytest.raises(PeerUnavailable) as error:
+            pool.ready_stub(2)
+        # settled as soon as the connection was refused, not after the timeout
+        assert time.monotonic() - start < 1.0
+        assert error.value.code() == grpc.StatusCode.UNAVAILABLE
+        assert not pool.is_healthy(2)
+
+        # the channel reconnects in the background, without being called
+        server = _serve(peer)
+        deadline = time.monotonic() + 10
+        while not pool.is_healthy(2) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        request = banking_pb2.BranchRequest(interface="deposit", money=5, type="branch", id=1, clock=1, event_id=1)
+        assert pool.ready_stub(2).MsgDelivery(request).interface == "deposit"
+        assert peer.balance == 5
+    finally:
+        pool.close()
+        peer.close()
+        if server is not None:
+            server.stop(grace=None)
+
+
+def test_propagation_skips_a_down_peer():
+    # nothing listens on branch 9's address
+    branch = Branch(_id=1, balance=100, branches=[9], propagation_attempts=1)
+    try:
+        request = banking_pb2.BranchRequest(interface="deposit", money=10, type="customer", id=1, event_id=1)
+        # the first call waits for the connection attempt, the second one doesn't call the peer at all
+        for event_id in (1, 2):
+            request.event_id = event_id
+            assert branch.MsgDelivery(request, None).request_status == "partial"
+        assert branch.metrics.snapshot()["counters"]["peers_skipped"] == 2
+        assert branch.balance == 120
+    finally:
+        branch.close()
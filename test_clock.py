@@ -0,0 +1,32 @@
+import threading
+
+from benchmarks.stress import check_clocks
+from branch import Event
+
+
+def test_clock_takes_max_of_local_and_remote():
+    event = Event()
+    assert event.update_local_clock() == 1
+    assert event.update_local_clock(10) == 11
+    assert event.update_local_clock(3) == 12
+
+
+def test_concurrent_sub_events_get_unique_increasing_clocks():
+    event = Event()
+    num_threads, per_thread = 4, 500
+
+    def worker(index: int) -> None:
+        for n in range(per_thread):
+            event_id = index * per_thread + n
+            event.event_request_1(event_id=event_id, interface="deposit", remote_clock=n)
+            event.event_execute_2(event_id=event_id, interface="deposit", amount=1)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(event.branch_events) == 2 * num_threads * per_thread
+    assert check_clocks(event.branch_events)
+    assert event.balance == num_threads * per_thread
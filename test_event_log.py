@@ -0,0 +1,30 @@
+from event_log import EventLog
+
+
+def test_event_log_views():
+    log = EventLog()
+    log.append(1, "deposit_request", 1)
+    log.append(1, "deposit_execute", 2)
+    log.append(2, "deposit_propagate_request", 3, add_to_branch_events=False)
+
+    assert log.branch_records() == [
+        {"id": 1, "name": "deposit_request", "clock": 1},
+        {"id": 1, "name": "deposit_execute", "clock": 2},
+    ]
+    assert log.tracked(2) == [{"name": "deposit_propagate_request", "clock": 3}]
+    assert log.rows_before(3) == 2
+
+
+def test_event_log_split_and_parts():
+    log = EventLog()
+    for clock in range(1, 11):
+        log.append(clock % 3, "deposit_execute", clock)
+    before = log.raw()
+
+    head = log.split(log.rows_before(5))
+    assert list(head[2]) == [1, 2, 3, 4]
+    assert list(log.clocks) == list(range(5, 11))
+
+    rebuilt = EventLog.from_parts([head, log.raw()])
+    assert rebuilt.raw()[:4] == before[:4]
+    assert rebuilt.tracked(1) == [{"name": "deposit_execute", "clock": c} for c in (1, 4, 7, 10)]
@@ -0,0 +1,77 @@
+import sys
+import threading
+
+import pytest
+
+from branch import Event
+from ledger import ShardedLedger
+
+
+def test_apply_and_restore():
+    ledger = ShardedLedger(num_shards=4)
+    assert ledger.apply(5, 100) == 100
+    assert ledger.apply(5, -30) == 70
+    ledger.apply(6, 10)
+    assert ledger.balance(5) == 70
+    assert ledger.balance(7) == 0
+
+    copy = ShardedLedger(num_shards=4)
+    copy.restore(ledger.raw())
+    assert copy.raw() == {5: 70, 6: 10}
+    assert len(copy) == 2
+
+
+def test_invalid_shard_count():
+    with pytest.raises(ValueError):
+        ShardedLedger(num_shards=0)
+
+
+def test_concurrent_updates_to_shared_accounts():
+    ledger = ShardedLedger(num_shards=2)
+    accounts, per_thread = 5, 2_000
+
+    def worker() -> None:
+        for n in range(per_thread):
+            ledger.apply(n % accounts + 1, 1)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert ledger.raw() == {account: 4 * per_thread // accounts for account in range(1, accounts + 1)}
+
+
+def test_accounts_are_kept_apart_from_the_branch_balance():
+    event = Event()
+    event.update_branch_balance("deposit", 50, account=3)
+    event.update_branch_balance("withdraw", 20, account=3)
+    event.update_branch_balance("deposit", 10)
+    assert event.balance_of(3) == 30
+    assert event.balance_of() == event.balance == 10
+
+
+def test_account_change_is_visible_with_its_clock():
+    event = Event()
+    stop = threading.Event()
+    behind = []
+
+    def reader() -> None:
+        while not stop.is_set():
+            clock = event.read_balance()[1]
+            # every sub-event deposits 1 into account 3, so the account holds at least the published clock
+            if event.balance_of(3) < clock:
+                behind.append(clock)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        for n in range(20_000):
+            event.record_sub_event(n, "deposit_execute", 2, balance_change=("deposit", 1, None, 3))
+    finally:
+        stop.set()
+        thread.join()
+        sys.setswitchinterval(interval)
+    assert not behind
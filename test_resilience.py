@@ -0,0 +1,29 @@
+import logging
+
+import banking_pb2
+from branch import Branch
+
+
+def _propagation(event_id: int) -> banking_pb2.BranchRequest:
+    return banking_pb2.BranchRequest(interface="deposit", money=10, type="branch", id=2, clock=1, event_id=event_id)
+
+
+def test_retried_propagation_is_applied_once():
+    logging.disable(logging.CRITICAL)
+    branch = Branch(_id=1, balance=100, branches=[2])
+    try:
+        assert branch.retry_policy.attempts > 1
+        for _ in range(2):
+            branch.MsgDelivery(_propagation(7), None)
+        assert branch.balance == 110
+    finally:
+        branch.close()
+        logging.disable(logging.NOTSET)
+
+
+def test_without_retries_nothing_is_tracked():
+    branch = Branch(_id=1, balance=100, branches=[2], propagation_attempts=1)
+    try:
+        assert branch.op_log is None
+    finally:
+        branch.close()
@@ -0,0 +1,129 @@
+import threading
+import time
+from concurrent import futures
+
+import grpc
+import pytest
+
+import banking_pb2
+import banking_pb2_grpc
+from benchmarks.common import cluster
+from branch import Branch
+from benchmarks.ordering import overdraft
+from membership import DEFAULT_REGISTRY
+from resilience import RetryPolicy
+from total_order import OrderQueue, OrderSender, PendingOperation
+
+
+def test_queue_delivers_in_timestamp_order_once_stable():
+    queue = OrderQueue([1, 2, 3])
+    queue.push(5, 2, "b")
+    queue.push(3, 3, "a")
+    queue.push(5, 1, "c")
+    assert list(queue.deliverable()) == []
+
+    queue.observe(1, 4)
+    queue.observe(2, 6)
+    # (3, 3) is stable: peers 1 and 2 sent later timestamps; (5, 1) isn't, peer 3 hasn't
+    assert list(queue.deliverable()) == [(3, 3, "a")]
+
+    queue.observe(3, 5)
+    # ties are broken by branch id: (5, 1) < (5, 3), but (5, 2) still waits for peer 1
+    assert list(queue.deliverable()) == [(5, 1, "c")]
+    queue.observe(1, 6)
+    assert list(queue.deliverable()) == [(5, 2, "b")]
+    assert len(queue) == 0
+
+
+def test_pending_operation_needs_execution_and_every_ack():
+    pending = PendingOperation(request=None, acks=2)
+    pending.acked()
+    pending.executed("success")
+    assert not pending.done.is_set()
+    pending.acked()
+    assert pending.done.is_set()
+    assert pending.status == "success"
+
+
+def test_sender_gives_up_after_its_attempts():
+    calls = []
+
+    class DownStub:
+        def OrderDelivery(self, batch, timeout=None):
+            calls.append(batch.sequence)
+            raise grpc.RpcError()
+
+    lock = threading.Lock()
+    sender = OrderSender(
+        sender_id=1,
+        get_stub=DownStub,
+        lock=lock,
+        get_clock=lambda: 1,
+        on_reply=lambda requests, reply: None,
+        retry_policy=RetryPolicy(attempts=3, backoff=0.0),
+    )
+    with lock:
+        sender.add(banking_pb2.BranchRequest(interface="deposit", money=10, event_id=1))
+    deadline = time.monotonic() + 5
+    while not sender.failed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sender.failed
+    assert len(calls) == 3
+    sender.close()
+
+
+def test_every_branch_rejects_the_same_overdrafts():
+    result = overdraft("total", num_branches=3, withdrawals=5, balance=100)
+    assert result["min_balance"] == result["max_balance"] == 0
+    assert result["status_success"] == 10
+    assert result["status_rejected"] == 5
+
+
+def test_customer_call_fails_when_a_peer_is_down():
+    with cluster(2, balance=100, ordering="total", order_timeout=0.5, order_attempts=2, rpc_timeout=0.2) as branches:
+        # branch 2 is gone: branch 1 can't order anything
+        branches[1].close()
+        with grpc.insecure_channel(DEFAULT_REGISTRY.address_of(1)) as channel:
+            stub = banking_pb2_grpc.BranchStub(channel)
+            request = banking_pb2.BranchRequest(interface="deposit", money=10, type="customer", id=1, event_id=1)
+            with pytest.raises(grpc.RpcError) as error:
+                stub.MsgDelivery(request, timeout=10)
+    assert error.value.code() == grpc.StatusCode.UNAVAILABLE
+
+
+def test_branches_go_idle_once_the_order_stops():
+    ids = [1, 2, 3]
+    branches, servers = [], []
+    for _id in ids:
+        branch = Branch(
+            _id=_id,
+            balance=100,
+            branches=[i for i in ids if i != _id],
+            ordering="total",
+            order_timeout=5.0,
+            order_attempts=2,
+            rpc_timeout=0.2,
+        )
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        banking_pb2_grpc.add_BranchServicer_to_server(branch, server)
+        DEFAULT_REGISTRY.register(_id, server.add_insecure_port(DEFAULT_REGISTRY.bind_address(_id)))
+        server.start()
+        branches.append(branch)
+        servers.append(server)
+    try:
+        # branch 3 goes away
+        servers[2].stop(grace=None)
+        with grpc.insecure_channel(DEFAULT_REGISTRY.address_of(1)) as channel:
+            stub = banking_pb2_grpc.BranchStub(channel)
+            request = banking_pb2.BranchRequest(interface="deposit", money=10, type="customer", id=1, event_id=1)
+            with pytest.raises(grpc.RpcError) as error:
+                stub.MsgDelivery(request, timeout=10)
+        assert error.value.code() == grpc.StatusCode.UNAVAILABLE
+        # branch 2 queued the deposit too, and gives up on branch 3 when it acknowledges it
+        assert branches[0].wait_idle(timeout=5)
+        assert branches[1].wait_idle(timeout=5)
+    finally:
+        for branch in branches:
+            branch.close()
+        for server in servers:
+            server.stop(grace=None)
@@ -0,0 +1,78 @@
+from branch import Event
+
+
+def _persistent(path_prefix: str, balance: int = 100) -> Event:
+    event = Event()
+    event.balance = balance
+    event.enable_persistence(path_prefix, fsync=False)
+    return event
+
+
+def _deposit(event: Event, event_id: int, amount: int, account: int = 0) -> int:
+    return event.record_sub_event(
+        event_id, "deposit_execute", method_order_number=2, balance_change=("deposit", amount, (event_id, 0), account)
+    )
+
+
+def _state(event: Event) -> tuple:
+    return event.local_clock, event.balance, event.ledger.raw(), event.events.raw()[:4]
+
+
+def test_recovers_from_log(tmp_path):
+    prefix = str(tmp_path / "branch-1")
+    event = _persistent(prefix)
+    for n in range(1, 6):
+        _deposit(event, n, 10)
+    _deposit(event, 6, 7, account=42)
+    event.update_local_clock(20)
+    state = _state(event)
+    event.close_persistence()
+
+    recovered = Event()
+    assert recovered.enable_persistence(prefix, fsync=False)
+    assert _state(recovered) == state
+    assert recovered.local_clock == 21
+    assert recovered.balance == 150
+    assert recovered.ledger.balance(42) == 7
+
+
+def test_recovers_from_snapshots_and_log_tail(tmp_path):
+    prefix = str(tmp_path / "branch-1")
+    event = _persistent(prefix)
+    for n in range(1, 4):
+        _deposit(event, n, 10)
+    event.take_snapshot()
+    for n in range(4, 7):
+        _deposit(event, n, 10)
+    # only the rows added since the first snapshot go into a second chunk
+    event.take_snapshot()
+    assert event._snapshot_chunks == 2
+    _deposit(event, 7, 10)
+    state = _state(event)
+    event.close_persistence()
+
+    recovered = Event()
+    assert recovered.enable_persistence(prefix, fsync=False)
+    assert _state(recovered) == state
+    assert recovered.balance == 170
+
+
+def test_torn_record_is_dropped(tmp_path):
+    prefix = str(tmp_path / "branch-1")
+    event = _persistent(prefix)
+    _deposit(event, 1, 10)
+    state = _state(event)
+    event.close_persistence()
+    with open(f"{prefix}.wal", "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    recovered = Event()
+    assert recovered.enable_persistence(prefix, fsync=False)
+    assert _state(recovered) == state
+    _deposit(recovered, 2, 10)
+    recovered.close_persistence()
+
+    again = Event()
+    again.enable_persistence(prefix, fsync=False)
+    assert again.balance == 120
+    assert len(again.events) == 2
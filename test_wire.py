@@ -0,0 +1,109 @@
+from concurrent import futures
+
+import grpc
+import pytest
+
+import banking_pb2_grpc
+import banking_v2_pb2
+import banking_v2_pb2_grpc
+import wire
+from branch import Branch
+from membership import DEFAULT_REGISTRY
+
+
+def test_minor_units():
+    assert wire.to_minor(170) == 17000
+    assert wire.to_minor(0.1) == 10
+    assert wire.from_minor(17000) == 170
+    assert isinstance(wire.from_minor(17000), int)
+    assert wire.from_minor(17025) == 170.25
+
+
+def test_customer_request_to_v1():
+    event = {"id": 7, "interface": "withdraw", "money": 70.5, "account": 3}
+    request = wire.request_from_v2(wire.customer_request(event, 2, 15))
+    assert request.type == "customer"
+    assert request.interface == "withdraw"
+    assert request.money == 70.5
+    assert (request.id, request.clock, request.event_id, request.account) == (2, 15, 7, 3)
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"amount": 123456789},  # 1234567.89 is 1234567.875 as a float32
+        {"clock": 1 << 31},
+        {"event_id": 1 << 40},
+        {"min_clock": -(1 << 31) - 1},
+    ],
+)
+def test_values_v1_cannot_hold_are_rejected(fields):
+    request = banking_v2_pb2.Request(type=banking_v2_pb2.CUSTOMER, interface=banking_v2_pb2.DEPOSIT, **fields)
+    with pytest.raises(ValueError):
+        wire.request_from_v2(request)
+
+
+def test_fits_v1():
+    assert wire.fits_v1(170.25, 15, 7)
+    assert not wire.fits_v1(1234567.89)
+    assert not wire.fits_v1(10, 1 << 31)
+
+
+def test_reply_v2():
+    v2 = wire.reply_v2(
+        interface="deposit", balance=570.25, id=1, clock=1 << 40, event_id=4, request_status="rejected", account=3
+    )
+    assert v2.interface == banking_v2_pb2.DEPOSIT
+    assert v2.status == banking_v2_pb2.REJECTED
+    assert v2.balance == 57025
+    assert (v2.id, v2.clock, v2.event_id, v2.account) == (1, 1 << 40, 4, 3)
+    query = wire.reply_v2(interface="query", balance=1, id=1, clock=2, event_id=3)
+    assert query.status == banking_v2_pb2.STATUS_UNSPECIFIED
+
+
+def test_v2_values_beyond_v1_are_served_and_propagated():
+    ids = [1, 2]
+    branches, servers = [], []
+    for _id in ids:
+        branch = Branch(_id=_id, balance=100, branches=[i for i in ids if i != _id])
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        banking_pb2_grpc.add_BranchServicer_to_server(branch, server)
+        wire.add_v2_servicer(branch, server)
+        DEFAULT_REGISTRY.register(_id, server.add_insecure_port(DEFAULT_REGISTRY.bind_address(_id)))
+        server.start()
+        branches.append(branch)
+        servers.append(server)
+    try:
+        event = {"id": 1 << 40, "interface": "deposit", "money": 1234567.89}
+        with grpc.insecure_channel(DEFAULT_REGISTRY.address_of(1)) as channel:
+            reply = banking_v2_pb2_grpc.BranchStub(channel).MsgDelivery(
+                wire.customer_request(event, 1, 1 << 33), timeout=10
+            )
+        assert reply.status == banking_v2_pb2.STATUS_UNSPECIFIED
+        assert reply.balance == 10_000 + 123456789
+        assert reply.clock > 1 << 33
+        # branch 2 got the exact amount and the 64-bit clock through a v2 propagation
+        assert wire.to_minor(branches[1].balance) == 10_000 + 123456789
+        assert branches[1].local_clock > 1 << 33
+    finally:
+        for branch in branches:
+            branch.close()
+        for server in servers:
+            server.stop(grace=None)
+
+
+def test_v1_only_branch_rejects_what_v1_cannot_hold():
+    class Context:
+        def abort(self, code, details):
+            raise grpc.RpcError(code, details)
+
+    branch = Branch(_id=1, balance=100, branches=[], anti_entropy_interval=1.0)
+    try:
+        assert branch.v1_only
+        request = wire.customer_request({"id": 1, "interface": "deposit", "money": 1234567.89}, 1, 1)
+        with pytest.raises(grpc.RpcError) as error:
+            wire.BranchV2(branch).MsgDelivery(request, Context())
+        assert error.value.args[0] == grpc.StatusCode.INVALID_ARGUMENT
+        assert branch.balance == 100
+    finally:
+        branch.close()
@@ -0,0 +1,218 @@
+import heapq
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import banking_pb2
+from resilience import RetryPolicy
+
+
+class OrderTimeout(Exception):
+    """A customer operation wasn't applied and acknowledged in time (it may still be applied later)"""
+
+
+class OrderAborted(OrderTimeout):
+    """The total order stopped because a peer is unreachable (see `OrderSender`)"""
+
+
+class OrderQueue:
+    """
+    Lamport total-order delivery queue of one branch.
+    Note:
+        Operations are timestamped (Lamport clock, origin branch id) and kept in a priority queue. The head is
+        delivered once every peer other than its origin has sent something with a larger timestamp: links are
+        FIFO (see `OrderSender`), so nothing that should come before the head can still arrive. Every branch thus
+        delivers the same operations in the same order.
+    """
+
+    def __init__(self, peers: list):
+        self._heap: List[tuple] = []
+
+        # peer id -> latest clock received from it (timestamps from one peer only grow)
+        self.seen: Dict[int, int] = {peer: 0 for peer in peers}
+
+    def push(self, clock: int, origin: int, operation: Any) -> None:
+        # (clock, origin) is unique: an origin never timestamps two operations with the same clock
+        heapq.heappush(self._heap, (clock, origin, operation))
+
+    def observe(self, peer: int, clock: int) -> None:
+        if clock > self.seen[peer]:
+            self.seen[peer] = clock
+
+    def stable(self, clock: int, origin: int) -> bool:
+        """Whether every peer but the origin has sent a timestamp larger than (clock, origin)"""
+        return all(peer == origin or (seen, peer) > (clock, origin) for peer, seen in self.seen.items())
+
+    def clear(self) -> List[Tuple[int, int, Any]]:
+        """Removes and returns every queued (clock, origin, operation)"""
+        heap, self._heap = self._heap, []
+        return heap
+
+    def deliverable(self) -> Iterator[Tuple[int, int, Any]]:
+        """Pops (clock, origin, operation) in timestamp order for as long as the head is stable"""
+        heap = self._heap
+        while heap and self.stable(heap[0][0], heap[0][1]):
+            yield heapq.heappop(heap)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class PendingOperation:
+    """A customer operation of this branch, waiting for its turn and for every peer's acknowledgement"""
+
+    __slots__ = ("request", "acks", "status", "aborted", "done")
+
+    def __init__(self, request: Any, acks: int):
+        self.request = request
+        self.acks = acks
+        self.status: Optional[str] = None
+        self.aborted = False
+        self.done = threading.Event()
+
+    def acked(self) -> None:
+        self.acks -= 1
+        self._check()
+
+    def executed(self, status: str) -> None:
+        self.status = status
+        self._check()
+
+    def abort(self) -> None:
+        """Stops waiting: the operation can't complete (the total order stopped)"""
+        self.aborted = True
+        self.done.set()
+
+    def _check(self) -> None:
+        if self.status is not None and not self.acks:
+            self.done.set()
+
+
+class OrderSender:
+    """
+    Sends the timestamped operations and acknowledgements of one branch to one peer as OrderDelivery batches.
+    Note:
+        A single thread sends one batch at a time and retries it (same sequence number) until the peer answers,
+        which makes the link FIFO. Once `retry_policy` runs out of attempts for a batch, the sender gives up on the
+        peer for good (`failed`, and `on_failed` is called under `lock`): the order can't skip the batch, so nothing
+        more is sent to that peer. `lock` is the branch's ordering lock: operations are queued, and the batch clock
+        read, under it, so a batch never promises a clock that an operation still being queued is below. Queueing an
+        acknowledgement only flags that the next batch must go out, even if it carries no operation, so all the
+        operations received in one linger period are acknowledged by a single batch.
+    """
+
+    def __init__(
+        self,
+        sender_id: int,
+        get_stub: Callable[[], Any],
+        lock: threading.Lock,
+        get_clock: Callable[[], int],
+        on_reply: Callable[[list, Any], None],
+        batch_size: int = 64,
+        linger: float = 0.001,
+        timeout: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        on_failed: Optional[Callable[[], None]] = None,
+    ):
+        self.sender_id = sender_id
+        self.get_stub = get_stub
+        self.get_clock = get_clock
+
+        # called with the sent requests and the peer's BranchReply (the peer's acknowledgement of them)
+        self.on_reply = on_reply
+
+        self.batch_size = batch_size
+        self.linger = linger
+        self.timeout = timeout
+
+        # backoff between the attempts to send a batch, and how many attempts are made
+        self.retry_policy = retry_policy or RetryPolicy(attempts=100)
+        self.failed = False
+        self.on_failed = on_failed
+
+        self._pending: List[Any] = []
+        self._ack = False
+        self._sequence = 0
+        self._cond = threading.Condition(lock)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(self, request: Any) -> None:
+        """Queues one of the branch's own operations (caller holds the ordering lock)"""
+        if self.failed:
+            return
+        self._pending.append(request)
+        self._cond.notify()
+
+    def ack(self) -> None:
+        """Makes sure a batch with the current clock goes out (caller holds the ordering lock)"""
+        if self.failed:
+            return
+        self._ack = True
+        self._cond.notify()
+
+    def _next_batch(self) -> Optional[Any]:
+        """Waits for operations or an acknowledgement to send (returns None once closed and flushed)"""
+        with self._cond:
+            while not self._pending and not self._ack and not self._closed:
+                self._cond.wait()
+            if not self._closed:
+                self._cond.wait_for(lambda: len(self._pending) >= self.batch_size or self._closed, self.linger)
+            if not self._pending and not self._ack:
+                return None
+
+            requests = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            self._ack = False
+            self._sequence += 1
+            return banking_pb2.OrderBatch(
+                id=self.sender_id, clock=self.get_clock(), sequence=self._sequence, requests=requests
+            )
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            reply = self._send(batch)
+            if reply is not None:
+                self.on_reply(list(batch.requests), reply)
+            elif self.failed:
+                with self._cond:
+                    self._pending.clear()
+                    if self.on_failed is not None:
+                        self.on_failed()
+                return
+
+    def _send(self, batch: Any) -> Optional[Any]:
+        """Sends a batch until the peer answers (the total order can't skip it), closing or running out of attempts"""
+        delays = self.retry_policy.delays()
+        while True:
+            try:
+                return self.get_stub().OrderDelivery(batch, timeout=self.timeout)
+            except Exception as e:
+                if self._closed:
+                    return None
+                delay = next(delays, None)
+                if delay is None:
+                    logging.error(
+                        f"Branch {self.sender_id}: OrderDelivery failed {self.retry_policy.attempts} times ({e}), "
+                        f"giving up on the peer"
+                    )
+                    self.failed = True
+                    return None
+                logging.debug(f"Branch {self.sender_id}: OrderDelivery failed ({e}), retrying")
+                time.sleep(delay)
+
+    def close(self) -> None:
+        """Flushes whatever is queued and stops the sender thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
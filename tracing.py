@@ -0,0 +1,97 @@
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+# structured event trace, kept apart from the human-readable console output (off until `enable_tracing`)
+tracer = logging.getLogger("banking.trace")
+tracer.propagate = False
+tracer.setLevel(logging.WARNING)
+
+# field names of the positional arguments of each trace record kind
+FIELDS = {
+    "sub_event": ("branch", "event_id", "name", "clock", "step"),
+    "query": ("branch", "balance", "clock", "stale"),
+}
+
+
+class SampleFilter(logging.Filter):
+    """Lets one record out of every `every` through (1: every record)"""
+
+    def __init__(self, every: int = 1):
+        super().__init__()
+        if every < 1:
+            raise ValueError("Invalid sampling rate")
+        self.every = every
+        self._seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # unsynchronized on purpose: a lost increment only shifts which record is sampled
+        self._seen += 1
+        return self._seen % self.every == 0
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Hands records to the queue as they are.
+    Note:
+        The stock QueueHandler formats the message on the calling thread; trace records carry plain tuples of
+        arguments, so formatting (and the write) is left entirely to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class NdjsonFormatter(logging.Formatter):
+    """One JSON object per trace record: {"ts", "kind", <named fields>}"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        names = FIELDS.get(record.msg)
+        if names is None:
+            return json.dumps({"ts": record.created, "kind": "message", "message": record.getMessage()})
+        return json.dumps({"ts": record.created, "kind": record.msg, **dict(zip(names, record.args))})
+
+
+class Tracing:
+    """A running trace pipeline: the tracer's queue handler plus the listener thread writing the sink"""
+
+    def __init__(self, path: str, sample_every: int = 1):
+        self._queue = queue.SimpleQueue()
+        self._handler = LazyQueueHandler(self._queue)
+        self._handler.addFilter(SampleFilter(sample_every))
+
+        sink = logging.FileHandler(path, mode="w")
+        sink.setFormatter(NdjsonFormatter())
+        self._listener = QueueListener(self._queue, sink)
+        self._sink = sink
+
+        self._listener.start()
+        tracer.addHandler(self._handler)
+        tracer.setLevel(logging.DEBUG)
+
+    def close(self) -> None:
+        """Stops tracing and flushes every queued record to the sink"""
+        tracer.setLevel(logging.WARNING)
+        tracer.removeHandler(self._handler)
+        self._listener.stop()
+        self._sink.close()
+
+
+def enable_tracing(path: str, sample_every: int = 1) -> Tracing:
+    """
+    Streams trace records (one per sub-event and query) to `path` as NDJSON, keeping one in `sample_every`.
+    Note:
+        Hot-path callers guard with `tracer.isEnabledFor(logging.DEBUG)` and pass raw arguments, so while tracing
+        is off a sub-event costs one level check, and while it is on the caller only builds a LogRecord and
+        enqueues it; JSON encoding and file I/O happen on the listener thread.
+    """
+    return Tracing(path, sample_every)
+
+
+def read_trace(path: str, kind: Optional[str] = None) -> list:
+    """Loads a trace file (optionally only records of one kind)"""
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [r for r in records if kind is None or r["kind"] == kind]
@@ -0,0 +1,132 @@
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Tuple
+
+Relation = Literal["before", "after", "equal", "concurrent"]
+
+
+class VectorClock:
+    """
+    Sparse vector clock (branch id -> counter, missing entries are 0).
+    Note:
+        On the wire only non-zero entries are sent, with the branch ids sorted and delta-encoded, so the ids are
+        small varints and a message only grows with the number of branches that actually took part in its history.
+    """
+
+    __slots__ = ("counters",)
+
+    def __init__(self, counters: Optional[Dict[int, int]] = None):
+        self.counters = dict(counters) if counters else {}
+
+    def tick(self, owner: int) -> None:
+        """Local event on branch `owner`"""
+        self.counters[owner] = self.counters.get(owner, 0) + 1
+
+    def merge(self, other: "VectorClock") -> None:
+        """Entry-wise max with a received clock"""
+        counters = self.counters
+        for _id, counter in other.counters.items():
+            if counter > counters.get(_id, 0):
+                counters[_id] = counter
+
+    def frozen(self) -> Tuple[Tuple[int, int], ...]:
+        """Immutable, sorted copy of the entries (what the event log stores per sub-event)"""
+        return tuple(sorted(self.counters.items()))
+
+    def encode(self) -> Tuple[List[int], List[int]]:
+        """(delta-encoded sorted ids, counters) for BranchRequest / BranchReply"""
+        ids, counters, previous = [], [], 0
+        for _id, counter in sorted(self.counters.items()):
+            ids.append(_id - previous)
+            counters.append(counter)
+            previous = _id
+        return ids, counters
+
+    @classmethod
+    def decode(cls, ids: Iterable[int], counters: Iterable[int]) -> "VectorClock":
+        clock, current = cls(), 0
+        for delta, counter in zip(ids, counters):
+            current += delta
+            clock.counters[current] = counter
+        return clock
+
+    def __repr__(self) -> str:
+        return f"VectorClock({self.counters})"
+
+
+def compare(a: Dict[int, int], b: Dict[int, int]) -> Relation:
+    """Causal relation of clock `a` to clock `b`"""
+    a_le_b = all(counter <= b.get(_id, 0) for _id, counter in a.items())
+    b_le_a = all(counter <= a.get(_id, 0) for _id, counter in b.items())
+    if a_le_b and b_le_a:
+        return "equal"
+    if a_le_b:
+        return "before"
+    if b_le_a:
+        return "after"
+    return "concurrent"
+
+
+class CausalityIndex:
+    """
+    Causality queries over the sub-events logged by a set of branches running in vector-clock mode.
+    Note:
+        A sub-event is referenced as (branch id, row in that branch's EventLog). Because every sub-event ticks its
+        own branch's entry, `a` happened before `b` exactly when b's clock has seen a's own entry
+        (b[owner(a)] >= a[owner(a)]), so each query is a constant-time check instead of a full vector comparison.
+    """
+
+    def __init__(self, branches: list):
+        # branch id -> list of per-row clocks (as dicts)
+        self._clocks: Dict[int, List[Dict[int, int]]] = {}
+        self._branches = {b.id: b for b in branches}
+        for b in branches:
+            if b.events.vectors is None:
+                raise ValueError(f"Branch {b.id} did not record vector clocks")
+            self._clocks[b.id] = [dict(v) for v in b.events.vectors]
+
+    def clock(self, ref: Tuple[int, int]) -> Dict[int, int]:
+        branch_id, row = ref
+        return self._clocks[branch_id][row]
+
+    def happened_before(self, a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+        if a == b:
+            return False
+        owner = a[0]
+        return self.clock(b).get(owner, 0) >= self.clock(a)[owner]
+
+    def concurrent(self, a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+        return a != b and not self.happened_before(a, b) and not self.happened_before(b, a)
+
+    def relation(self, a: Tuple[int, int], b: Tuple[int, int]) -> Relation:
+        if a == b:
+            return "equal"
+        if self.happened_before(a, b):
+            return "before"
+        if self.happened_before(b, a):
+            return "after"
+        return "concurrent"
+
+    def sub_events(self, event_id: int) -> Iterator[Tuple[int, int]]:
+        """References of every logged sub-event of a customer event"""
+        for branch_id, b in self._branches.items():
+            for row in b.events.index.get(event_id, ()):
+                yield branch_id, row
+
+    def origin(self, event_id: int) -> Optional[Tuple[int, int]]:
+        """The "<interface>_execute" sub-event, i.e. where the customer event took effect first"""
+        for ref in self.sub_events(event_id):
+            events = self._branches[ref[0]].events
+            name = events.names[events.name_codes[ref[1]]]
+            if name.endswith("_execute") and not name.endswith("_propagate_execute"):
+                return ref
+        return None
+
+    def concurrent_events(self, event_ids: Iterable[int]) -> List[Tuple[int, int]]:
+        """Pairs of customer events whose executions are causally unrelated (neither saw the other)"""
+        origins = [(event_id, self.origin(event_id)) for event_id in event_ids]
+        origins = [(event_id, ref) for event_id, ref in origins if ref is not None]
+        return [
+            (a_id, b_id)
+            for n, (a_id, a_ref) in enumerate(origins)
+            for b_id, b_ref in origins[n + 1:]
+            if self.concurrent(a_ref, b_ref)
+        ]
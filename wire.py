@@ -0,0 +1,233 @@
+import struct
+from typing import Any, Dict, Literal, NamedTuple, Optional, Sequence, Union
+
+import grpc
+import banking_pb2
+import banking_v2_pb2
+import banking_v2_pb2_grpc
+
+WireVersion = Literal["v1", "v2", "auto"]
+
+# minor units per unit of currency (v2 carries amounts and balances as integer cents)
+MINOR_UNITS = 100
+
+# enum value -> v1 string (v2 enums are decoded by index, never by parsing a string)
+INTERFACES = ("", "query", "deposit", "withdraw")
+PARTIES = ("", "customer", "branch")
+STATUSES = ("", "success", "partial", "rejected", "stale")
+
+_INTERFACE_CODES = {name: code for code, name in enumerate(INTERFACES)}
+_STATUS_CODES = {name: code for code, name in enumerate(STATUSES)}
+
+# range of the v1 int32 fields (clock, event_id, min_clock) that v2's int64 values are copied into
+INT32_MIN, INT32_MAX = -(1 << 31), (1 << 31) - 1
+
+
+def to_minor(amount: Union[int, float]) -> int:
+    return round(amount * MINOR_UNITS)
+
+
+def from_minor(units: int) -> Union[int, float]:
+    # whole amounts stay integers, like the balances and amounts in the input
+    whole, cents = divmod(units, MINOR_UNITS)
+    return whole if not cents else units / MINOR_UNITS
+
+
+def customer_request(event: dict, customer_id: int, clock: int) -> Any:
+    """A v2 customer request, built straight from an input event (no v1 message in between)"""
+    return banking_v2_pb2.Request(
+        type=banking_v2_pb2.CUSTOMER,
+        interface=_INTERFACE_CODES[event["interface"]],
+        amount=to_minor(event.get("money") or 0),
+        id=customer_id,
+        clock=clock,
+        event_id=event.get("id"),
+        account=event.get("account", 0),
+    )
+
+
+def to_float32(amount: Union[int, float]) -> float:
+    """What an amount reads back as from a v1 float field"""
+    return struct.unpack("f", struct.pack("f", amount))[0]
+
+
+def fits_v1(money: Union[int, float], *values: int) -> bool:
+    """Whether an amount (in units) and clocks / ids survive the v1 float32 and int32 fields"""
+    return to_minor(to_float32(money)) == to_minor(money) and all(INT32_MIN <= value <= INT32_MAX for value in values)
+
+
+def check_v1_range(request: Any) -> None:
+    """
+    Raises ValueError unless the v2 request's values survive v1 fields.
+    Note:
+        A branch that only sends v1 messages (total order, batched propagation) needs an amount that round-trips
+        through float32 to the same cents (e.g. 1234567.89 doesn't: it would be applied as 1234567.875), and
+        clocks and an event id that fit in int32.
+    """
+    if to_minor(to_float32(from_minor(request.amount))) != request.amount:
+        raise ValueError(f"Invalid amount {request.amount}: not exact in a v1 (float32) amount")
+    for field in ("clock", "event_id", "min_clock"):
+        value = getattr(request, field)
+        if not INT32_MIN <= value <= INT32_MAX:
+            raise ValueError(f"Invalid {field} {value}: out of the v1 (int32) range")
+
+
+class ExactRequest(NamedTuple):
+    """A request with the fields of a v1 BranchRequest but Python values: the exact amount and 64-bit clocks"""
+
+    type: str
+    interface: str
+    money: Union[int, float]
+    id: int
+    clock: int
+    event_id: int
+    vclock_ids: Sequence[int] = ()
+    vclock_counters: Sequence[int] = ()
+    min_clock: int = 0
+    account: int = 0
+
+
+class ExactReply(NamedTuple):
+    """A v2 Reply with the fields of a v1 BranchReply, see `ExactRequest`"""
+
+    interface: str
+    balance: Union[int, float]
+    id: int
+    clock: int
+    event_id: int
+    request_status: str
+    vclock_ids: Sequence[int] = ()
+    vclock_counters: Sequence[int] = ()
+    account: int = 0
+
+
+def exact_request(request: Any) -> ExactRequest:
+    """A v2 Request as the branch logic sees it, without going through v1's float32 / int32 fields"""
+    return ExactRequest(
+        type=PARTIES[request.type],
+        interface=INTERFACES[request.interface],
+        money=from_minor(request.amount),
+        id=request.id,
+        clock=request.clock,
+        event_id=request.event_id,
+        vclock_ids=list(request.vclock_ids),
+        vclock_counters=list(request.vclock_counters),
+        min_clock=request.min_clock,
+        account=request.account,
+    )
+
+
+def request_from_v2(request: Any) -> Any:
+    """The v1 BranchRequest for a branch that only sends v1 messages (see `check_v1_range`)"""
+    check_v1_range(request)
+    return banking_pb2.BranchRequest(
+        type=PARTIES[request.type],
+        interface=INTERFACES[request.interface],
+        money=from_minor(request.amount),
+        id=request.id,
+        clock=request.clock,
+        event_id=request.event_id,
+        vclock_ids=request.vclock_ids,
+        vclock_counters=request.vclock_counters,
+        min_clock=request.min_clock,
+        account=request.account,
+    )
+
+
+def reply_v2(
+    balance: Union[int, float],
+    id: int,
+    event_id: int,
+    interface: str,
+    clock: int,
+    request_status: Optional[str] = None,
+    account: int = 0,
+    vclock_ids: Sequence[int] = (),
+    vclock_counters: Sequence[int] = (),
+) -> Any:
+    """
+    A v2 Reply from the fields of a v1 BranchReply, for the branch to build its reply with (see `BranchV2`).
+    Note:
+        The balance and clock are the ones the branch read for this reply, and the balance goes straight to
+        cents instead of through v1's float32 field, which loses the cents of large balances.
+    """
+    return banking_v2_pb2.Reply(
+        interface=_INTERFACE_CODES[interface],
+        balance=to_minor(balance),
+        id=id,
+        clock=clock,
+        event_id=event_id,
+        status=_STATUS_CODES[request_status or ""],
+        vclock_ids=vclock_ids,
+        vclock_counters=vclock_counters,
+        account=account,
+    )
+
+
+def branch_request(
+    _id: int,
+    interface: str,
+    money: Union[int, float],
+    clock: int,
+    event_id: int,
+    vector: Optional[Dict[str, list]] = None,
+    account: int = 0,
+) -> Any:
+    """A v2 propagation request, for amounts and clocks v1's fields can't hold (see `fits_v1`)"""
+    return banking_v2_pb2.Request(
+        type=banking_v2_pb2.BRANCH,
+        interface=_INTERFACE_CODES[interface],
+        amount=to_minor(money),
+        id=_id,
+        clock=clock,
+        event_id=event_id,
+        account=account,
+        **(vector or {}),
+    )
+
+
+def reply_from_v2(reply: Any) -> ExactReply:
+    return ExactReply(
+        interface=INTERFACES[reply.interface],
+        balance=from_minor(reply.balance),
+        id=reply.id,
+        clock=reply.clock,
+        event_id=reply.event_id,
+        request_status=STATUSES[reply.status],
+        vclock_ids=list(reply.vclock_ids),
+        vclock_counters=list(reply.vclock_counters),
+        account=reply.account,
+    )
+
+
+class BranchV2(banking_v2_pb2_grpc.BranchServicer):
+    """
+    Serves the v2 schema for a (synchronous) Branch.
+    Note:
+        Requests are handled by the same MsgDelivery code as v1 requests, so both versions can be served side by
+        side from one server. They reach it as `ExactRequest`s and the branch builds a v2 reply, so exact cents and
+        64-bit clocks are kept; the branch propagates whatever v1 can't hold as v2 requests. A branch that only
+        sends v1 messages (`Branch.v1_only`) rejects requests with values the v1 fields can't hold with
+        INVALID_ARGUMENT instead of rounding or truncating them.
+    """
+
+    def __init__(self, branch: Any):
+        self.branch = branch
+
+    def MsgDelivery(self, request: Any, context: Any) -> Any:
+        if not self.branch.v1_only:
+            return self.branch.MsgDelivery(exact_request(request), context, reply_type=reply_v2)
+        try:
+            v1_request = request_from_v2(request)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        return self.branch.MsgDelivery(v1_request, context, reply_type=reply_v2)
+
+
+def add_v2_servicer(branch: Any, server: Any) -> None:
+    banking_v2_pb2_grpc.add_BranchServicer_to_server(BranchV2(branch), server)
+
+
+def unsupported(error: grpc.RpcError) -> bool:
+    """Whether a call failed because the server doesn't serve that schema version"""
+    return error.code() == grpc.StatusCode.UNIMPLEMENTED
@@ -0,0 +1,58 @@
+import random
+from typing import Dict, Optional
+
+DEFAULT_MIX = {"deposit": 0.4, "withdraw": 0.2, "query": 0.4}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parses a "deposit=0.4,withdraw=0.2,query=0.4" style operation mix"""
+    mix = {}
+    for part in text.split(","):
+        interface, _, weight = part.partition("=")
+        mix[interface.strip()] = float(weight)
+    return mix
+
+
+def generate_workload(
+    num_branches: int,
+    num_customers: int,
+    events_per_customer: int,
+    mix: Optional[Dict[str, float]] = None,
+    seed: int = 0,
+    initial_balance: int = 10_000,
+    max_amount: int = 100,
+    num_accounts: int = 0,
+) -> list:
+    """
+    Generates input data in the same format as `test_input_output.input_test`.
+    Note:
+        Customers are assigned to branches round-robin ("branch_id" key) so there can be more customers than
+        branches. Event ids are unique across the whole workload, and the same seed always yields the same data.
+        With `num_accounts`, every event also targets a random customer account in 1..num_accounts.
+    """
+    mix = mix or DEFAULT_MIX
+    if not mix or any(interface not in DEFAULT_MIX for interface in mix) or sum(mix.values()) <= 0:
+        raise ValueError("Invalid operation mix")
+
+    rng = random.Random(seed)
+    interfaces, weights = list(mix), list(mix.values())
+
+    data = []
+    event_id = 0
+    for customer_id in range(1, num_customers + 1):
+        events = []
+        for interface in rng.choices(interfaces, weights=weights, k=events_per_customer):
+            event_id += 1
+            event = {"id": event_id, "interface": interface, "money": rng.randint(1, max_amount)}
+            if num_accounts:
+                event["account"] = rng.randint(1, num_accounts)
+            events.append(event)
+        data.append({
+            "id": customer_id,
+            "type": "customer",
+            "branch_id": (customer_id - 1) % num_branches + 1,
+            "events": events,
+        })
+
+    data += [{"id": _id, "type": "branch", "balance": initial_balance} for _id in range(1, num_branches + 1)]
+    return data